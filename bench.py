@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+import cfg
+import errors as err
+import rf
+import simulation as sim
+import streams as rnd
+import tower as twr
+import user as usr
+
+CONFIGS = ["config.json", "q2_config.json", "test_files/golden_config.json"]
+USER_COUNTS = [500, 1000, 2000]
+DURATIONS = [900, 3600]  # simulated seconds
+ENGINES = ["step", "vector", "event"]
+
+DEFAULT_THRESHOLD = 0.2
+
+
+class _Setup:
+    """Objects needed to call the hot path functions outside a simulation."""
+
+    def __init__(self, config_file="test_files/golden_config.json"):
+        config = cfg.read_json(config_file)
+        self.sim_opts = cfg.SimOptions(config)
+        self.geometry = cfg.Geometry(config)
+        self.user_opts = cfg.UserOptions(config)
+        self.base_station = twr.Tower(cfg.TowerOptions(config, twr.BASE_STATION))
+        self.small_cell = twr.Tower(cfg.TowerOptions(config, twr.SMALL_CELL))
+        self.streams = rnd.RandomStreams(0, self.sim_opts.call_rate)
+        self.streams.init_shadowing(self.sim_opts, self.geometry)
+
+        self.user = usr.User(0, self.user_opts, pos=1234.5)
+        self.user_ids = np.arange(40)
+        self.rsl = np.linspace(-110.0, -60.0, 40)
+        rf.init_shadowing(self.sim_opts, self.geometry)
+        rf.init_call_probabilities(65536, self.sim_opts.call_rate)
+
+
+def _connect(s):
+    if s.small_cell.try_connect(s.user, -50.0) == err.OK:
+        s.small_cell.disconnect(s.user)
+
+
+def _admit(s):
+    status = s.small_cell.admit(s.user_ids, s.rsl, s.user_opts.rsl_threshold)
+    s.small_cell.release_many(s.user_ids[status == err.OK])
+
+
+# name -> function of a _Setup, called repeatedly
+MICRO = {
+    "rf.RSL": lambda s: rf.RSL(s.geometry, s.user, s.base_station, s.streams),
+    "rf.get_fading": lambda s: rf.get_fading(),
+    "RandomStreams.fading": lambda s: s.streams.fading(),
+    "rf.okamura_hata": lambda s: rf.okamura_hata(1234.5, 1000, 50, 1.7),
+    "rf.get_penetration": lambda s: rf.get_penetration(s.geometry, s.base_station, s.user),
+    "rf.want_call": lambda s: rf.want_call(),
+    "RandomStreams.want_call": lambda s: s.streams.want_call(),
+    "Tower.try_connect": _connect,
+    "Tower.admit": _admit,
+}
+
+
+def micro_benchmark(func, setup, min_time=0.2, repeat=3):
+    """Calls of func(setup) per second, repeating batches for at least
+    min_time. The best of repeat measurements is returned, like timeit."""
+    best = 0.0
+    for _ in range(repeat):
+        calls, n = 0, 1000
+        start = time.perf_counter()
+        while True:
+            for _ in range(n):
+                func(setup)
+            calls += n
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, calls / elapsed)
+    return best
+
+
+def _simulate(config_file, num_users, seconds, engine):
+    config = cfg.read_json(config_file)
+    sim_opts = cfg.SimOptions(config)
+    sim_opts.num_users = num_users
+    sim_opts.iterations = seconds
+    geometry = cfg.Geometry(config)
+    streams = rnd.RandomStreams(0, sim_opts.call_rate)
+    streams.init_shadowing(sim_opts, geometry)
+    args = argparse.Namespace(silent=True, supersilent=True, engine=engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run(twr.Tower(cfg.TowerOptions(config, twr.BASE_STATION)),
+                twr.Tower(cfg.TowerOptions(config, twr.SMALL_CELL)),
+                geometry, sim_opts, cfg.UserOptions(config), args, streams)
+
+
+def end_to_end_benchmark(config_file, num_users, seconds, engine):
+    """Simulated user-seconds per wall clock second, and peak memory in MB.
+    Memory is measured in a second run, as tracemalloc slows down the first."""
+    start = time.perf_counter()
+    _simulate(config_file, num_users, seconds, engine)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    _simulate(config_file, num_users, seconds, engine)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"user_seconds_per_s": num_users * seconds / elapsed, "peak_mb": peak / 1e6}
+
+
+def run(quick=False, pattern=""):
+    """Run all benchmarks whose name contains pattern. Returns dictionary of
+    name -> metrics."""
+    results = {}
+    setup = _Setup()
+    for name, func in MICRO.items():
+        if pattern in name:
+            results[name] = {"calls_per_s": micro_benchmark(func, setup, 0.05 if quick else 0.2)}
+
+    configs = CONFIGS[-1:] if quick else CONFIGS
+    user_counts = USER_COUNTS[1:2] if quick else USER_COUNTS
+    durations = DURATIONS[:1] if quick else DURATIONS
+    for config_file in configs:
+        for num_users in user_counts:
+            for seconds in durations:
+                for engine in ENGINES:
+                    name = "%s/%d users/%d s/%s" % (config_file, num_users, seconds, engine)
+                    if pattern in name:
+                        print(name, file=sys.stderr)
+                        results[name] = end_to_end_benchmark(config_file, num_users, seconds, engine)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare results to baseline results. Returns list of (name, metric,
+    baseline value, new value) for all metrics that got worse by more than
+    threshold: throughput below (1 - threshold) or memory above (1 + threshold)
+    times the baseline."""
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric, value in metrics.items():
+            base = baseline[name].get(metric)
+            if base is None:
+                continue
+            if metric == "peak_mb":
+                worse = value > base * (1 + threshold)
+            else:
+                worse = value < base * (1 - threshold)
+            if worse:
+                regressions.append((name, metric, base, value))
+    return regressions
+
+
+def _print_results(results, baseline):
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            line = "%-55s %-20s %12.4g" % (name, metric, value)
+            if name in baseline and metric in baseline[name]:
+                line += "  (%+.1f%%)" % (100.0 * (value / baseline[name][metric] - 1))
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GSM Simulation benchmarks.')
+    parser.add_argument("-k", "--filter", type=str, default="",
+                        help="only run benchmarks with names containing this")
+    parser.add_argument("-q", "--quick", action='store_true',
+                        help="fewer and shorter end-to-end runs")
+    parser.add_argument("--save", type=str, default=None, metavar="FILE",
+                        help="store the results as a json baseline")
+    parser.add_argument("--compare", type=str, default=None, metavar="FILE",
+                        help="compare against a json baseline, exit with 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare is not None:
+        baseline = cfg.read_json(args.compare)["results"]
+
+    results = run(args.quick, args.filter)
+    _print_results(results, baseline)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, f, indent=1)
+
+    if args.compare is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, base, value in regressions:
+            print("REGRESSION %s %s: %.4g -> %.4g" % (name, metric, base, value))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,27 @@
+import unittest
+
+import bench
+
+
+class TestBench(unittest.TestCase):
+
+    def test_compare(self):
+        baseline = {"rf.RSL": {"calls_per_s": 1000.0},
+                    "e2e": {"user_seconds_per_s": 100.0, "peak_mb": 10.0}}
+
+        self.assertEqual(bench.compare({"rf.RSL": {"calls_per_s": 850.0}}, baseline, 0.2), [])
+        self.assertEqual(bench.compare({"rf.RSL": {"calls_per_s": 700.0}}, baseline, 0.2),
+                         [("rf.RSL", "calls_per_s", 1000.0, 700.0)])
+
+        # more memory is worse, new benchmarks are never regressions
+        got = bench.compare({"e2e": {"user_seconds_per_s": 150.0, "peak_mb": 13.0},
+                             "new": {"calls_per_s": 1.0}}, baseline, 0.2)
+        self.assertEqual(got, [("e2e", "peak_mb", 10.0, 13.0)])
+
+    def test_micro(self):
+        for name, func in bench.MICRO.items():
+            self.assertGreater(bench.micro_benchmark(func, bench._Setup(), 0.001, 1), 0, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
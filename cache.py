@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+import argparse
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+
+DEFAULT_DIR = ".sim_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_fingerprint = None
+
+
+def code_fingerprint():
+    """Hash of the source of all simulation modules, so that cached results
+    are invalidated when the code changes."""
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.sha256()
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        for path in sorted(glob.glob(os.path.join(src_dir, "*.py"))):
+            if path.endswith("_test.py"):
+                continue
+            with open(path, "rb") as f:
+                h.update(os.path.basename(path).encode())
+                h.update(f.read())
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+
+def _normalize_seed(seed):
+    """Seeds can be ints or SeedSequences spawned from other seeds."""
+    if isinstance(seed, np.random.SeedSequence):
+        return [str(seed.entropy), list(seed.spawn_key)]
+    return seed
+
+
+def _to_builtin(obj):
+    """json fallback for numpy scalars and arrays."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError("not json serializable: %r" % type(obj))
+
+
+def cache_key(config, overrides, seed):
+    """Key of a simulation run: the config dictionary, overrides not part of
+    the config (e.g. from the command line), the seed and the code version."""
+    normalized = json.dumps({
+        "config": config,
+        "overrides": overrides,
+        "seed": _normalize_seed(seed),
+        "code": code_fingerprint(),
+    }, sort_keys=True, default=_to_builtin)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed on-disk cache of simulation results. Every entry is
+    a json file with the stats dictionary and an optional npz file with
+    arrays (time series, handover data). When the cache grows beyond
+    max_bytes the least recently used entries are evicted."""
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def get(self, key):
+        """Return (stats, arrays) for key, or None if not cached. arrays is
+        None if the entry has no arrays."""
+        path = self._path(key, ".json")
+        try:
+            with open(path) as f:
+                stats = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        arrays = None
+        npz = self._path(key, ".npz")
+        if os.path.exists(npz):
+            with np.load(npz) as data:
+                arrays = {name: data[name] for name in data.files}
+
+        # mark as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return stats, arrays
+
+    def put(self, key, stats, arrays=None):
+        """Store stats (json serializable dictionary) and optionally a
+        dictionary of numpy arrays under key."""
+        if arrays:
+            tmp = self._path(key, ".tmp.npz")
+            np.savez(tmp, **arrays)
+            os.replace(tmp, self._path(key, ".npz"))
+
+        # the json file is written last, it marks the entry as complete
+        tmp = self._path(key, ".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(stats, f, default=_to_builtin)
+        os.replace(tmp, self._path(key, ".json"))
+
+        self.evict()
+
+    def entries(self):
+        """Return list of (last used, size in bytes, key) of all entries."""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            key = os.path.basename(path)[:-len(".json")]
+            try:
+                used = os.path.getmtime(path)
+                size = os.path.getsize(path)
+                npz = self._path(key, ".npz")
+                if os.path.exists(npz):
+                    size += os.path.getsize(npz)
+            except FileNotFoundError:
+                continue
+            entries.append((used, size, key))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def remove(self, key):
+        for ext in [".json", ".npz"]:
+            try:
+                os.remove(self._path(key, ext))
+            except FileNotFoundError:
+                pass
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for used, size, key in entries:
+            if total <= max_bytes:
+                break
+            self.remove(key)
+            total -= size
+
+    def clear(self):
+        """Invalidate the whole cache."""
+        for _, _, key in self.entries():
+            self.remove(key)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the simulation result cache.')
+    parser.add_argument("-d", "--directory", type=str, default=DEFAULT_DIR)
+    parser.add_argument("--clear", action='store_true', help="remove all cached results")
+    parser.add_argument("--evict", type=int, default=None, metavar="BYTES",
+                        help="remove least recently used results until the cache fits BYTES")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.directory)
+    if args.clear:
+        cache.clear()
+    if args.evict is not None:
+        cache.evict(args.evict)
+    print("%d cached results, %.1f MB" % (len(cache.entries()), cache.size() / 1e6))
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+
+import cache as rcache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_key(self):
+        config = {"a": {"b": 1, "c": 2}}
+        key = rcache.cache_key(config, {"engine": "step"}, 3)
+
+        self.assertEqual(key, rcache.cache_key({"a": {"c": 2, "b": 1}}, {"engine": "step"}, 3),
+                         "key must not depend on the order of the config")
+        self.assertNotEqual(key, rcache.cache_key(config, {"engine": "step"}, 4))
+        self.assertNotEqual(key, rcache.cache_key(config, {"engine": "vector"}, 3))
+
+        seeds = np.random.SeedSequence(3).spawn(2)
+        self.assertNotEqual(rcache.cache_key(config, {}, seeds[0]),
+                            rcache.cache_key(config, {}, seeds[1]))
+
+    def test_put_get(self):
+        cache = rcache.ResultCache(self.dir)
+        self.assertIsNone(cache.get("missing"))
+
+        cache.put("k", {"total_dropped": np.int64(3), "runtime": 1.5},
+                  {"handover_success": np.arange(4.0)})
+        stats, arrays = cache.get("k")
+        self.assertEqual(stats["total_dropped"], 3)
+        self.assertEqual(arrays["handover_success"].tolist(), [0.0, 1.0, 2.0, 3.0])
+
+        cache.clear()
+        self.assertIsNone(cache.get("k"))
+
+    def test_evict_least_recently_used(self):
+        cache = rcache.ResultCache(self.dir, max_bytes=10 ** 6)
+        for key in ["a", "b", "c"]:
+            cache.put(key, {"data": "x" * 1000})
+            past = time.time() - 100 + len(cache.entries())
+            os.utime(os.path.join(self.dir, key + ".json"), (past, past))
+
+        cache.get("a")
+        cache.evict(2500)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
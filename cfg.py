@@ -1,4 +1,7 @@
+import copy
 import json
+from math import ceil, sqrt
+
 import tower as twr
 
 
@@ -9,6 +12,29 @@ def read_json(path):
         return d
 
 
+def apply_overrides(config_dict, overrides):
+    """Return a copy of the config dictionary with overrides applied.
+    Overrides map dotted paths to values, e.g. {"base_station.EIRP_dBm": 50}.
+    Paths must already exist in the config to catch misspelled keys."""
+    config = copy.deepcopy(config_dict)
+    for path, value in overrides.items():
+        # list elements are addressed by index, e.g. "towers.3.EIRP_dBm"
+        keys = [int(k) if k.isdigit() else k for k in path.split(".")]
+        node = config
+        try:
+            for key in keys[:-1]:
+                node = node[key]
+        except IndexError:
+            raise KeyError("unknown config key: " + path)
+        if isinstance(node, list):
+            if not (isinstance(keys[-1], int) and keys[-1] < len(node)):
+                raise KeyError("unknown config key: " + path)
+        elif keys[-1] not in node:
+            raise KeyError("unknown config key: " + path)
+        node[keys[-1]] = value
+    return config
+
+
 class Geometry():
     """Store all distances of the simulation.
     All are distance from origin in meter. Also contain wall penetration
@@ -31,6 +57,40 @@ class Geometry():
 
         self.wall_loss = float(config_dict["path_loss"]["wall_penetration_dB"])
 
+    def key(self):
+        """Return tuple identifying the geometry, for caching."""
+        return (self.mall_end, self.hall_start, self.parking_start, self.parking_end,
+                self.road_end, self.wall_loss)
+
+
+class PlaneGeometry():
+    """Store the area of a 2D deployment, a width x height rectangle with
+    the origin in one corner. The area is divided into square raster cells
+    of the shadowing segment length, each with its own shadowing value.
+    """
+
+    def __init__(self, config_dict):
+        section = config_dict["plane"]
+        self.width = float(section["width_m"])
+        self.height = float(section["height_m"])
+        self.cell_size = float(config_dict["path_loss"]["shadowing"]["segment_length_m"])
+
+        # number of nearest towers considered by each user, and the cell size
+        # of the spatial index of the towers (default about one tower per cell)
+        self.k_nearest = int(section.get("k_nearest", 4))
+        self.grid_cell_size = section.get("grid_cell_m")
+        if self.grid_cell_size is None:
+            self.grid_cell_size = sqrt(self.width * self.height / len(config_dict["towers"]))
+        self.grid_cell_size = float(self.grid_cell_size)
+
+    def raster_shape(self):
+        """Number of raster cells as (rows, columns), rows along the height."""
+        return (int(ceil(self.height / self.cell_size)), int(ceil(self.width / self.cell_size)))
+
+    def key(self):
+        """Return tuple identifying the geometry, for caching."""
+        return (self.width, self.height, self.cell_size, self.k_nearest, self.grid_cell_size)
+
 
 class SimOptions():
     """Store all simulation options."""
@@ -74,24 +134,62 @@ class UserOptions:
 
 
 class TowerOptions:
-    """Store tower specific options."""
-
-    def __init__(self, config_dict, twr_type):
-        key = ""
-        if twr_type == twr.BASE_STATION:
-            key = "base_station"
-            self.pos = float(config_dict["distances_m"][key])
+    """Store tower specific options. With index the options are read from
+    element index of the "towers" list, see tower_list. xy are the
+    coordinates of the tower, (pos, 0) unless placed in a plane."""
+
+    def __init__(self, config_dict, twr_type, index=None):
+        if index is not None:
+            section = config_dict["towers"][index]
+            position = section["position_m"]
+            if not isinstance(position, list):
+                position = [position, 0.0]
+            self.pos = float(position[0])
+            self.xy = (float(position[0]), float(position[1]))
+        elif twr_type == twr.BASE_STATION:
+            section = config_dict["base_station"]
+            self.pos = float(config_dict["distances_m"]["base_station"])
+            self.xy = (self.pos, 0.0)
         elif twr_type == twr.SMALL_CELL:
-            key = "small_cell"
+            section = config_dict["small_cell"]
             self.pos = 0.0
+            self.xy = (self.pos, 0.0)
 
-        self.height = float(config_dict[key]["height_m"])
-        self.EIRP = float(config_dict[key]["EIRP_dBm"])
-        self.channels = float(config_dict[key]["traffic_channels"])
-        self.freq = float(config_dict[key]["frequency_MHz"])
+        self.height = float(section["height_m"])
+        self.EIRP = float(section["EIRP_dBm"])
+        self.channels = float(section["traffic_channels"])
+        self.freq = float(section["frequency_MHz"])
         self.twr_type = twr_type
 
 
+def has_tower_list(config_dict):
+    """True if the config defines any number of towers in a "towers" list
+    instead of one base station and one small cell."""
+    return "towers" in config_dict
+
+
+def has_plane(config_dict):
+    """True if the towers are placed in a plane, with the area given in a
+    "plane" section and "position_m": [x, y] for every tower."""
+    return "plane" in config_dict
+
+
+def tower_list(config_dict):
+    """Options of all towers in the config. Towers in a "towers" list are
+    base stations unless they have "small_cell": true, and are placed at
+    "position_m" along the road, which ends at distances_m.base_station, or
+    in the plane, see has_plane.
+    Configs without one have the base station and the small cell."""
+    if not has_tower_list(config_dict):
+        return [TowerOptions(config_dict, twr.BASE_STATION), TowerOptions(config_dict, twr.SMALL_CELL)]
+
+    options = []
+    for n, section in enumerate(config_dict["towers"]):
+        twr_type = twr.SMALL_CELL if section.get("small_cell", False) else twr.BASE_STATION
+        options.append(TowerOptions(config_dict, twr_type, index=n))
+    return options
+
+
 def valid_distance(dist_m):
     """check that distance is:
     * non-negative 
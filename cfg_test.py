@@ -1,5 +1,6 @@
 import unittest
 import cfg
+import tower as twr
 
 
 class TestParseConfig(unittest.TestCase):
@@ -12,6 +13,43 @@ class TestParseConfig(unittest.TestCase):
         self.assertIn("speed_m/s", config["user"])
         self.assertIn("path_loss", config)
 
+    def test_apply_overrides(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        new = cfg.apply_overrides(config, {"base_station.traffic_channels": 40,
+                                           "user.probabilities.in_mall": 0.4})
+
+        self.assertEqual(new["base_station"]["traffic_channels"], 40)
+        self.assertEqual(new["user"]["probabilities"]["in_mall"], 0.4)
+        self.assertEqual(config["base_station"]["traffic_channels"], 30,
+                         "original config must not change")
+        self.assertRaises(KeyError, cfg.apply_overrides, config, {"base_station.channels": 1})
+
+    def test_tower_list(self):
+        config = cfg.read_json("corridor_config.json")
+        towers = cfg.tower_list(config)
+        self.assertEqual(len(towers), len(config["towers"]))
+        self.assertEqual(towers[0].twr_type, twr.SMALL_CELL)
+        self.assertEqual(towers[1].twr_type, twr.BASE_STATION)
+        self.assertEqual(towers[1].pos, 1000.0)
+
+        new = cfg.apply_overrides(config, {"towers.3.EIRP_dBm": 50})
+        self.assertEqual(cfg.tower_list(new)[3].EIRP, 50.0)
+        self.assertRaises(KeyError, cfg.apply_overrides, config, {"towers.99.EIRP_dBm": 50})
+
+        golden = cfg.read_json("test_files/golden_config.json")
+        self.assertEqual([t.twr_type for t in cfg.tower_list(golden)],
+                         [twr.BASE_STATION, twr.SMALL_CELL])
+
+    def test_plane(self):
+        config = cfg.read_json("plane_config.json")
+        self.assertTrue(cfg.has_plane(config))
+        geometry = cfg.PlaneGeometry(config)
+        self.assertEqual(geometry.raster_shape(), (400, 400))
+
+        towers = cfg.tower_list(config)
+        self.assertEqual(towers[1].xy, (375.0, 125.0))
+        self.assertEqual(cfg.tower_list(cfg.read_json("corridor_config.json"))[1].xy, (1000.0, 0.0))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,39 @@
+import os
+import pickle
+import numpy as np
+
+import rf
+
+# module level state of rf used when no RandomStreams are passed around
+RF_GLOBALS = ["_shadows", "_rand_bool", "_rand_bool_init", "_rand_bool_idx",
+              "_rand_bool_num", "_rand_bool_prob"]
+
+
+def save(path, state):
+    """Write state (a dictionary of simulation objects) together with the rf
+    globals and the numpy global rng to path. The file is replaced atomically,
+    so an interrupted save leaves the previous checkpoint intact."""
+    snapshot = {
+        "state": state,
+        "rf": {name: getattr(rf, name) for name in RF_GLOBALS},
+        "np_random": np.random.get_state(),
+    }
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path):
+    """Read a checkpoint written by save, restore the rf globals and the numpy
+    global rng, and return the state dictionary."""
+    with open(path, "rb") as f:
+        snapshot = pickle.load(f)
+
+    for name, value in snapshot["rf"].items():
+        setattr(rf, name, value)
+    np.random.set_state(snapshot["np_random"])
+    return snapshot["state"]
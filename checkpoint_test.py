@@ -0,0 +1,53 @@
+import argparse
+import os
+import shutil
+import tempfile
+import unittest
+
+import cfg
+import checkpoint as ckpt
+import simulation as sim
+import streams as rnd
+import tower as twr
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_resume_identical(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        sim_opts = cfg.SimOptions(config)
+        sim_opts.iterations = 2 * 3600 + 300
+        geometry = cfg.Geometry(config)
+        streams = rnd.RandomStreams(11, sim_opts.call_rate)
+        streams.init_shadowing(sim_opts, geometry)
+        args = argparse.Namespace(silent=True, supersilent=True, engine="step")
+
+        path = os.path.join(self.dir, "state.pkl")
+        full = sim.run(twr.Tower(cfg.TowerOptions(config, twr.BASE_STATION)),
+                       twr.Tower(cfg.TowerOptions(config, twr.SMALL_CELL)),
+                       geometry, sim_opts, cfg.UserOptions(config), args, streams,
+                       checkpoint=path)
+
+        # the last checkpoint is from the start of hour 2
+        state = ckpt.load(path)
+        self.assertEqual(state["i"], 2 * 3600)
+        resumed = sim.resume(state, args)
+
+        # everything but the wall clock time is the same
+        del full["runtime"], resumed["runtime"]
+        self.assertEqual(full, resumed)
+
+    def test_other_engines(self):
+        args = argparse.Namespace(silent=True, supersilent=True, engine="vector")
+        with self.assertRaises(ValueError):
+            sim.run(None, None, None, None, None, args, None, checkpoint="x")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+import argparse
+import time
+from math import inf, sqrt
+import numpy as np
+
+import cfg
+import output
+import replication
+import simulation as sim
+import stopping
+import sweep
+
+COLUMNS = ["kpi", "mean_a", "mean_b", "difference", "half_width",
+           "var_independent", "var_paired", "reduction"]
+
+
+def check_replications(replications, antithetic=False):
+    """Raise ValueError unless there are enough replications to estimate a
+    variance: at least 2, or at least 2 whole antithetic pairs."""
+    if antithetic and (replications < 4 or replications % 2 != 0):
+        raise ValueError("antithetic needs an even number of at least 4 replications")
+    if replications < 2:
+        raise ValueError("at least 2 replications are needed")
+
+
+def _pair_means(values):
+    """Means of the antithetic pairs (0, 1), (2, 3), ..."""
+    return values.reshape(-1, 2).mean(axis=1)
+
+
+def variance_reduction(a, b, antithetic=False, confidence=0.95):
+    """Estimate the difference of the means of a and b, the values of a KPI
+    in replication i of two scenarios run with the same random streams, and
+    how much the pairing helps. With antithetic, replications 2j and 2j + 1
+    are antithetic pairs.
+
+    Every replication has the same distribution however the random streams
+    are shared, so the variance of the difference of two independent runs
+    (var_independent) is estimated from the same runs as the variance per
+    run of the paired difference (var_paired). reduction is their ratio, the
+    factor by which fewer runs reach the same confidence interval.
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    check_replications(len(a), antithetic)
+    diff = a - b
+    runs_per_value = 1
+    if antithetic:
+        diff = _pair_means(diff)
+        runs_per_value = 2
+
+    var_independent = float(np.var(a, ddof=1) + np.var(b, ddof=1))
+    var_paired = runs_per_value * float(np.var(diff, ddof=1))
+    t = stopping.t_quantile(0.5 + confidence / 2, len(diff) - 1)
+    return {
+        "mean_a": float(a.mean()),
+        "mean_b": float(b.mean()),
+        "difference": float(diff.mean()),
+        "half_width": t * sqrt(var_paired / runs_per_value / len(diff)),
+        "var_independent": var_independent,
+        "var_paired": var_paired,
+        "reduction": var_independent / var_paired if var_paired > 0 else inf,
+    }
+
+
+def compare(config, overrides_a, overrides_b, cli_args, replications, workers=None, seed=0,
+            common=True, antithetic=False, confidence=0.95):
+    """Run replications of the config with overrides_a and with overrides_b,
+    with common random numbers unless common is false, and return one
+    variance_reduction row per KPI."""
+    check_replications(replications, antithetic)
+    results = sweep.run_scenarios(config, [overrides_a, overrides_b], cli_args, replications,
+                                  workers, seed, common=common, antithetic=antithetic)
+    kpis = [{r["replication"]: sim.kpis(r) for r in results if r["scenario"] == n}
+            for n in range(2)]
+
+    rows = []
+    for kpi in replication.KPIS:
+        a = [kpis[0][i][kpi] for i in range(replications)]
+        b = [kpis[1][i][kpi] for i in range(replications)]
+        row = {"kpi": kpi}
+        row.update(variance_reduction(a, b, antithetic, confidence))
+        rows.append(row)
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare two scenarios with common random numbers.')
+    parser.add_argument("-c", "--config", type=str, default="config.json",
+                        help="base config, the overrides are applied to this")
+    parser.add_argument("-a", type=str, default="{}", metavar="OVERRIDES",
+                        help="JSON object (or file) of overrides of the first scenario")
+    parser.add_argument("-b", type=str, default="{}", metavar="OVERRIDES",
+                        help="JSON object (or file) of overrides of the second scenario")
+    parser.add_argument("-n", "--replications", type=int, default=10,
+                        help="replications of each scenario")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("-t", "--sim_time", type=int, default=None,
+                        help="simulation time in hours")
+    parser.add_argument("-e", "--engine", type=str, default="vector",
+                        choices=["step", "vector", "event", "corridor"], help="simulation engine")
+    parser.add_argument("--seed", type=int, default=None, help="seed rng")
+    parser.add_argument("--antithetic", action='store_true',
+                        help="run replications as antithetic pairs")
+    parser.add_argument("--independent", action='store_true',
+                        help="independent random streams per scenario, for reference")
+    args = parser.parse_args()
+    try:
+        check_replications(args.replications, args.antithetic)
+    except ValueError as e:
+        parser.error(str(e))
+
+    config = cfg.read_json(args.config)
+    if cfg.has_plane(config):
+        args.engine = "plane"
+    elif cfg.has_tower_list(config):
+        args.engine = "corridor"
+    if args.sim_time is not None:
+        config = cfg.apply_overrides(config, {"simulation.duration_hour": args.sim_time})
+
+    worker_args = argparse.Namespace(silent=True, supersilent=True, engine=args.engine)
+    seed = int(time.time()) if args.seed is None else args.seed
+
+    start_time = time.time()
+    rows = compare(config, sweep._load_json_arg(args.a), sweep._load_json_arg(args.b),
+                   worker_args, args.replications, args.workers, seed,
+                   common=not args.independent, antithetic=args.antithetic)
+    print("%d replications of 2 scenarios done in %d seconds, seed %d"
+          % (args.replications, time.time() - start_time, seed))
+
+    output.print_table(rows, COLUMNS, "Difference a - b (95% confidence), variance per run")
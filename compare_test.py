@@ -0,0 +1,65 @@
+import argparse
+import unittest
+import numpy as np
+
+import cfg
+import compare
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_variance_reduction(self):
+        rng = np.random.default_rng(3)
+        common = rng.normal(0, 1, 2000)
+        a = common + rng.normal(0, 0.1, 2000)
+        b = common + 0.5 + rng.normal(0, 0.1, 2000)
+
+        row = compare.variance_reduction(a, b)
+        self.assertAlmostEqual(row["difference"], -0.5, delta=3 * row["half_width"])
+        self.assertAlmostEqual(row["var_independent"], 2.02, delta=0.2)
+        self.assertAlmostEqual(row["var_paired"], 0.02, delta=0.005)
+        self.assertGreater(row["reduction"], 50)
+
+        # without anything in common there is nothing to gain
+        row = compare.variance_reduction(a, rng.permutation(b))
+        self.assertAlmostEqual(row["reduction"], 1.0, delta=0.2)
+
+    def test_antithetic_pairs(self):
+        # perfectly mirrored pairs cancel out
+        a = np.array([1.0, -1.0, 2.0, -2.0, 0.5, -0.5])
+        row = compare.variance_reduction(a, np.zeros(6), antithetic=True)
+        self.assertEqual(row["var_paired"], 0.0)
+        self.assertEqual(row["half_width"], 0.0)
+
+    def test_too_few_replications(self):
+        # only whole pairs, and enough of them to estimate a variance
+        with self.assertRaises(ValueError):
+            compare.variance_reduction(np.ones(5), np.zeros(5), antithetic=True)
+        with self.assertRaises(ValueError):
+            compare.variance_reduction(np.ones(2), np.zeros(2), antithetic=True)
+        with self.assertRaises(ValueError):
+            compare.variance_reduction(np.ones(1), np.zeros(1))
+
+    def test_same_scenario_same_streams(self):
+        # with common random numbers identical scenarios give identical runs
+        config = cfg.read_json("test_files/golden_config.json")
+        config["user"]["num_users"] = 200
+        args = argparse.Namespace(silent=True, supersilent=True, engine="vector")
+        rows = compare.compare(config, {}, {}, args, 4, workers=2, seed=2, antithetic=True)
+        for row in rows:
+            self.assertEqual(row["difference"], 0.0)
+            self.assertEqual(row["var_paired"], 0.0)
+
+    def test_common_random_numbers(self):
+        # a small change keeps most users doing the same in both scenarios
+        config = cfg.read_json("test_files/golden_config.json")
+        args = argparse.Namespace(silent=True, supersilent=True, engine="vector")
+        rows = compare.compare(config, {"base_station.traffic_channels": 30},
+                               {"base_station.traffic_channels": 32}, args, 6, workers=2, seed=1)
+        reduction = {row["kpi"]: row["reduction"] for row in rows}
+        self.assertGreater(reduction["gos"], 3)
+        self.assertGreater(reduction["block_capacity"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
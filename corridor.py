@@ -0,0 +1,250 @@
+import time
+import numpy as np
+
+import errors as err
+import histogram
+import output
+import rf
+import simulation as sim
+import tower as twr
+import user as usr
+import vectorized as vec
+
+
+def _rsl_matrix(geometry, height, idx, pos, towers, streams):
+    """RSL of users idx at every position (rows) from every tower (columns)."""
+    rsl = np.empty((len(pos), len(towers)))
+    fading = streams.fading_of(idx[:, np.newaxis], np.arange(len(towers)))
+    for t, tower in enumerate(towers):
+        rsl[:, t] = rf.RSL_array(geometry, pos, height, tower, streams, fading[:, t])
+    return rsl
+
+
+def _groups(tower_column):
+    """Yield (tower, rows) for every tower in tower_column, rows being the
+    indices of its entries in order. One sort instead of one scan per tower."""
+    order = np.argsort(tower_column, kind="stable")
+    towers, starts = np.unique(tower_column[order], return_index=True)
+    for t, rows in zip(towers, np.split(order, starts[1:])):
+        yield t, rows
+
+
+def _end_calls(users, idx, towers, done):
+    """Close the calls of users idx[done] that are done gracefully."""
+    ids = idx[done]
+    for t, rows in _groups(users.tower[ids]):
+        towers[t].release_many(ids[rows])
+        towers[t]._successful_conns += len(rows)
+        towers[t]._user_hung_up += len(rows)
+    users.disconnect(ids)
+
+
+def _leave(users, idx, towers, leaving, locations):
+    """Users idx[leaving] leave the simulated area, which counts as a
+    successful handover at locations[leaving]."""
+    ids, locations = idx[leaving], locations[leaving]
+    for t, rows in _groups(users.tower[ids]):
+        towers[t]._handover_attempt += len(rows)
+        towers[t]._handover_success += len(rows)
+        towers[t].release_many(ids[rows])
+        towers[t]._handover_success_locations.add_array(locations[rows])
+    users.disconnect(ids)
+
+
+def _drop(users, idx, towers, lost):
+    """Drop the calls of users idx[lost] due to poor RSL."""
+    ids = idx[lost]
+    for t, rows in _groups(users.tower[ids]):
+        towers[t].release_many(ids[rows])
+        towers[t]._dropped += len(rows)
+    users.disconnect(ids)
+
+
+def _hand_over(users, idx, towers, handoff, target, rsl_target, locations):
+    """Hand users idx[handoff] over to the towers in target, as far as they
+    have free channels. Successes and failures are counted on the tower
+    handing over, at locations."""
+    ids = idx[handoff]
+    if len(ids) == 0:
+        return
+    target, rsl_target, locations = target[handoff], rsl_target[handoff], locations[handoff]
+    source = users.tower[ids]
+
+    admitted = np.zeros(len(ids), dtype=bool)
+    for t, rows in _groups(target):
+        admitted[rows] = towers[t].admit(ids[rows], rsl_target[rows], users.rsl_threshold) == err.OK
+
+    for s, rows in _groups(source):
+        moved = admitted[rows]
+        num_moved = int(np.count_nonzero(moved))
+        towers[s]._handover_attempt += len(rows)
+        towers[s]._handover_failure += len(rows) - num_moved
+        towers[s]._handover_success += num_moved
+        towers[s].release_many(ids[rows[moved]])
+        towers[s]._handover_failure_locations.add_array(locations[rows[~moved]])
+        towers[s]._handover_success_locations.add_array(locations[rows[moved]])
+    users.tower[ids[admitted]] = target[admitted]
+
+
+def _connect(users, callers, towers, ranked, ranked_rsl, streams):
+    """Connect callers to the tower in the first column of ranked, falling
+    back on the second column (if any) when that fails. ranked_rsl holds the
+    RSL towards each of them."""
+    connected_to = np.full(len(callers), vec.NOT_CONNECTED, dtype=users.tower.dtype)
+    for t, sel in _groups(ranked[:, 0]):
+        admitted = towers[t].admit(callers[sel], ranked_rsl[sel, 0], users.rsl_threshold) == err.OK
+        connected_to[sel[admitted]] = t
+
+        retry = sel[~admitted]
+        if len(retry) == 0:
+            continue
+        num_saved = 0
+        if ranked.shape[1] > 1:
+            for s, rows in _groups(ranked[retry, 1]):
+                other = retry[rows]
+                saved = towers[s].admit(callers[other], ranked_rsl[other, 1], users.rsl_threshold,
+                                        primary=False) == err.OK
+                connected_to[other[saved]] = s
+                num_saved += int(np.count_nonzero(saved))
+        towers[t].saved_by_secondary(num_saved)
+        towers[t].failed_to_connect(len(retry) - num_saved)
+
+    ok = connected_to != vec.NOT_CONNECTED
+    connected = callers[ok]
+    users.tower[connected] = connected_to[ok]
+    users.time_remaining[connected] = streams.call_times_of(connected, users.avg_call_duration)
+
+
+def _update_calls(users, idx, geometry, towers, streams):
+    """Advance all connected users one timestep. Same rules as
+    vectorized._update_calls, with the best of all towers as the handover
+    candidate."""
+    # move users
+    pos = users.pos[idx]
+    speed = np.where(pos > geometry.parking_end, users.road_speed, users.mall_speed)
+    pos += speed * users.direction[idx]
+    users.pos[idx] = pos
+
+    # close calls that are done gracefully
+    users.time_remaining[idx] -= 1
+    done = users.time_remaining[idx] < 0
+    _end_calls(users, idx, towers, done)
+    idx, pos = idx[~done], pos[~done]
+
+    # users leaving the corridor on either end count as successful handovers
+    end = np.where(users.direction[idx] == 1, geometry.road_end, 0.0)
+    leaving = (pos - end) * users.direction[idx] >= -1.0
+    _leave(users, idx, towers, leaving, pos)
+    idx, pos = idx[~leaving], pos[~leaving]
+    if len(idx) == 0:
+        return
+
+    # one RSL value per user and tower
+    rsl = _rsl_matrix(geometry, users.height, idx, pos, towers, streams)
+    rows = np.arange(len(idx))
+    rsl_pri = rsl[rows, users.tower[idx]]
+
+    # drop calls due to poor RSL
+    lost = rsl_pri < users.rsl_threshold
+    _drop(users, idx, towers, lost)
+
+    # hand over to the best tower if it is stronger than the current one
+    best = np.argmax(rsl, axis=1)
+    handoff = ~lost & (rsl[rows, best] > rsl_pri)
+    _hand_over(users, idx, towers, handoff, best, rsl[rows, best], pos)
+
+
+def _new_calls(users, idle, geometry, towers, streams):
+    """Let idle users decide whether to call, and connect the ones that do
+    to the tower with the best RSL, falling back on the second best."""
+    callers = idle[streams.want_calls_of(idle)]
+    if len(callers) == 0:
+        return
+
+    # spawn callers at some position
+    pos, direction = usr.random_positions(geometry, len(callers), streams, callers)
+    users.pos[callers] = pos
+    users.direction[callers] = direction
+
+    rsl = _rsl_matrix(geometry, users.height, callers, pos, towers, streams)
+    ranked = np.argsort(-rsl, axis=1)[:, :2]
+    _connect(users, callers, towers, ranked, np.take_along_axis(rsl, ranked, axis=1), streams)
+
+
+def description(tower, n):
+    """Name of tower number n for printing."""
+    kind = "Small Cell" if tower.tower_type == twr.SMALL_CELL else "Base Station"
+    return "{} {} ({:.0f} m)".format(kind, n, tower.pos)
+
+
+def handoff_data(towers):
+    """Handover success and failure histograms merged over all towers."""
+    return (histogram.merged([tower.dump_handoff_data()[0] for tower in towers]),
+            histogram.merged([tower.dump_handoff_data()[1] for tower in towers]))
+
+
+def summarize(towers, runtime, avg_channels):
+    """Statistics of a finished corridor simulation, the same as
+    simulation.summarize with the counters of every tower stored under
+    tower_0, tower_1, ... avg_calls_base and avg_calls_cell are the average
+    channels in use summed over all base stations and all small cells."""
+    base = sum(avg for tower, avg in zip(towers, avg_channels) if tower.tower_type != twr.SMALL_CELL)
+    cell = sum(avg for tower, avg in zip(towers, avg_channels) if tower.tower_type == twr.SMALL_CELL)
+    names = ["tower_%d" % n for n in range(len(towers))]
+
+    stats = sim.summarize_towers(towers, names, runtime, float(base), float(cell))
+    for name, avg in zip(names, avg_channels):
+        stats["towers"][name]["avg_channels"] = float(avg)
+    return stats
+
+
+def simulate(towers, geometry, sim_opts, user_opts, cli_args, streams, telemetry=None,
+             progress=None):
+    """Run the simulation with any number of towers along the road, the
+    whole population advanced one timestep at a time using array
+    operations. Calls connect to the tower with the best RSL and are handed
+    over whenever another tower is stronger, all decided from one users x
+    towers RSL matrix per timestep.
+    """
+    start_time = time.time()
+
+    users = vec.Population(sim_opts.num_users, user_opts, len(towers))
+
+    # bin the handover positions over the whole corridor
+    coarse = histogram.coarse_bins(geometry.road_end)
+    for tower in towers:
+        tower._handover_success_locations = histogram.LocationHistogram(coarse)
+        tower._handover_failure_locations = histogram.LocationHistogram(coarse)
+
+    # run simulation
+    tot = np.zeros(len(towers))
+    labels = [description(tower, n) + ":" for n, tower in enumerate(towers)]
+    for i in range(sim_opts.iterations):
+
+        # print status updates
+        sim.hourly_update(i, towers, labels, cli_args, telemetry, progress)
+        streams.set_time(i)
+
+        tot += [tower._channels_in_use for tower in towers]
+        if telemetry is not None:
+            telemetry.advance(i + 1)
+
+        # simulate timestep, idle users are determined before anyone moves
+        connected = np.flatnonzero(users.tower != vec.NOT_CONNECTED)
+        idle = np.flatnonzero(users.tower == vec.NOT_CONNECTED)
+        if len(connected) > 0:
+            _update_calls(users, connected, geometry, towers, streams)
+        _new_calls(users, idle, geometry, towers, streams)
+
+    if telemetry is not None:
+        telemetry.finish()
+
+    end_time = time.time()
+    runtime = end_time - start_time
+
+    if not cli_args.supersilent:
+        output.print_sim_summary(geometry, sim_opts, runtime)
+        for n, tower in enumerate(towers):
+            output.print_tower_summary(tower, "Summary " + description(tower, n))
+
+    return summarize(towers, runtime, tot / float(i))
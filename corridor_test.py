@@ -0,0 +1,71 @@
+import argparse
+import unittest
+import numpy as np
+
+import cfg
+import corridor
+import streams as rnd
+import tower as twr
+import vectorized
+
+
+class TestCorridor(unittest.TestCase):
+
+    def setUp(self):
+        config = cfg.read_json("corridor_config.json")
+        self.geometry = cfg.Geometry(config)
+        self.sim_opts = cfg.SimOptions(config)
+        self.user_opts = cfg.UserOptions(config)
+        self.towers = [twr.Tower(opts) for opts in cfg.tower_list(config)]
+        self.args = argparse.Namespace(silent=True, supersilent=True)
+
+        self.streams = rnd.RandomStreams(1, call_rate=10)
+        self.streams.init_shadowing(self.sim_opts, self.geometry)
+
+    def test_channels_match_connected_users(self):
+        users = vectorized.Population(self.sim_opts.num_users, self.user_opts, len(self.towers))
+        for i in range(600):
+            connected = np.flatnonzero(users.tower != vectorized.NOT_CONNECTED)
+            idle = np.flatnonzero(users.tower == vectorized.NOT_CONNECTED)
+            if len(connected) > 0:
+                corridor._update_calls(users, connected, self.geometry, self.towers, self.streams)
+            corridor._new_calls(users, idle, self.geometry, self.towers, self.streams)
+
+            for t, tower in enumerate(self.towers):
+                self.assertEqual(sorted(tower._channel_of), np.flatnonzero(users.tower == t).tolist())
+                self.assertEqual(tower._channels_in_use, np.count_nonzero(users.tower == t))
+                self.assertLessEqual(tower._channels_in_use, tower.channels)
+
+    def test_connect_to_strongest_tower(self):
+        # everyone calls at once
+        streams = rnd.RandomStreams(1, call_rate=3600)
+        streams.init_shadowing(self.sim_opts, self.geometry)
+        users = vectorized.Population(self.sim_opts.num_users, self.user_opts, len(self.towers))
+        corridor._new_calls(users, np.arange(self.sim_opts.num_users), self.geometry,
+                            self.towers, streams)
+
+        # users on the road past the parking lot mostly connect to the
+        # nearest of the base stations placed every 1000 m
+        connected = np.flatnonzero((users.tower > 0) & (users.pos > 1000))
+        self.assertGreater(len(connected), 100)
+        nearest = np.rint(users.pos[connected] / 1000.0)
+        self.assertGreater(np.mean(users.tower[connected] == nearest), 0.8)
+
+    def test_simulate(self):
+        self.sim_opts.iterations = 900
+        stats = corridor.simulate(self.towers, self.geometry, self.sim_opts, self.user_opts,
+                                  self.args, self.streams)
+
+        self.assertEqual(len(stats["towers"]), len(self.towers))
+        self.assertEqual(stats["total_call_attempts"],
+                         sum(t._connections_attempts for t in self.towers))
+        self.assertGreater(stats["total_handover_success"], 0)
+
+        # handover positions are binned over the whole corridor
+        success, failure = corridor.handoff_data(self.towers)
+        far = success.coarse.edges()[:-1] > 3000
+        self.assertGreater(success.coarse.counts[far].sum(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
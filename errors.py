@@ -2,6 +2,9 @@
 LOW_SIGNAL = 0
 NO_FREE_CHANNELS = 1
 
+# status of a successful connection, see tower.Tower.try_connect and admit
+OK = 2
+
 
 class ConnectionError(Exception):
     """Exception thrown when a user fail to connect to a 
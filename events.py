@@ -0,0 +1,175 @@
+import heapq
+import time
+
+import output
+import rf
+import simulation as sim
+
+# event types, also the order events for the same user are handled
+# within one second
+STATUS = 0
+CALL_END = 1
+EXIT = 2
+RSL_CHECK = 3
+CALL_ARRIVAL = 4
+
+
+class Scheduler:
+    """Priority queue of events ordered by (time, user id, event type).
+    Ordering on user id makes events within one second happen in the same
+    order as the time-stepped engine visits the users."""
+
+    def __init__(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, t, uid, kind, serial=0):
+        heapq.heappush(self._heap, (t, uid, kind, serial))
+
+    def pop(self):
+        return heapq.heappop(self._heap)
+
+
+class _Occupancy:
+    """Time integral of channels in use, sampled at the start of every
+    second like the time-stepped engine does."""
+
+    def __init__(self, towers):
+        self.towers = towers
+        self.area = [0] * len(towers)
+        self.last_t = 0
+
+    def advance(self, t):
+        if t <= self.last_t:
+            return
+        for n, tower in enumerate(self.towers):
+            self.area[n] += tower._channels_in_use * (t - self.last_t)
+        self.last_t = t
+
+
+def _steps_to_exit(user, geometry, end, limit):
+    """Number of timesteps until the user is within 1m of the end of the
+    area, or None if that does not happen within limit steps. Moves a copy
+    of the position the same way User.update_pos does."""
+    pos = user.pos
+    for k in range(1, limit + 1):
+        speed = user.road_speed if pos > geometry.parking_end else user.mall_speed
+        pos += speed * user.direction
+        if rf.near(1, pos, end):
+            return k
+    return None
+
+
+def simulate(base_station, small_cell, users, geometry, sim_opts, cli_args, streams,
+             telemetry=None, progress=None):
+    """Run the simulation as a discrete-event simulation. Idle users are only
+    visited when their next call arrives, connected users get an RSL check
+    every second. Produces the same statistics as simulation.simulate.
+    """
+    start_time = time.time()
+
+    stop = sim_opts.iterations
+    serial = [0] * len(users)  # invalidates pending events of a finished call
+    call_end = [0] * len(users)  # time of the end or exit event of the current call
+
+    events = Scheduler()
+    occupancy = _Occupancy([base_station, small_cell])
+
+    def next_call(u, t):
+        # number of seconds until want_call would have returned true
+        t_next = t + streams.time_to_call()
+        if t_next < stop:
+            events.schedule(t_next, u.id, CALL_ARRIVAL, serial[u.id])
+
+    def call_over(u, t):
+        u.disconnect()
+        serial[u.id] += 1
+        next_call(u, t)
+
+    # first calls, want_call is first asked at t = 0
+    for u in users:
+        next_call(u, -1)
+    for hour in range(1, (stop - 1) // 3600 + 1):
+        events.schedule(hour * 3600, -1, STATUS)
+
+    while len(events) > 0:
+        t, uid, kind, ev_serial = events.pop()
+        occupancy.advance(t)
+        if telemetry is not None:
+            telemetry.advance(t)
+
+        if kind == STATUS:
+            sim.status_update(t, base_station, small_cell, cli_args, telemetry, progress)
+            continue
+
+        u = users[uid]
+        if ev_serial != serial[uid]:
+            # event belongs to a call that has already ended
+            continue
+
+        if kind == CALL_ARRIVAL:
+            u.wants_to_call = True
+            u.start_call(geometry, base_station, small_cell, streams)
+
+            if u.connected_to is None:
+                next_call(u, t)
+                continue
+
+            # the call ends when the call time runs out, or earlier if
+            # the user leaves the area on either side
+            t_end, end_kind = t + u.time_remaining + 1, CALL_END
+            end = base_station.pos if u.direction == 1 else small_cell.pos
+            steps = _steps_to_exit(u, geometry, end, u.time_remaining)
+            if steps is not None:
+                t_end, end_kind = t + steps, EXIT
+
+            if t_end < stop:
+                events.schedule(t_end, uid, end_kind, serial[uid])
+            if t + 1 < min(t_end, stop):
+                events.schedule(t + 1, uid, RSL_CHECK, serial[uid])
+            call_end[uid] = t_end
+
+        elif kind == RSL_CHECK:
+            u.update_pos(geometry)
+            primary, secondary = u.towers(base_station, small_cell)
+            u.check_signal(geometry, primary, secondary, streams)
+
+            if u.connected_to is None:
+                # call dropped
+                call_over(u, t)
+            elif t + 1 < min(call_end[uid], stop):
+                events.schedule(t + 1, uid, RSL_CHECK, serial[uid])
+
+        elif kind == CALL_END:
+            primary, _ = u.towers(base_station, small_cell)
+            primary.disconnect(u, call_done=True)
+            call_over(u, t)
+
+        elif kind == EXIT:
+            # count as successful handover
+            u.update_pos(geometry)
+            primary, _ = u.towers(base_station, small_cell)
+            primary.handover_attempt()
+            primary.hand_over(u)
+            call_over(u, t)
+
+    occupancy.advance(stop)
+    if telemetry is not None:
+        telemetry.advance(stop)
+        telemetry.finish()
+
+    end_time = time.time()
+    runtime = end_time - start_time
+
+    if not cli_args.supersilent:
+        output.print_sim_summary(geometry, sim_opts, runtime)
+        output.print_tower_summary(base_station, "Summary Base Station")
+        output.print_tower_summary(small_cell, "Summary Small Cell")
+
+    # same normalization as the time-stepped engine
+    avg_calls_base = float(occupancy.area[0]) / float(stop - 1)
+    avg_calls_cell = float(occupancy.area[1]) / float(stop - 1)
+
+    return sim.summarize(base_station, small_cell, runtime, avg_calls_base, avg_calls_cell)
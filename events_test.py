@@ -0,0 +1,41 @@
+import unittest
+
+import cfg
+import events
+import user as usr
+
+
+class TestEvents(unittest.TestCase):
+
+    def test_scheduler_order(self):
+        q = events.Scheduler()
+        q.schedule(5, 2, events.RSL_CHECK)
+        q.schedule(5, -1, events.STATUS)
+        q.schedule(3, 7, events.CALL_ARRIVAL)
+        q.schedule(5, 1, events.CALL_END)
+
+        got = [q.pop()[:3] for i in range(len(q))]
+        self.assertEqual(got, [(3, 7, events.CALL_ARRIVAL), (5, -1, events.STATUS),
+                               (5, 1, events.CALL_END), (5, 2, events.RSL_CHECK)])
+
+    def test_steps_to_exit(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        geometry = cfg.Geometry(config)
+        user_cfg = cfg.UserOptions(config)
+
+        # drive towards the small cell at 0 and count the timesteps manually
+        u = usr.User(0, user_cfg, pos=412.3)
+        u.direction = -1
+        steps = events._steps_to_exit(u, geometry, 0.0, 1000)
+        self.assertEqual(u.pos, 412.3, "position of the user must not change")
+
+        for k in range(steps):
+            self.assertGreater(abs(u.pos), 1)
+            u.update_pos(geometry)
+        self.assertLessEqual(abs(u.pos), 1)
+
+        self.assertIsNone(events._steps_to_exit(u, geometry, 3000.0, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
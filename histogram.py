@@ -0,0 +1,90 @@
+import numpy as np
+
+# bins over the whole area, and around the mall entry, as (bins, low, high)
+COARSE = (600, 1, 2999)
+FINE = (80, 180, 220)
+
+
+def coarse_bins(road_end):
+    """Bins of the same 5 m width as COARSE over a road of any length."""
+    return (int(road_end) // 5, 1, road_end - 1)
+
+
+class Histogram:
+    """Counts of values in equal width bins over [low, high], values outside
+    the range are ignored like numpy.histogram does. Memory use only depends
+    on the number of bins, and histograms with the same bins can be merged."""
+
+    def __init__(self, bins, low, high):
+        self.low = low
+        self.high = high
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self._scale = bins / float(high - low)
+
+    def add(self, x):
+        if self.low <= x <= self.high:
+            idx = min(int((x - self.low) * self._scale), len(self.counts) - 1)
+            self.counts[idx] += 1
+
+    def add_array(self, xs):
+        """Same binning as add, much cheaper than numpy.histogram for the
+        small arrays added every timestep."""
+        if len(xs) > 0:
+            xs = xs[(self.low <= xs) & (xs <= self.high)]
+            idx = np.minimum(((xs - self.low) * self._scale).astype(np.int64), len(self.counts) - 1)
+            self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    def bins(self):
+        return (len(self.counts), self.low, self.high)
+
+    def merge(self, other):
+        if other.bins() != self.bins():
+            raise ValueError("cannot merge histograms with different bins")
+        self.counts += other.counts
+
+    def edges(self):
+        return np.linspace(self.low, self.high, len(self.counts) + 1)
+
+    def total(self):
+        return int(self.counts.sum())
+
+
+class LocationHistogram:
+    """Positions of events (e.g. handovers), binned over the whole area and
+    at a higher resolution around the mall entry. coarse gives the bins
+    over the whole area, see coarse_bins."""
+
+    def __init__(self, coarse=COARSE):
+        self.coarse = Histogram(*coarse)
+        self.fine = Histogram(*FINE)
+
+    def add(self, pos):
+        self.coarse.add(pos)
+        self.fine.add(pos)
+
+    def add_array(self, pos):
+        self.coarse.add_array(pos)
+        self.fine.add_array(pos)
+
+    def merge(self, other):
+        self.coarse.merge(other.coarse)
+        self.fine.merge(other.fine)
+
+    def to_arrays(self, prefix):
+        """Counts as a dictionary of arrays, e.g. for numpy.savez."""
+        return {prefix + "_coarse": self.coarse.counts, prefix + "_fine": self.fine.counts}
+
+    @staticmethod
+    def from_arrays(arrays, prefix, coarse=COARSE):
+        hist = LocationHistogram(coarse)
+        hist.coarse.counts += arrays[prefix + "_coarse"]
+        hist.fine.counts += arrays[prefix + "_fine"]
+        return hist
+
+
+def merged(histograms):
+    """Merge a list of LocationHistograms into a new one."""
+    total = LocationHistogram(histograms[0].coarse.bins() if histograms else COARSE)
+    for hist in histograms:
+        total.merge(hist)
+    return total
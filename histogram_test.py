@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+
+import histogram
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_add(self):
+        xs = np.random.default_rng(1).uniform(-100, 3100, 5000)
+        xs[:3] = [1, 2999, 200]  # edges are included
+
+        one = histogram.Histogram(*histogram.COARSE)
+        for x in xs:
+            one.add(x)
+        batch = histogram.Histogram(*histogram.COARSE)
+        batch.add_array(xs)
+
+        expected = np.histogram(xs, 600, (1, 2999))[0]
+        self.assertEqual(batch.counts.tolist(), expected.tolist())
+        self.assertEqual(one.counts.tolist(), expected.tolist())
+
+    def test_merge(self):
+        rng = np.random.default_rng(2)
+        parts = []
+        for n in range(3):
+            h = histogram.LocationHistogram()
+            h.add_array(rng.uniform(170, 230, 100))
+            parts.append(h)
+
+        total = histogram.merged(parts)
+        self.assertEqual(total.fine.total(), sum(h.fine.total() for h in parts))
+        self.assertEqual(total.coarse.counts.tolist(),
+                         sum(h.coarse.counts for h in parts).tolist())
+
+        with self.assertRaises(ValueError):
+            total.coarse.merge(total.fine)
+
+    def test_arrays(self):
+        h = histogram.LocationHistogram()
+        h.add_array(np.array([185.5, 190.0, 1500.0]))
+        copy = histogram.LocationHistogram.from_arrays(h.to_arrays("x"), "x")
+        self.assertEqual(copy.fine.counts.tolist(), h.fine.counts.tolist())
+        self.assertEqual(copy.coarse.total(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
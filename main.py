@@ -1,15 +1,25 @@
 #!/usr/bin/env python
 import argparse
+import json
+import os
 import sys
-import numpy as np
 import time
 
+import cache as rcache
 import cfg
+import checkpoint as ckpt
+import corridor
+import histogram
 import output
-import rf
+import plane
+import profiling
+import progress as prog
+import replication
+import results
 import simulation as sim
+import streams as rnd
+import telemetry
 import tower as twr
-import user as usr
 
 
 def errprint(*args, **kwargs):
@@ -17,6 +27,28 @@ def errprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
+def handoff_data():
+    """ handover histograms of all towers of a corridor or plane, else of the base station """
+    if args.engine in ("corridor", "plane"):
+        return corridor.handoff_data(towers)
+    return base_station.dump_handoff_data()
+
+
+def start_progress():
+    """ reporter and progress of this run if --progress is given, else None """
+    if args.progress is None:
+        return None, None
+    reporter = prog.Reporter(args.progress)
+    run = os.path.splitext(os.path.basename(args.config))[0]
+    return reporter, prog.Progress(reporter, run, towers, sim_opts.iterations)
+
+
+def finish_progress(reporter, tracker):
+    if reporter is not None:
+        tracker.finish(sim.kpis(stats))
+        reporter.close()
+
+
 # parse command line arguments. cmd args override options in config file
 parser = argparse.ArgumentParser(description='GSM Simulation.')
 parser.add_argument("-c", "--config", type=str, default="config.json")
@@ -28,22 +60,68 @@ parser.add_argument("-s", "--silent", action='store_true',
                     help="don't show status updates every hour")
 parser.add_argument("-ss", "--supersilent", action='store_true', help="don't even shown summary")
 parser.add_argument("-p", "--plot", action='store_true',
-                    help="plot handover histogram when simulation is done")
+                    help="plot handover histogram when simulation is done "
+                         "(saved to handovers.png without a display)")
 parser.add_argument("-m", "--multithread", action='store_true',
-                    help="run 5 simulations concurrently")
+                    help="run several independent replications on a process pool")
+parser.add_argument("-n", "--replications", type=int, default=5,
+                    help="number of replications to run with -m (maximum with --tolerance)")
+parser.add_argument("--tolerance", type=float, default=None,
+                    help="with -m, run replications until the 95%% confidence interval of "
+                         "every KPI is within this fraction of its mean")
+parser.add_argument("-w", "--workers", type=int, default=None,
+                    help="number of worker processes for -m (default: number of cores)")
 parser.add_argument("-o", "--output", type=str, default="results/sim",
                     help="name of output files (for multi thread)")
 parser.add_argument("--seed", type=int, nargs=1, default=-1, help="seed rng")
+parser.add_argument("-e", "--engine", type=str, default="step", choices=["step", "vector", "event", "corridor"],
+                    help="simulation engine, one user object at a time (step), "
+                         "the whole population as arrays (vector), discrete-event (event) "
+                         "or arrays with any number of towers (corridor, always used for "
+                         "configs with a towers list, configs with a plane use the plane engine)")
+parser.add_argument("--cache", type=str, default=None, metavar="DIR",
+                    help="look up and store results in a result cache in DIR")
+parser.add_argument("--results", type=str, default=None, metavar="CSV",
+                    help="append config, seed and statistics of every run to CSV")
+parser.add_argument("--telemetry", type=str, default=None, metavar="NAME",
+                    help="save channels in use every second and hourly counters to NAME.npz "
+                         "(NAME_{replication}.npz with -m)")
+parser.add_argument("--telemetry-every", type=int, default=1, metavar="N",
+                    help="only keep the channels in use every N seconds")
+parser.add_argument("--telemetry-mmap", action='store_true',
+                    help="keep the channels in use of a single run in the memory mapped file "
+                         "NAME_channels.npy instead of in memory (with -m they are always in "
+                         "shared memory mapped arrays)")
+parser.add_argument("--checkpoint", type=str, default=None, metavar="FILE",
+                    help="save the simulation state to FILE every simulated hour (step engine)")
+parser.add_argument("--resume", type=str, default=None, metavar="FILE",
+                    help="continue the simulation saved in checkpoint FILE")
+parser.add_argument("--profile", type=str, nargs="?", const="", default=None, metavar="FILE",
+                    help="count calls and time of the hot paths, per simulated hour, "
+                         "and optionally save the report as json to FILE")
+parser.add_argument("--progress", type=str, default=None, metavar="FILE",
+                    help="append a json line with the progress of every run to FILE "
+                         "every simulated hour, see progress.py to follow it")
 args = parser.parse_args()
 
 config = cfg.read_json(args.config)
+if cfg.has_plane(config):
+    args.engine = "plane"
+elif cfg.has_tower_list(config):
+    args.engine = "corridor"
+
+if (args.checkpoint is not None or args.resume is not None) and args.engine != "step":
+    errprint("checkpoints are only supported by the step engine")
+    sys.exit(1)
 
 # extract options from config dictionary
 sim_opts = cfg.SimOptions(config)
 user_opts = cfg.UserOptions(config)
-geometry = cfg.Geometry(config)
-base_opts = cfg.TowerOptions(config, twr.BASE_STATION)
-small_opts = cfg.TowerOptions(config, twr.SMALL_CELL)
+geometry = cfg.PlaneGeometry(config) if cfg.has_plane(config) else cfg.Geometry(config)
+tower_opts = cfg.tower_list(config)
+base_opts, small_opts = None, None
+if not cfg.has_tower_list(config):
+    base_opts, small_opts = tower_opts
 
 # override config file if flags are set
 if args.sim_time != -1:
@@ -60,33 +138,143 @@ if args.distance != -1:
 # seed rng
 seed = int(time.time()) if args.seed == -1 else args.seed[0]
 sim_opts.seed = seed
-np.random.seed(seed)
 
 # set up simulation
-base_station = twr.Tower(base_opts)
-small_cell = twr.Tower(small_opts)
-users = usr.init_users(sim_opts.num_users, user_opts)
+towers = [twr.Tower(opts) for opts in tower_opts]
+if not cfg.has_tower_list(config):
+    base_station, small_cell = towers
+
+# random values are drawn in bounded chunks while simulating
+streams = rnd.RandomStreams(seed, sim_opts.call_rate)
+if cfg.has_plane(config):
+    streams.init_shadow_raster(sim_opts, geometry)
+else:
+    streams.init_shadowing(sim_opts, geometry)
+
+# command line overrides are part of the cache key, as they are not in the config
+overrides = {"sim_time": args.sim_time, "distance": args.distance, "engine": args.engine}
 
-# pre compute random values (for performance)
-rf.init_shadowing(sim_opts, geometry)
-max_possible_dails = sim_opts.num_users * sim_opts.iterations
-rf.init_call_probabilities(max_possible_dails, sim_opts.call_rate)
+results_writer = None if args.results is None else results.ResultsWriter(args.results)
 
 if args.multithread:
     # run simulation concurrently
     print("multi threading activated")
-    sim.multi_sim(base_opts, small_opts, user_opts, sim_opts, geometry, args, 5)
+    scenario = replication.Scenario(base_opts, small_opts, user_opts, sim_opts, geometry, args)
+    scenario.config = config
+    if cfg.has_tower_list(config):
+        scenario.tower_opts = tower_opts
+    scenario.overrides = overrides
+    scenario.cache_dir = args.cache
+    scenario.results_path = args.results
+    scenario.telemetry_path = args.telemetry
+    scenario.telemetry_every = args.telemetry_every
+    scenario.profile = args.profile is not None
+    scenario.progress_path = args.progress
+    replication.multi_sim(scenario, args.replications, args.workers, args.tolerance)
     exit(0)
+elif args.resume is not None:
+    # everything but the command line flags is restored from the checkpoint
+    state = ckpt.load(args.resume)
+    base_station, small_cell = state["base_station"], state["small_cell"]
+    towers = [base_station, small_cell]
+    geometry, sim_opts = state["geometry"], state["sim_opts"]
+    seed = sim_opts.seed
+    print("resuming at t = %d s" % state["i"])
+
+    # the result is stored under the key of the run that was checkpointed
+    cache = None
+    if args.cache is not None:
+        cache = rcache.ResultCache(args.cache)
+        key = rcache.cache_key(config, overrides, seed)
+
+    reporter, tracker = start_progress()
+    stats = sim.resume(state, args, args.checkpoint, tracker)
+    finish_progress(reporter, tracker)
+    if state["telemetry"] is not None and args.telemetry is not None:
+        state["telemetry"].save(args.telemetry)
 else:
+    cache = None
+    if args.cache is not None:
+        cache = rcache.ResultCache(args.cache)
+        key = rcache.cache_key(config, overrides, seed)
+        cached = cache.get(key)
+        if cached is not None:
+            stats, arrays = cached
+            print("using cached result " + key)
+            if results_writer is not None:
+                results_writer.write(results.make_row(stats, config, overrides, seed))
+            if not args.supersilent:
+                output.print_aggregate_stats([stats])
+            if args.plot:
+                coarse = histogram.COARSE
+                if args.engine == "corridor":
+                    coarse = histogram.coarse_bins(geometry.road_end)
+                elif args.engine == "plane":
+                    coarse = plane.distance_bins(geometry)
+                output.handover_histogram((
+                    histogram.LocationHistogram.from_arrays(arrays, "handover_success", coarse),
+                    histogram.LocationHistogram.from_arrays(arrays, "handover_failure", coarse)))
+            exit(0)
+
+    recorder = None
+    if args.telemetry is not None:
+        path = args.telemetry + "_channels.npy" if args.telemetry_mmap else None
+        recorder = telemetry.Telemetry(towers, sim_opts.iterations, args.telemetry_every, path)
+
+    profiler = None
+    if args.profile is not None:
+        profiler = profiling.Profiler().install()
+
+    reporter, tracker = start_progress()
+
     # run sim once
-    stats = sim.simulate(base_station, small_cell, users, geometry, sim_opts, args)
+    if args.engine == "plane":
+        stats = plane.simulate(towers, geometry, sim_opts, user_opts, args, streams, recorder,
+                               tracker)
+    elif args.engine == "corridor":
+        stats = corridor.simulate(towers, geometry, sim_opts, user_opts, args, streams, recorder,
+                                  tracker)
+    else:
+        stats = sim.run(base_station, small_cell, geometry, sim_opts, user_opts, args, streams,
+                        recorder, args.checkpoint, tracker)
+    finish_progress(reporter, tracker)
+
+    if profiler is not None:
+        profiler.uninstall()
+        profiler.finish()
+        profiling.print_report(profiler.report())
+        if args.profile != "":
+            with open(args.profile, "w") as f:
+                json.dump(profiler.report(), f, indent=1)
+
+    if recorder is not None:
+        recorder.save(args.telemetry)
+
+# store the result of a single run, resumed or not
+if cache is not None:
+    success, failure = handoff_data()
+    arrays = success.to_arrays("handover_success")
+    arrays.update(failure.to_arrays("handover_failure"))
+    cache.put(key, stats, arrays)
+
+if results_writer is not None:
+    results_writer.write(results.make_row(stats, config, overrides, seed))
 
 # print summaries
 if not args.supersilent:
-    output.print_sim_summary(geometry, sim_opts, stats["runtime"])
-    output.print_tower_summary(base_station, "Summary Base Station")
-    output.print_tower_summary(small_cell, "Summary Small Cell")
+    if args.engine == "plane":
+        output.print_plane_summary(geometry, sim_opts, stats["runtime"])
+        for n, tower in enumerate(towers):
+            output.print_tower_summary(tower, "Summary " + plane.description(tower, n))
+    elif args.engine == "corridor":
+        output.print_sim_summary(geometry, sim_opts, stats["runtime"])
+        for n, tower in enumerate(towers):
+            output.print_tower_summary(tower, "Summary " + corridor.description(tower, n))
+    else:
+        output.print_sim_summary(geometry, sim_opts, stats["runtime"])
+        output.print_tower_summary(base_station, "Summary Base Station")
+        output.print_tower_summary(small_cell, "Summary Small Cell")
 
 # plotting
 if args.plot:
-    output.handover_histogram(base_station.dump_handoff_data())
+    output.handover_histogram(handoff_data())
@@ -1,27 +1,67 @@
-import matplotlib.pyplot as plt
+import multiprocessing
+import os
+import sys
 import tower
 
 
 # PLOTTING STUFF
 
-def handover_histogram(handover_data):
+# where plots are saved when there is no display to show them on
+PLOT_FILE = "handovers.png"
+
+
+def headless():
+    """True in worker processes and without a display, where plots are
+    rendered with the non-interactive Agg backend and saved to a file."""
+    if multiprocessing.parent_process() is not None:
+        return True
+    return sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or
+                                                     os.environ.get("WAYLAND_DISPLAY"))
+
+
+def _pyplot():
+    """Import pyplot on first use only, it takes longer than everything else
+    a simulation imports. The backend is chosen before the import, an
+    explicit MPLBACKEND wins."""
+    if "matplotlib.pyplot" not in sys.modules and "MPLBACKEND" not in os.environ and headless():
+        import matplotlib
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def __plot_counts(plt, hists):
+    """Plot pre-binned histograms with the same bins."""
+    for h in hists:
+        edges = h.edges()
+        plt.hist(edges[:-1], bins=edges, weights=h.counts)
+
+
+def handover_histogram(handover_data, filename=PLOT_FILE):
+    """Plot (success, failure) histogram.LocationHistograms. Shown in a
+    window, or saved to filename with a non-interactive backend."""
+    plt = _pyplot()
+    success, failure = handover_data
     plt.title("Handovers")
     plt.subplot(211)
-    plt.hist(handover_data[0], bins=600, range=(1, 2999))
-    plt.hist(handover_data[1], bins=600, range=(1, 2999))
+    __plot_counts(plt, [success.coarse, failure.coarse])
     plt.legend(("Successful handovers", "Unsuccessful handovers"))
     plt.xlabel("distance [m]")
 
     plt.subplot(212)
-    plt.hist(handover_data[0], bins=80, range=(180, 220))
-    plt.hist(handover_data[1], bins=80, range=(180, 220))
+    __plot_counts(plt, [success.fine, failure.fine])
     plt.xlim(180, 220)
     plt.legend(("Successful handovers", "Unsuccessful handovers"))
     plt.axvline(x=200, color='b', linestyle='-')
     plt.axvline(x=190, color='b', linestyle='-')
     plt.xlabel("distance [m]")
 
-    plt.show()
+    if plt.get_backend().lower() == "agg":
+        plt.savefig(filename)
+        plt.close()
+        print("handover histogram saved to " + filename)
+    else:
+        plt.show()
 
 
 # PRINTING STUFF
@@ -98,6 +138,23 @@ def print_sim_summary(geometry, sim_opts, sim_duration):
     print("-" * 50 + "\n")
 
 
+def print_plane_summary(geometry, sim_opts, sim_duration):
+    print(" {} ".format("Simulation Summary").center(50, "="))
+    print("simulation:")
+    print("\tcomputation time:       %4.1f [sec]" % sim_duration)
+    print("\tduration:               %4d [hour]" % sim_opts.duration)
+    print("\ttime step:              %4d [sec]" % sim_opts.timestep)
+    print("\trng seed:         %10d" % sim_opts.seed)
+
+    print("geometry:")
+    print("\twidth:                  %4d [m]" % geometry.width)
+    print("\theight:                 %4d [m]" % geometry.height)
+    print("\traster cell:            %4d [m]" % geometry.cell_size)
+    print("\tnearest towers:         %4d" % geometry.k_nearest)
+
+    print("-" * 50 + "\n")
+
+
 def print_aggregate_stats(stats_list):
     aggregate = {
         "total_call_attempts": 0,
@@ -177,3 +234,20 @@ def print_aggregate_stats(stats_list):
 
     print("   due to capacity:         %4d [%5.1f%%]" % (aggregate["total_fail_no_channel"], percent_no_chan))
     print("   due to signal:           %4d [%5.1f%%]" % (aggregate["total_fail_no_signal"], percent_no_sig))
+
+
+def print_table(rows, columns, description="Results"):
+    """Print rows (dictionaries) as a table with the given columns."""
+    def fmt(val):
+        if isinstance(val, float):
+            return "%.4g" % val
+        return str(val)
+
+    cells = [[fmt(row[col]) for col in columns] for row in rows]
+    widths = [max([len(col)] + [len(c[n]) for c in cells]) for n, col in enumerate(columns)]
+
+    __header(description)
+    print("  ".join(col.rjust(w) for col, w in zip(columns, widths)))
+    for c in cells:
+        print("  ".join(val.rjust(w) for val, w in zip(c, widths)))
+    __footer()
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# modules of a simulation, none of them should import pyplot until plotting
+MODULES = "simulation, replication, sweep, corridor, plane, progress, output"
+
+
+def _python(code, env=None):
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          env=env, check=True).stdout
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_no_pyplot_without_plots(self):
+        out = _python("import sys, %s; print('matplotlib.pyplot' in sys.modules)" % MODULES)
+        self.assertEqual(out.strip(), "False")
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "headless without DISPLAY on linux only")
+    def test_headless_plot_is_saved(self):
+        env = {k: v for k, v in os.environ.items() if k not in ("DISPLAY", "WAYLAND_DISPLAY",
+                                                               "MPLBACKEND")}
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "handovers.png")
+            _python("import histogram, output; h = histogram.LocationHistogram(); h.add(190.5); "
+                    "output.handover_histogram((h, h), %r)" % filename, env)
+            self.assertTrue(os.path.getsize(filename) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
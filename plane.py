@@ -0,0 +1,362 @@
+import time
+from math import ceil, hypot, sqrt
+import numpy as np
+
+import corridor
+import errors as err
+import histogram
+import output
+import rf
+import simulation as sim
+import tower as twr
+import vectorized as vec
+
+
+class GridIndex:
+    """Uniform grid over tower coordinates for k nearest tower queries.
+
+    For every grid cell the towers that can be among the k nearest of any
+    point inside it are found once: the smallest square of cells around it
+    holding k towers bounds the distance to the k-th nearest, and only towers
+    within that distance are kept as candidates. A query computes distances
+    to the candidates of its cell only.
+    """
+
+    def __init__(self, xy, k, cell_size, area=None):
+        self.xy = np.asarray(xy, dtype=float)
+        self.k = min(k, len(self.xy))
+        self.cell_size = float(cell_size)
+
+        # the grid covers all towers, and the area (x0, y0, x1, y1) if given
+        low, high = self.xy.min(axis=0), self.xy.max(axis=0)
+        if area is not None:
+            low = np.minimum(low, area[:2])
+            high = np.maximum(high, area[2:])
+        self.origin = low
+        self.shape = tuple(int(n) for n in np.floor((high - low) / self.cell_size) + 1)
+
+        # number of towers in every box of cells, from an integral image
+        cells = self._cells(self.xy)
+        counts = np.zeros(self.shape, dtype=np.int64)
+        np.add.at(counts, (cells[:, 0], cells[:, 1]), 1)
+        integral = np.zeros((self.shape[0] + 1, self.shape[1] + 1), dtype=np.int64)
+        integral[1:, 1:] = counts.cumsum(axis=0).cumsum(axis=1)
+
+        def in_box(cx, cy, r):
+            x0, x1 = max(cx - r, 0), min(cx + r + 1, self.shape[0])
+            y0, y1 = max(cy - r, 0), min(cy + r + 1, self.shape[1])
+            return integral[x1, y1] - integral[x0, y1] - integral[x1, y0] + integral[x0, y0]
+
+        candidates = []
+        for cx in range(self.shape[0]):
+            for cy in range(self.shape[1]):
+                r = 0
+                while in_box(cx, cy, r) < self.k:
+                    r += 1
+                # the k towers within r cells are at most (r + 1) * sqrt(2)
+                # cells away, towers more than R cells away are further
+                R = int(ceil((r + 1) * sqrt(2)))
+                near = np.all(np.abs(cells - (cx, cy)) <= R, axis=1)
+                candidates.append(np.flatnonzero(near))
+
+        # one row of candidates per cell, padded with -1
+        width = max(len(c) for c in candidates)
+        self._candidates = np.full((len(candidates), width), -1, dtype=np.int32)
+        for n, c in enumerate(candidates):
+            self._candidates[n, :len(c)] = c
+
+    def _cells(self, points):
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, np.array(self.shape) - 1)
+
+    def nearest(self, points):
+        """Return indices of the k nearest towers of every point, nearest
+        first, and the distances to them. Both are arrays of n x k."""
+        cells = self._cells(points)
+        candidates = self._candidates[cells[:, 0] * self.shape[1] + cells[:, 1]]
+
+        diff = self.xy[candidates] - points[:, np.newaxis, :]
+        dist = np.hypot(diff[..., 0], diff[..., 1])
+        dist[candidates < 0] = np.inf
+
+        if candidates.shape[1] > self.k:
+            cols = np.argpartition(dist, self.k - 1, axis=1)[:, :self.k]
+        else:
+            cols = np.broadcast_to(np.arange(self.k), (len(points), self.k))
+        cols = np.take_along_axis(cols, np.argsort(np.take_along_axis(dist, cols, axis=1), axis=1), axis=1)
+        return np.take_along_axis(candidates, cols, axis=1), np.take_along_axis(dist, cols, axis=1)
+
+
+def _propagation_tables(towers, user_height):
+    """Okamura-Hata loss of every tower at 1 km, and its increase per decade
+    of distance, so the loss at any distance is a table lookup."""
+    at_1km = np.array([rf.okamura_hata(1000.0, t.freq, t.height, user_height) for t in towers])
+    at_10km = np.array([rf.okamura_hata(10000.0, t.freq, t.height, user_height) for t in towers])
+    return at_1km, at_10km - at_1km
+
+
+def _cell_centers(geometry, cell):
+    size = geometry.cell_size
+    cols = geometry.raster_shape()[1]
+    return np.column_stack(((cell % cols + 0.5) * size, (cell // cols + 0.5) * size))
+
+
+def _loss_free_budget(towers, user_height, idx, dist):
+    EIRP = np.array([tower.EIRP for tower in towers])
+    at_1km, slope = _propagation_tables(towers, user_height)
+    d_km = np.maximum(dist, 1.0) / 1000.0
+    return EIRP[idx] - (at_1km[idx] + slope[idx] * np.log10(d_km))
+
+
+def link_tables(geometry, towers, user_height, chunk_size=65536):
+    """The tables of a LinkRaster that don't depend on random values: the k
+    nearest towers of every raster cell ("towers") and EIRP - propagation
+    towards them ("budget"), both arrays of cells x k. They are the same for
+    every replication, see shared.StaticTables to compute them only once."""
+    rows, cols = geometry.raster_shape()
+    xy = np.array([tower.xy for tower in towers])
+    index = GridIndex(xy, geometry.k_nearest, geometry.grid_cell_size,
+                      (0.0, 0.0, geometry.width, geometry.height))
+
+    num_cells = rows * cols
+    tables = {"towers": np.empty((num_cells, index.k), dtype=np.int32),
+              "budget": np.empty((num_cells, index.k))}
+    for start in range(0, num_cells, chunk_size):
+        cell = np.arange(start, min(start + chunk_size, num_cells))
+        idx, dist = index.nearest(_cell_centers(geometry, cell))
+        tables["towers"][cell] = idx
+        tables["budget"][cell] = _loss_free_budget(towers, user_height, idx, dist)
+    return tables
+
+
+def tables_key(geometry, towers, user_height):
+    """Tuple identifying the link_tables of a deployment."""
+    return (geometry.key(), user_height,
+            tuple((tuple(t.xy), t.freq, t.height, t.EIRP) for t in towers))
+
+
+class LinkRaster:
+    """Static link budget, EIRP - propagation - shadowing, from the k nearest
+    towers to the centre of every raster cell of a cfg.PlaneGeometry. This is
+    the 2D counterpart of the link budget map along the road, the candidate
+    towers of a user are the ones of the cell it is in. There is no wall
+    loss in the plane, and shadowing applies to every tower.
+
+    The shadowing is only subtracted on lookup, so the rest of the budget
+    can be tables of link_tables shared by all replications, which are used
+    read-only if given.
+    """
+
+    def __init__(self, geometry, towers, user_height, shadows, tables=None):
+        self.geometry = geometry
+        self.rows, self.cols = geometry.raster_shape()
+        if shadows.shape != (self.rows, self.cols):
+            raise err.InitializationError("run \"init_shadow_raster\" first")
+        self.shadows = shadows.ravel()
+
+        self.xy = np.array([tower.xy for tower in towers])
+        self.EIRP = np.array([tower.EIRP for tower in towers])
+        self.at_1km, self.slope = _propagation_tables(towers, user_height)
+
+        if tables is None:
+            tables = link_tables(geometry, towers, user_height)
+        self.towers = tables["towers"]
+        self._loss_free = tables["budget"]
+
+    @property
+    def budget(self):
+        """Link budget of every cell towards its candidate towers, cells x k."""
+        return self._loss_free - self.shadows[:, np.newaxis]
+
+    def cell_budget(self, cell):
+        """Link budget of the cells towards their candidate towers."""
+        return self._loss_free[cell] - self.shadows[cell, np.newaxis]
+
+    def _budget(self, idx, dist, cell):
+        d_km = np.maximum(dist, 1.0) / 1000.0
+        return self.EIRP[idx] - (self.at_1km[idx] + self.slope[idx] * np.log10(d_km)) - self.shadows[cell]
+
+    def cell_of(self, xy):
+        """Raster cell of every position."""
+        col = np.clip((xy[:, 0] // self.geometry.cell_size).astype(np.int64), 0, self.cols - 1)
+        row = np.clip((xy[:, 1] // self.geometry.cell_size).astype(np.int64), 0, self.rows - 1)
+        return row * self.cols + col
+
+    def centers(self, cell):
+        """Coordinates of the centre of every raster cell."""
+        return _cell_centers(self.geometry, cell)
+
+    def distance(self, xy, tower):
+        """Distance from every position to the tower of the same index."""
+        diff = self.xy[tower] - xy
+        return np.hypot(diff[:, 0], diff[:, 1])
+
+    def budget_to(self, xy, cell, tower):
+        """Link budget from any tower, also the ones that are not candidates
+        of the cell, at the exact positions."""
+        return self._budget(tower, self.distance(xy, tower), cell)
+
+
+class PlanePopulation(vec.Population):
+    """vectorized.Population moving in a plane, pos is unused."""
+
+    def __init__(self, n, user_cfg, num_towers, prob_vehicle):
+        super().__init__(n, user_cfg, num_towers)
+        self.xy = np.zeros((n, 2))
+        self.velocity = np.zeros((n, 2))
+
+        # share of users moving at road speed, the rest walk at mall speed
+        self.prob_vehicle = prob_vehicle
+
+
+def random_positions(geometry, users, callers, streams):
+    """Return spawn positions of the callers (indices) uniformly in the
+    area, and velocities in a uniformly random direction."""
+    u = streams.random_of(callers, 4)
+    xy = u[:, :2] * (geometry.width, geometry.height)
+
+    angle = 2 * np.pi * u[:, 2]
+    speed = np.where(u[:, 3] < users.prob_vehicle, users.road_speed, users.mall_speed)
+    velocity = speed[:, np.newaxis] * np.column_stack((np.cos(angle), np.sin(angle)))
+    return xy, velocity
+
+
+def _candidate_rsl(raster, idx, cell, streams):
+    """Candidate towers of users idx in the cells and the RSL towards each
+    of them."""
+    candidates = raster.towers[cell]
+    fading = streams.fading_of(idx[:, np.newaxis], candidates)
+    return candidates, raster.cell_budget(cell) + fading
+
+
+def _update_calls(users, idx, raster, towers, streams):
+    """Advance all connected users one timestep, same rules as
+    corridor._update_calls with the candidate towers of the raster cell as
+    handover candidates. Handover locations are distances to the tower
+    handing over."""
+    geometry = raster.geometry
+
+    # move users
+    xy = users.xy[idx] + users.velocity[idx]
+    users.xy[idx] = xy
+
+    # close calls that are done gracefully
+    users.time_remaining[idx] -= 1
+    done = users.time_remaining[idx] < 0
+    corridor._end_calls(users, idx, towers, done)
+    idx, xy = idx[~done], xy[~done]
+
+    # users leaving the area count as successful handovers
+    leaving = ((xy[:, 0] < 0) | (xy[:, 0] > geometry.width) |
+               (xy[:, 1] < 0) | (xy[:, 1] > geometry.height))
+    corridor._leave(users, idx, towers, leaving, raster.distance(xy, users.tower[idx]))
+    idx, xy = idx[~leaving], xy[~leaving]
+    if len(idx) == 0:
+        return
+
+    cell = raster.cell_of(xy)
+    primary = users.tower[idx]
+    candidates, rsl = _candidate_rsl(raster, idx, cell, streams)
+
+    # RSL towards the current tower, computed directly if it is no candidate
+    is_primary = candidates == primary[:, np.newaxis]
+    listed = is_primary.any(axis=1)
+    rsl_pri = np.empty(len(idx))
+    rsl_pri[listed] = rsl[is_primary]
+    other = np.flatnonzero(~listed)
+    if len(other) > 0:
+        rsl_pri[other] = (raster.budget_to(xy[other], cell[other], primary[other]) +
+                          streams.fading_of(idx[other], primary[other]))
+
+    # drop calls due to poor RSL
+    lost = rsl_pri < users.rsl_threshold
+    distance = raster.distance(xy, primary)
+    corridor._drop(users, idx, towers, lost)
+
+    # hand over to the best candidate if it is stronger than the current tower
+    rows = np.arange(len(idx))
+    best = np.argmax(rsl, axis=1)
+    target = candidates[rows, best]
+    handoff = ~lost & (target != primary) & (rsl[rows, best] > rsl_pri)
+    corridor._hand_over(users, idx, towers, handoff, target, rsl[rows, best], distance)
+
+
+def _new_calls(users, idle, raster, towers, streams):
+    """Let idle users decide whether to call, and connect the ones that do
+    to the candidate tower with the best RSL, falling back on the second best."""
+    callers = idle[streams.want_calls_of(idle)]
+    if len(callers) == 0:
+        return
+
+    # spawn callers at some position
+    xy, velocity = random_positions(raster.geometry, users, callers, streams)
+    users.xy[callers] = xy
+    users.velocity[callers] = velocity
+
+    candidates, rsl = _candidate_rsl(raster, callers, raster.cell_of(xy), streams)
+    ranked = np.argsort(-rsl, axis=1)[:, :2]
+    corridor._connect(users, callers, towers, np.take_along_axis(candidates, ranked, axis=1),
+                      np.take_along_axis(rsl, ranked, axis=1), streams)
+
+
+def distance_bins(geometry):
+    """Bins of the handover distance histograms."""
+    return histogram.coarse_bins(int(ceil(hypot(geometry.width, geometry.height))))
+
+
+def description(tower, n):
+    """Name of tower number n for printing."""
+    kind = "Small Cell" if tower.tower_type == twr.SMALL_CELL else "Base Station"
+    return "{} {} ({:.0f}, {:.0f} m)".format(kind, n, tower.xy[0], tower.xy[1])
+
+
+def simulate(towers, geometry, sim_opts, user_opts, cli_args, streams, telemetry=None,
+             progress=None, tables=None):
+    """Run the simulation with towers anywhere in the plane of a
+    cfg.PlaneGeometry, using the shadowing of streams.init_shadow_raster.
+    Each user only considers the k nearest towers of its raster cell, so the
+    work per timestep grows with users x k instead of users x towers.
+    tables are the link_tables of the deployment, computed if not given.
+    """
+    start_time = time.time()
+
+    raster = LinkRaster(geometry, towers, user_opts.height, streams.shadows, tables)
+    users = PlanePopulation(sim_opts.num_users, user_opts, len(towers), sim_opts.prob_spawn_road)
+
+    # bin the distances from the tower at handovers
+    for tower in towers:
+        tower._handover_success_locations = histogram.LocationHistogram(distance_bins(geometry))
+        tower._handover_failure_locations = histogram.LocationHistogram(distance_bins(geometry))
+
+    # run simulation
+    tot = np.zeros(len(towers))
+    labels = [description(tower, n) + ":" for n, tower in enumerate(towers)]
+    for i in range(sim_opts.iterations):
+
+        # print status updates
+        sim.hourly_update(i, towers, labels, cli_args, telemetry, progress)
+        streams.set_time(i)
+
+        tot += [tower._channels_in_use for tower in towers]
+        if telemetry is not None:
+            telemetry.advance(i + 1)
+
+        # simulate timestep, idle users are determined before anyone moves
+        connected = np.flatnonzero(users.tower != vec.NOT_CONNECTED)
+        idle = np.flatnonzero(users.tower == vec.NOT_CONNECTED)
+        if len(connected) > 0:
+            _update_calls(users, connected, raster, towers, streams)
+        _new_calls(users, idle, raster, towers, streams)
+
+    if telemetry is not None:
+        telemetry.finish()
+
+    end_time = time.time()
+    runtime = end_time - start_time
+
+    if not cli_args.supersilent:
+        output.print_plane_summary(geometry, sim_opts, runtime)
+        for n, tower in enumerate(towers):
+            output.print_tower_summary(tower, "Summary " + description(tower, n))
+
+    return corridor.summarize(towers, runtime, tot / float(i))
@@ -0,0 +1,91 @@
+import argparse
+import unittest
+import numpy as np
+
+import cfg
+import plane
+import shared
+import streams as rnd
+import tower as twr
+import vectorized
+
+
+class TestGridIndex(unittest.TestCase):
+
+    def test_nearest_matches_brute_force(self):
+        rng = np.random.default_rng(1)
+        xy = rng.random((200, 2)) * (3000, 2000)
+        points = rng.random((1000, 2)) * (3000, 2000)
+        dist = np.hypot(*(xy[np.newaxis, :, :] - points[:, np.newaxis, :]).transpose(2, 0, 1))
+        expected = np.sort(dist, axis=1)[:, :4]
+
+        for cell_size in [50.0, 173.0, 1000.0]:
+            idx, d = plane.GridIndex(xy, 4, cell_size, (0, 0, 3000, 2000)).nearest(points)
+            np.testing.assert_allclose(d, expected)
+            np.testing.assert_allclose(dist[np.arange(1000)[:, np.newaxis], idx], expected)
+
+    def test_fewer_towers_than_k(self):
+        xy = np.array([[0.0, 0.0], [100.0, 0.0]])
+        idx, d = plane.GridIndex(xy, 4, 10.0).nearest(np.array([[90.0, 0.0]]))
+        self.assertEqual(idx.tolist(), [[1, 0]])
+
+
+class TestPlane(unittest.TestCase):
+
+    def setUp(self):
+        config = cfg.read_json("plane_config.json")
+        self.geometry = cfg.PlaneGeometry(config)
+        self.sim_opts = cfg.SimOptions(config)
+        self.user_opts = cfg.UserOptions(config)
+        self.towers = [twr.Tower(opts) for opts in cfg.tower_list(config)]
+        self.args = argparse.Namespace(silent=True, supersilent=True)
+
+        self.streams = rnd.RandomStreams(1, call_rate=10)
+        self.streams.init_shadow_raster(self.sim_opts, self.geometry)
+        self.raster = plane.LinkRaster(self.geometry, self.towers, self.user_opts.height,
+                                       self.streams.shadows)
+
+    def test_raster_budget(self):
+        cell = np.array([0, 1234, self.raster.rows * self.raster.cols - 1])
+        centers = self.raster.centers(cell)
+        np.testing.assert_array_equal(self.raster.cell_of(centers), cell)
+
+        for k in range(self.raster.towers.shape[1]):
+            tower = self.raster.towers[cell, k]
+            np.testing.assert_allclose(self.raster.budget_to(centers, cell, tower),
+                                       self.raster.budget[cell, k])
+
+    def test_shared_tables(self):
+        # a raster from read-only tables mapped from a file is the same
+        tables = shared.StaticTables(
+            plane.link_tables(self.geometry, self.towers, self.user_opts.height))
+        try:
+            raster = plane.LinkRaster(self.geometry, self.towers, self.user_opts.height,
+                                      self.streams.shadows, tables.tables())
+            self.assertFalse(raster.towers.flags.writeable)
+            np.testing.assert_array_equal(raster.towers, self.raster.towers)
+            np.testing.assert_array_equal(raster.budget, self.raster.budget)
+        finally:
+            tables.close()
+
+    def test_channels_match_connected_users(self):
+        users = plane.PlanePopulation(self.sim_opts.num_users, self.user_opts, len(self.towers),
+                                      self.sim_opts.prob_spawn_road)
+        for i in range(300):
+            connected = np.flatnonzero(users.tower != vectorized.NOT_CONNECTED)
+            idle = np.flatnonzero(users.tower == vectorized.NOT_CONNECTED)
+            if len(connected) > 0:
+                plane._update_calls(users, connected, self.raster, self.towers, self.streams)
+            plane._new_calls(users, idle, self.raster, self.towers, self.streams)
+
+            counts = np.bincount(users.tower[users.tower >= 0], minlength=len(self.towers))
+            self.assertEqual([t._channels_in_use for t in self.towers], counts.tolist())
+
+        # users are connected to one of the nearest towers
+        connected = np.flatnonzero(users.tower != vectorized.NOT_CONNECTED)
+        self.assertGreater(len(connected), 0)
+        self.assertLess(np.max(self.raster.distance(users.xy[connected], users.tower[connected])), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import time
+from functools import wraps
+import numpy as np
+
+import errors as err
+import output
+import plane
+import rf
+import simulation as sim
+import streams as rnd
+import tower as twr
+import user as usr
+
+# (owner, attribute) of the functions timed by the profiler
+HOT_PATHS = [
+    (rf, "RSL"),
+    (rf, "RSL_array"),
+    (rf, "get_link_budget"),
+    (rf, "init_link_budget"),
+    (rf.FadingPool, "next"),
+    (rf.FadingPool, "take"),
+    (rnd.RandomStreams, "want_calls"),
+    (rnd.RandomStreams, "fading"),
+    (rnd.RandomStreams, "fading_array"),
+    (plane.LinkRaster, "cell_budget"),
+    (usr.User, "start_call"),
+    (usr.User, "update_call"),
+    (twr.Tower, "try_connect"),
+    (twr.Tower, "admit"),
+]
+
+# names of the failure reasons counted when returned by Tower.try_connect and Tower.admit
+REASONS = {err.LOW_SIGNAL: "LOW_SIGNAL", err.NO_FREE_CHANNELS: "NO_FREE_CHANNELS"}
+
+
+def _name(owner, attr):
+    return "%s.%s" % (getattr(owner, "__name__", owner), attr)
+
+
+class Profiler:
+    """Call counts and cumulative time of the functions in HOT_PATHS, and
+    counts of the failed connections reported by Tower.try_connect and
+    Tower.admit by reason, in total and per simulated hour.
+
+    The functions are replaced by timing wrappers by install and restored by
+    uninstall, so there is no cost at all when not profiling. Time of nested
+    calls is counted in both the caller and the callee.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.time = {}
+        self.hours = []
+        self._last = ({}, {})
+        self._originals = []
+
+    def _wrap(self, owner, attr, wrapper_for):
+        original = owner.__dict__[attr]
+        self._originals.append((owner, attr, original))
+        setattr(owner, attr, wraps(original)(wrapper_for(original)))
+
+    def _timed(self, name):
+        calls, total = self.calls, self.time
+        calls[name] = 0
+        total[name] = 0.0
+
+        def wrapper_for(func):
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    calls[name] += 1
+                    total[name] += time.perf_counter() - start
+            return wrapper
+        return wrapper_for
+
+    def _returns(self, name):
+        """Count the failure reasons returned as a status code (or array of
+        status codes) by the function."""
+        calls = self.calls
+        for reason in REASONS.values():
+            calls[name + " returned " + reason] = 0
+
+        def wrapper_for(func):
+            def wrapper(*args, **kwargs):
+                status = func(*args, **kwargs)
+                for code, reason in REASONS.items():
+                    calls[name + " returned " + reason] += int(np.count_nonzero(status == code))
+                return status
+            return wrapper
+        return wrapper_for
+
+    def _hourly(self, func):
+        def wrapper(i, *args, **kwargs):
+            if i % 3600 == 0 and i != 0:
+                self.end_hour()
+            return func(i, *args, **kwargs)
+        return wrapper
+
+    def install(self):
+        for owner, attr in HOT_PATHS:
+            self._wrap(owner, attr, self._timed(_name(owner, attr)))
+        for attr in ["try_connect", "admit"]:
+            self._wrap(twr.Tower, attr, self._returns(_name(twr.Tower, attr)))
+
+        # every engine calls hourly_update at the start of each simulated hour
+        self._wrap(sim, "hourly_update", self._hourly)
+        return self
+
+    def uninstall(self):
+        for owner, attr, original in reversed(self._originals):
+            setattr(owner, attr, original)
+        self._originals = []
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def end_hour(self):
+        """Store the calls and time since the last call."""
+        last_calls, last_time = self._last
+        self.hours.append({name: {"calls": n - last_calls.get(name, 0),
+                                  "time": self.time.get(name, 0.0) - last_time.get(name, 0.0)}
+                           for name, n in self.calls.items()})
+        self._last = (dict(self.calls), dict(self.time))
+
+    def finish(self):
+        """Store the last (possibly partial) hour."""
+        if self.calls != self._last[0]:
+            self.end_hour()
+
+    def report(self):
+        """Totals and per hour breakdown as a json serializable dictionary."""
+        total = {name: {"calls": n, "time": self.time.get(name, 0.0)}
+                 for name, n in self.calls.items()}
+        return {"total": total, "hours": self.hours}
+
+
+def merge_reports(reports):
+    """Sum the totals of several reports, e.g. from replications."""
+    total = {}
+    for report in reports:
+        for name, entry in report["total"].items():
+            acc = total.setdefault(name, {"calls": 0, "time": 0.0})
+            acc["calls"] += entry["calls"]
+            acc["time"] += entry["time"]
+    return {"total": total, "hours": []}
+
+
+def rows(report):
+    """Rows for output.print_table of the functions that were called, most
+    time consuming first."""
+    rows = []
+    for name, entry in report["total"].items():
+        if entry["calls"] == 0:
+            continue
+        per_call = 1e6 * entry["time"] / entry["calls"]
+        rows.append({"function": name, "calls": entry["calls"], "time_s": entry["time"],
+                     "per_call_us": per_call})
+    return sorted(rows, key=lambda r: -r["time_s"])
+
+
+def hour_rows(report):
+    """Rows for output.print_table with the time in seconds of every timed
+    function that was called, per hour."""
+    names = [name for name, entry in report["total"].items()
+             if entry["calls"] > 0 and " returned " not in name]
+    rows = []
+    for h, hour in enumerate(report["hours"]):
+        row = {"hour": h}
+        for name in names:
+            row[name] = hour[name]["time"] if name in hour else 0.0
+        rows.append(row)
+    return names, rows
+
+
+def print_report(report):
+    """Print the totals, and the per hour breakdown if there is one."""
+    output.print_table(rows(report), ["function", "calls", "time_s", "per_call_us"], "Profile")
+    if report["hours"]:
+        names, hours = hour_rows(report)
+        output.print_table(hours, ["hour"] + names, "Profile per hour [s]")
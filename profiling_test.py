@@ -0,0 +1,69 @@
+import argparse
+import unittest
+
+import cfg
+import corridor
+import profiling
+import rf
+import simulation as sim
+import streams as rnd
+import tower as twr
+import user as usr
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profile_run(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        sim_opts = cfg.SimOptions(config)
+        sim_opts.iterations = 3600 + 600
+        geometry = cfg.Geometry(config)
+        streams = rnd.RandomStreams(2, sim_opts.call_rate)
+        streams.init_shadowing(sim_opts, geometry)
+        args = argparse.Namespace(silent=True, supersilent=True, engine="step")
+
+        original = rf.RSL, usr.User.update_call, twr.Tower.try_connect, sim.hourly_update
+        with profiling.Profiler() as profiler:
+            stats = sim.run(twr.Tower(cfg.TowerOptions(config, twr.BASE_STATION)),
+                            twr.Tower(cfg.TowerOptions(config, twr.SMALL_CELL)),
+                            geometry, sim_opts, cfg.UserOptions(config), args, streams)
+        profiler.finish()
+
+        self.assertEqual((rf.RSL, usr.User.update_call, twr.Tower.try_connect, sim.hourly_update),
+                         original, "functions must be restored")
+
+        report = profiler.report()
+        self.assertGreater(report["total"]["rf.RSL"]["calls"], 0)
+        self.assertGreater(report["total"]["rf.RSL"]["time"], 0.0)
+
+        # every primary attempt that failed returned its reason
+        failed = (report["total"]["Tower.try_connect returned LOW_SIGNAL"]["calls"] +
+                  report["total"]["Tower.try_connect returned NO_FREE_CHANNELS"]["calls"])
+        self.assertGreaterEqual(failed, stats["total_call_failures"])
+
+        for name in ["rf.get_link_budget", "FadingPool.next", "RandomStreams.fading"]:
+            self.assertGreater(report["total"][name]["calls"], 0, name)
+
+        self.assertEqual(len(report["hours"]), 2)
+        self.assertEqual(sum(h["User.update_call"]["calls"] for h in report["hours"]),
+                         report["total"]["User.update_call"]["calls"])
+
+    def test_profile_hours(self):
+        # the corridor engine ends the hours through hourly_update as well
+        config = cfg.read_json("corridor_config.json")
+        sim_opts = cfg.SimOptions(config)
+        sim_opts.iterations = 2 * 3600 + 600
+        geometry = cfg.Geometry(config)
+        streams = rnd.RandomStreams(2, sim_opts.call_rate)
+        streams.init_shadowing(sim_opts, geometry)
+        args = argparse.Namespace(silent=True, supersilent=True, engine="corridor")
+
+        with profiling.Profiler() as profiler:
+            corridor.simulate([twr.Tower(opts) for opts in cfg.tower_list(config)], geometry,
+                              sim_opts, cfg.UserOptions(config), args, streams)
+        profiler.finish()
+        self.assertEqual(len(profiler.report()["hours"]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
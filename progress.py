@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import output
+
+# counters summed over all towers in every progress event
+COUNTERS = ["channels_in_use", "connections_attempts", "handover_attempt", "handover_failure",
+            "dropped", "blocked_no_chan", "blocked_no_sig", "failed_to_connect"]
+
+
+class Reporter:
+    """Writes progress events as JSON lines to path (a file or a named pipe)
+    from a background thread.
+
+    emit never blocks: events go into a bounded queue and are dropped (and
+    counted in dropped) when it is full. The writer keeps at most one line
+    per run every min_interval seconds, newer events of a run replace older
+    ones that have not been written yet. Final events are always written.
+    Every line is appended with a single write, so several processes can
+    share the same file.
+    """
+
+    def __init__(self, path, min_interval=1.0, maxsize=1024):
+        self.path = path
+        self.min_interval = min_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._pending = {}
+        self._last_write = {}
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._thread = threading.Thread(target=self._run, name="progress-reporter", daemon=True)
+        self._thread.start()
+
+    def emit(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Write everything still pending and stop the writer."""
+        self._queue.put(None)
+        self._thread.join()
+        os.close(self._fd)
+
+    def _write(self, event):
+        os.write(self._fd, (json.dumps(event, separators=(",", ":")) + "\n").encode())
+        self._last_write[event["run"]] = time.monotonic()
+
+    def _flush(self, force=False):
+        now = time.monotonic()
+        for run, event in list(self._pending.items()):
+            if force or now - self._last_write.get(run, -self.min_interval) >= self.min_interval:
+                self._write(event)
+                del self._pending[run]
+
+    def _run(self):
+        while True:
+            try:
+                # only wake up to flush when something is waiting
+                event = self._queue.get(timeout=self.min_interval if self._pending else None)
+            except queue.Empty:
+                self._flush()
+                continue
+
+            if event is None:
+                self._flush(force=True)
+                return
+            if event.get("done"):
+                self._pending.pop(event["run"], None)
+                self._write(event)
+            else:
+                self._pending[event["run"]] = event
+            self._flush()
+
+
+class Progress:
+    """Progress of one simulation run with towers, emitted to a Reporter at
+    every whole simulated hour by the engines and once more by finish."""
+
+    def __init__(self, reporter, run, towers, iterations):
+        self.reporter = reporter
+        self.run = str(run)
+        self.towers = towers
+        self.iterations = iterations
+        self._start = time.time()
+
+    def _event(self, i):
+        wall = time.time() - self._start
+        counters = dict.fromkeys(COUNTERS, 0)
+        for tower in self.towers:
+            values = tower.counters()
+            for name in COUNTERS:
+                counters[name] += int(values[name])
+        return {"run": self.run, "pid": os.getpid(), "t": int(i), "iterations": self.iterations,
+                "hour": int(i) // 3600, "wall_s": round(wall, 3),
+                "rate": round(i / wall, 1) if wall > 0 else 0.0, "counters": counters}
+
+    def hour(self, i):
+        """Emit the state at simulated time i."""
+        self.reporter.emit(self._event(i))
+
+    def finish(self, kpis=None):
+        """Emit the final state, with the kpis (see simulation.kpis) if given."""
+        event = self._event(self.iterations)
+        event["done"] = True
+        if kpis is not None:
+            event["kpis"] = kpis
+        self.reporter.emit(event)
+
+
+def follow(path, interval=0.5, stop=None):
+    """Yield events from a JSON lines file as they are appended, waiting for
+    the file to appear. Runs until stop() returns true, or forever."""
+    while not os.path.exists(path):
+        time.sleep(interval)
+
+    buffered = ""
+    with open(path) as f:
+        while stop is None or not stop():
+            chunk = f.read()
+            if not chunk:
+                time.sleep(interval)
+                continue
+            buffered += chunk
+            *lines, buffered = buffered.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_events(path):
+    """All events in a JSON lines file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def aggregate(latest):
+    """Aggregate of the latest event of every run: numbers of runs and
+    finished runs, simulated fraction, total rate and summed counters."""
+    events = list(latest.values())
+    total = sum(e["iterations"] for e in events)
+    summary = {
+        "runs": len(events),
+        "done": sum(1 for e in events if e.get("done")),
+        "progress": sum(e["t"] for e in events) / float(total) if total else 0.0,
+        "rate": sum(e["rate"] for e in events if not e.get("done")),
+    }
+    for name in COUNTERS:
+        summary[name] = sum(e["counters"][name] for e in events)
+    return summary
+
+
+def _print(latest):
+    columns = ["runs", "done", "progress", "rate"] + COUNTERS[1:]
+    output.print_table([aggregate(latest)], columns, time.strftime("Progress %H:%M:%S"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tail and aggregate progress events.')
+    parser.add_argument("path", type=str, help="JSON lines file written by --progress")
+    parser.add_argument("--once", action='store_true',
+                        help="aggregate what is in the file and exit")
+    parser.add_argument("-n", "--runs", type=int, default=None,
+                        help="exit when this many runs are done")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="seconds between printed aggregates")
+    args = parser.parse_args()
+
+    latest = {}
+    if args.once:
+        for event in read_events(args.path):
+            latest[event["run"]] = event
+        _print(latest)
+    else:
+        def finished():
+            return args.runs is not None and sum(1 for e in latest.values() if e.get("done")) >= args.runs
+
+        last_print = 0.0
+        try:
+            for event in follow(args.path, stop=finished):
+                latest[event["run"]] = event
+                if time.monotonic() - last_print >= args.interval:
+                    _print(latest)
+                    last_print = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        _print(latest)
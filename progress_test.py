@@ -0,0 +1,105 @@
+import argparse
+import os
+import tempfile
+import threading
+import unittest
+
+import cfg
+import progress
+import simulation as sim
+import streams as rnd
+import tower as twr
+
+
+class TestProgress(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "progress.jsonl")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_engines(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        for engine in ["step", "vector", "event", "corridor"]:
+            sim_opts = cfg.SimOptions(config)
+            sim_opts.iterations = 2 * 3600 + 600
+            geometry = cfg.Geometry(config)
+            towers = [twr.Tower(cfg.TowerOptions(config, twr.BASE_STATION)),
+                      twr.Tower(cfg.TowerOptions(config, twr.SMALL_CELL))]
+            streams = rnd.RandomStreams(2, sim_opts.call_rate)
+            streams.init_shadowing(sim_opts, geometry)
+
+            reporter = progress.Reporter(self.path, min_interval=0.0)
+            tracker = progress.Progress(reporter, engine, towers, sim_opts.iterations)
+            args = argparse.Namespace(silent=True, supersilent=True, engine=engine)
+            stats = sim.run(towers[0], towers[1], geometry, sim_opts, cfg.UserOptions(config),
+                            args, streams, progress=tracker)
+            tracker.finish(sim.kpis(stats))
+            reporter.close()
+
+            events = [e for e in progress.read_events(self.path) if e["run"] == engine]
+            self.assertEqual([e["hour"] for e in events], [1, 2, 2], engine)
+            self.assertTrue(events[-1]["done"])
+            self.assertEqual(events[-1]["counters"]["dropped"], stats["total_dropped"], engine)
+            self.assertEqual(events[-1]["kpis"]["gos"], sim.kpis(stats)["gos"])
+
+    def test_rate_limit(self):
+        # only the latest of events arriving faster than min_interval is kept
+        reporter = progress.Reporter(self.path, min_interval=60.0)
+        counters = dict.fromkeys(progress.COUNTERS, 0)
+        for t in range(1, 11):
+            reporter.emit({"run": "a", "t": t, "iterations": 10, "rate": 1.0, "counters": counters})
+        reporter.emit({"run": "b", "t": 5, "iterations": 10, "rate": 1.0, "counters": counters})
+        reporter.emit({"run": "b", "t": 10, "iterations": 10, "rate": 1.0, "counters": counters,
+                       "done": True})
+        reporter.close()
+
+        events = progress.read_events(self.path)
+        self.assertEqual([(e["run"], e["t"]) for e in events if e["run"] == "a"][-1], ("a", 10))
+        self.assertLess(len(events), 6)
+        self.assertTrue([e for e in events if e["run"] == "b"][-1]["done"])
+
+    def test_never_blocks(self):
+        # a full queue drops events instead of waiting for the writer
+        reporter = progress.Reporter(self.path, maxsize=1)
+        stalled = threading.Event()
+        reporter._write = lambda event: stalled.wait()
+        for t in range(100):
+            reporter.emit({"run": "a", "t": t})
+        self.assertGreater(reporter.dropped, 0)
+        stalled.set()
+        reporter.close()
+
+    def test_aggregate(self):
+        counters = dict.fromkeys(progress.COUNTERS, 1)
+        latest = {
+            "0/0": {"run": "0/0", "t": 3600, "iterations": 7200, "rate": 100.0,
+                    "counters": counters},
+            "0/1": {"run": "0/1", "t": 7200, "iterations": 7200, "rate": 50.0,
+                    "counters": counters, "done": True},
+        }
+        summary = progress.aggregate(latest)
+        self.assertEqual(summary["runs"], 2)
+        self.assertEqual(summary["done"], 1)
+        self.assertAlmostEqual(summary["progress"], 0.75)
+        self.assertEqual(summary["rate"], 100.0)
+        self.assertEqual(summary["dropped"], 2)
+
+    def test_follow(self):
+        # partial lines are only returned once they are complete
+        with open(self.path, "w") as f:
+            f.write('{"run": "a", "t": 1}\n{"run": "a", ')
+        lines = []
+        events = progress.follow(self.path, interval=0.01, stop=lambda: len(lines) == 2)
+
+        lines.append(next(events))
+        with open(self.path, "a") as f:
+            f.write('"t": 2}\n')
+        lines.append(next(events))
+        self.assertEqual([e["t"] for e in lines], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
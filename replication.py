@@ -0,0 +1,454 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+
+import cache as rcache
+import cfg
+import corridor
+import histogram
+import output
+import plane
+import profiling
+import progress as prog
+import results
+import shared
+import simulation as sim
+import stopping
+import streams as rnd
+import telemetry
+import tower as twr
+
+# KPIs estimated when running replications until a target precision
+KPIS = ["gos", "drop_rate", "block_capacity", "block_signal"]
+
+
+class Scenario:
+    """Everything needed to set up one simulation, sent to the workers."""
+
+    def __init__(self, base_opts, small_opts, user_opts, sim_opts, geometry, cli_args, label=""):
+        self.label = label
+
+        # set config and cache_dir to look up and store results in a cache.
+        # overrides are any changes made to the options that are not in config
+        self.config = None
+        self.overrides = {}
+        self.cache_dir = None
+
+        # set results_path to append a row for every replication to that file
+        self.results_path = None
+
+        # set telemetry_path to save the telemetry of every replication to
+        # {telemetry_path}_{replication}.npz, replications are then always
+        # run instead of looked up in the cache
+        self.telemetry_path = None
+        self.telemetry_every = 1
+
+        # set progress_path to append the progress events of every replication
+        # to that file as json lines, see progress.Reporter
+        self.progress_path = None
+
+        # set arrays to a shared.ResultArrays to return the channel time
+        # series (with telemetry) and handover histograms (with plotting) of
+        # every replication in it instead of in the stats
+        self.arrays = None
+
+        # set tables to a shared.StaticTables of plane.link_tables to map
+        # them in every replication of the plane engine instead of computing
+        # them, see publish_tables
+        self.tables = None
+
+        # set profile to time the hot paths, see profiling.Profiler
+        self.profile = False
+
+        # set keyed to draw the random values of the array engines per user
+        # and second, so scenarios sharing a seed stay in step, see
+        # streams.RandomStreams
+        self.keyed = False
+
+        # set tower_opts to a list of TowerOptions to run the corridor engine
+        # (or the plane engine, if that is the engine of cli_args) with
+        # those towers instead of the base station and small cell
+        self.tower_opts = None
+        self.base_opts = base_opts
+        self.small_opts = small_opts
+        self.user_opts = user_opts
+        self.sim_opts = sim_opts
+        self.geometry = geometry
+        self.cli_args = cli_args
+
+
+def run_replication(scenario, seed_seq, index, name="", antithetic=False):
+    """Run one replication of a scenario with random streams from seed_seq,
+    mirrored if antithetic (see streams.RandomStreams). If name is given all
+    printing is done to that file instead of stdout to avoid cluttering by
+    multiple processes."""
+    plot = getattr(scenario.cli_args, "plot", False)
+
+    # results recording telemetry are not cached, they are always run
+    cache, cached = None, None
+    if scenario.cache_dir is not None and scenario.config is not None:
+        cache = rcache.ResultCache(scenario.cache_dir)
+        overrides = dict(scenario.overrides, engine=scenario.cli_args.engine)
+        if antithetic:
+            overrides["antithetic"] = True
+        if scenario.keyed:
+            overrides["keyed"] = True
+        key = rcache.cache_key(scenario.config, overrides, seed_seq)
+        if scenario.telemetry_path is None:
+            cached = cache.get(key)
+        # entries stored without plotting have no handover histograms
+        if cached is not None and plot and cached[1] is None:
+            cached = None
+
+    profiler = None
+    if cached is not None:
+        stats, handover_arrays = cached
+    else:
+        stdout = sys.stdout
+        if name != "":
+            directory = os.path.dirname(name)
+            if directory != "":
+                os.makedirs(directory, exist_ok=True)
+            sys.stdout = open(name, mode="w")
+        try:
+            stats, towers, profiler = _simulate(scenario, seed_seq, index, antithetic)
+        finally:
+            if name != "":
+                sys.stdout.close()
+                sys.stdout = stdout
+
+        handover_arrays = None
+        if plot:
+            if scenario.tower_opts is not None:
+                handovers = corridor.handoff_data(towers)
+            else:
+                handovers = towers[0].dump_handoff_data()
+            handover_arrays = dict(handovers[0].to_arrays("handover_success"),
+                                   **handovers[1].to_arrays("handover_failure"))
+        if cache is not None:
+            cache.put(key, stats, handover_arrays)
+
+    stats["scenario"] = scenario.label
+    stats["replication"] = index
+    stats["seed"], stats["spawn_key"] = seed_columns(seed_seq)
+    # on every row, so all replications have the same results columns
+    stats["antithetic"] = antithetic
+    _write_results(scenario, stats)
+
+    # send the handover histograms back to be merged and plotted
+    arrays = scenario.arrays
+    if handover_arrays is not None:
+        if arrays is not None:
+            arrays.write(index, handover_arrays)
+        else:
+            coarse = coarse_bins(scenario)
+            stats["handovers"] = tuple(
+                histogram.LocationHistogram.from_arrays(handover_arrays, prefix, coarse)
+                for prefix in ["handover_success", "handover_failure"])
+    if arrays is not None:
+        arrays.mark_done(index)
+    if profiler is not None:
+        profiler.finish()
+        stats["profile"] = profiler.report()
+    return stats
+
+
+def _simulate(scenario, seed_seq, index, antithetic):
+    """Simulate one replication, see run_replication. Returns the stats, the
+    towers and the profiler (None if the scenario is not profiled)."""
+    sim_opts = scenario.sim_opts
+    streams = rnd.RandomStreams(seed_seq, sim_opts.call_rate, antithetic=antithetic,
+                                keyed=scenario.keyed)
+    if scenario.cli_args.engine == "plane":
+        streams.init_shadow_raster(sim_opts, scenario.geometry)
+    else:
+        streams.init_shadowing(sim_opts, scenario.geometry)
+
+    if scenario.tower_opts is not None:
+        towers = [twr.Tower(opts) for opts in scenario.tower_opts]
+    else:
+        towers = [twr.Tower(scenario.base_opts), twr.Tower(scenario.small_opts)]
+
+    profiler = None
+    if scenario.profile:
+        profiler = profiling.Profiler().install()
+
+    arrays = scenario.arrays
+    recorder = None
+    if scenario.telemetry_path is not None:
+        channels = None
+        if arrays is not None and arrays.has("channels"):
+            channels = arrays.row("channels", index)
+        recorder = telemetry.Telemetry(towers, sim_opts.iterations, scenario.telemetry_every,
+                                       channels=channels)
+
+    reporter, tracker = None, None
+    if scenario.progress_path is not None:
+        reporter = prog.Reporter(scenario.progress_path)
+        run = "{}/{}".format(scenario.label, index) if scenario.label != "" else str(index)
+        tracker = prog.Progress(reporter, run, towers, sim_opts.iterations)
+
+    try:
+        if scenario.cli_args.engine == "plane":
+            tables = scenario.tables.tables() if scenario.tables is not None else None
+            stats = plane.simulate(towers, scenario.geometry, sim_opts, scenario.user_opts,
+                                   scenario.cli_args, streams, recorder, tracker, tables)
+        elif scenario.tower_opts is not None:
+            stats = corridor.simulate(towers, scenario.geometry, sim_opts, scenario.user_opts,
+                                      scenario.cli_args, streams, recorder, tracker)
+        else:
+            stats = sim.run(towers[0], towers[1], scenario.geometry, sim_opts,
+                            scenario.user_opts, scenario.cli_args, streams, recorder,
+                            progress=tracker)
+        if tracker is not None:
+            tracker.finish(sim.kpis(stats))
+    finally:
+        if profiler is not None:
+            profiler.uninstall()
+        if reporter is not None:
+            reporter.close()
+
+    if recorder is not None:
+        recorder.save("{}_{}.npz".format(scenario.telemetry_path, index))
+    return stats, towers, profiler
+
+
+def seed_columns(seed_seq):
+    """The seed and spawn key of the random streams of a replication, the
+    streams are numpy.random.SeedSequence(seed, spawn_key=spawn_key)."""
+    if isinstance(seed_seq, np.random.SeedSequence):
+        return seed_seq.entropy, list(seed_seq.spawn_key)
+    return seed_seq, []
+
+
+def _write_results(scenario, stats):
+    if scenario.results_path is not None:
+        overrides = dict(scenario.overrides, engine=scenario.cli_args.engine)
+        row = results.make_row(stats, scenario.config, overrides)
+        results.ResultsWriter(scenario.results_path).write(row)
+
+
+def scenario_from_config(config, cli_args, label=""):
+    """Build a scenario from a config dictionary. Configs with a towers list
+    are run by the corridor engine, or the plane engine if the config has
+    a plane, which must be the engine of cli_args."""
+    if cfg.has_tower_list(config):
+        geometry = cfg.PlaneGeometry(config) if cfg.has_plane(config) else cfg.Geometry(config)
+        scenario = Scenario(None, None, cfg.UserOptions(config), cfg.SimOptions(config),
+                            geometry, cli_args, label)
+        scenario.tower_opts = cfg.tower_list(config)
+    else:
+        scenario = Scenario(cfg.TowerOptions(config, twr.BASE_STATION),
+                            cfg.TowerOptions(config, twr.SMALL_CELL),
+                            cfg.UserOptions(config), cfg.SimOptions(config),
+                            cfg.Geometry(config), cli_args, label)
+    scenario.config = config
+    return scenario
+
+
+def coarse_bins(scenario):
+    """Coarse bins of the handover histograms of the scenario's engine."""
+    if scenario.cli_args.engine == "plane":
+        return plane.distance_bins(scenario.geometry)
+    if scenario.tower_opts is not None or scenario.cli_args.engine == "corridor":
+        return histogram.coarse_bins(scenario.geometry.road_end)
+    return histogram.COARSE
+
+
+def result_arrays(scenario, replications):
+    """A shared.ResultArrays for the channel time series (if the scenario
+    records telemetry) and handover histograms (if plotting) of the
+    replications of the scenario, or None if it needs neither."""
+    fields = {}
+    if scenario.telemetry_path is not None:
+        opts = scenario.tower_opts or [scenario.base_opts, scenario.small_opts]
+        shape = telemetry.series_shape(len(opts), scenario.sim_opts.iterations,
+                                       scenario.telemetry_every)
+        fields["channels"] = (shape, np.int32)
+    if getattr(scenario.cli_args, "plot", False):
+        empty = histogram.LocationHistogram(coarse_bins(scenario))
+        for prefix in ["handover_success", "handover_failure"]:
+            for name, counts in empty.to_arrays(prefix).items():
+                fields[name] = (counts.shape, counts.dtype)
+    if not fields:
+        return None
+    return shared.ResultArrays(replications, fields)
+
+
+def occupancy_rows(arrays):
+    """Distribution of the channels in use of every tower over all seconds
+    of all complete replications in arrays, one table row per tower."""
+    channels = arrays.array("channels")
+    rows = []
+    for t in range(channels.shape[2]):
+        counts = np.zeros(1, dtype=np.int64)
+        for r in arrays.rows():
+            row = np.bincount(channels[r, :, t])
+            if len(row) > len(counts):
+                counts = np.pad(counts, (0, len(row) - len(counts)))
+            counts[:len(row)] += row
+        total = max(counts.sum(), 1)
+        n = np.arange(len(counts))
+        rows.append({"tower": t, "mean": float((n * counts).sum() / total),
+                     "p95": int(np.searchsorted(np.cumsum(counts), 0.95 * total)),
+                     "max": int(n[counts > 0].max()) if counts.any() else 0})
+    return rows
+
+
+def publish_tables(scenarios):
+    """Compute the static link tables of all plane engine scenarios once,
+    shared by scenarios with the same deployment, and set the tables of
+    every scenario to them. Returns the list of shared.StaticTables, to be
+    closed when the replications are done."""
+    published = {}
+    for scenario in scenarios:
+        if scenario.cli_args.engine != "plane":
+            continue
+        key = plane.tables_key(scenario.geometry, scenario.tower_opts, scenario.user_opts.height)
+        if key not in published:
+            towers = [twr.Tower(opts) for opts in scenario.tower_opts]
+            published[key] = shared.StaticTables(
+                plane.link_tables(scenario.geometry, towers, scenario.user_opts.height))
+        scenario.tables = published[key]
+    return list(published.values())
+
+
+def run_tasks(tasks, workers=None, on_result=None, skip=None):
+    """Run tasks, tuples of run_replication arguments, on a pool of worker
+    processes. At most `workers` tasks are in flight, new ones are scheduled
+    as others complete, and on_result(stats) is called for each completed one.
+    If given, skip(task) is called right before a task would be scheduled, and
+    the task is not run if it returns true.
+    Returns list of stats in order of completion.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        scheduled = 0
+        while scheduled < len(tasks) or pending:
+            # keep the pool busy
+            while scheduled < len(tasks) and len(pending) < workers:
+                task = tasks[scheduled]
+                scheduled += 1
+                if skip is None or not skip(task):
+                    pending.add(pool.submit(run_replication, *task))
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stats = future.result()
+                results.append(stats)
+                if on_result is not None:
+                    on_result(stats)
+
+    return results
+
+
+def replication_tasks(scenario, replications, seed, name="", antithetic=False):
+    """Tasks for run_tasks running replications of the scenario. Every
+    replication gets independent random streams spawned from seed. With
+    antithetic, replications 2j and 2j + 1 are an antithetic pair, using the
+    same streams of which the second one mirrored."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    seeds = seed.spawn(-(-replications // 2) if antithetic else replications)
+    tasks = []
+    for i in range(replications):
+        filename = "" if name == "" else "{}_{}.txt".format(name, i)
+        if antithetic:
+            tasks.append((scenario, seeds[i // 2], i, filename, i % 2 == 1))
+        else:
+            tasks.append((scenario, seeds[i], i, filename))
+    return tasks
+
+
+def run_replications(scenario, replications, workers=None, seed=0, name="", on_result=None):
+    """Run replications of the scenario on a pool of worker processes, see
+    run_tasks. Returns list of stats in order of completion."""
+    tasks = replication_tasks(scenario, replications, seed, name)
+    return run_tasks(tasks, workers, on_result)
+
+
+def run_sequential(scenario, tolerance, max_replications, workers=None, seed=0, name="",
+                   on_result=None, confidence=0.95, min_replications=5):
+    """Run replications of the scenario until the confidence interval of every
+    KPI (see simulation.kpis) has a relative half-width of at most tolerance,
+    or max_replications are done. Returns list of stats in order of
+    completion, and the stopping.SequentialEstimator of the KPIs."""
+    estimator = stopping.SequentialEstimator(KPIS, tolerance, confidence, min_replications)
+
+    def add(stats):
+        estimator.add(sim.kpis(stats))
+        if on_result is not None:
+            on_result(stats)
+
+    tasks = replication_tasks(scenario, max_replications, seed, name)
+    stats = run_tasks(tasks, workers, add, skip=lambda task: estimator.converged())
+    return stats, estimator
+
+
+def multi_sim(scenario, times=5, workers=None, tolerance=None):
+    """Run multiple replications of the simulation on a process pool and
+    print the aggregate statistics. If tolerance is given, replications are
+    run until the KPIs are known to that relative precision, with times as
+    the maximum number of replications. Channel time series and handover
+    histograms are written to shared arrays by the workers, see
+    result_arrays."""
+    sim_opts, cli_args = scenario.sim_opts, scenario.cli_args
+    start_time = time.time()
+
+    def progress(stats):
+        print("replication %d done in %.1f seconds" % (stats["replication"], stats["runtime"]))
+
+    arrays = result_arrays(scenario, times)
+    scenario.arrays = arrays
+    tables = publish_tables([scenario])
+    try:
+        estimator = None
+        if tolerance is None:
+            stats = run_replications(scenario, times, workers, seed=sim_opts.seed,
+                                     name=cli_args.output, on_result=progress)
+        else:
+            stats, estimator = run_sequential(scenario, tolerance, times, workers,
+                                              seed=sim_opts.seed, name=cli_args.output,
+                                              on_result=progress)
+
+        end_time = time.time()
+        runtime = end_time - start_time
+        print("all %d simulations done in %d seconds" % (len(stats), runtime))
+
+        output.print_aggregate_stats(stats)
+        if estimator is not None:
+            output.print_table(estimator.rows(), ["kpi", "mean", "half_width", "relative"],
+                               "%d%% confidence intervals" % round(100 * estimator.confidence))
+
+        if scenario.profile:
+            profiling.print_report(
+                profiling.merge_reports([s["profile"] for s in stats if "profile" in s]))
+
+        if arrays is not None and arrays.has("channels"):
+            output.print_table(occupancy_rows(arrays), ["tower", "mean", "p95", "max"],
+                               "Channels in use over all replications")
+
+        if getattr(cli_args, "plot", False):
+            # summed in place over the rows of all replications
+            coarse = coarse_bins(scenario)
+            sums = {name: arrays.sum(name) for name in arrays.fields if name.startswith("handover")}
+            output.handover_histogram((
+                histogram.LocationHistogram.from_arrays(sums, "handover_success", coarse),
+                histogram.LocationHistogram.from_arrays(sums, "handover_failure", coarse)))
+    finally:
+        scenario.arrays, scenario.tables = None, None
+        if arrays is not None:
+            arrays.close()
+        for t in tables:
+            t.close()
+    return stats
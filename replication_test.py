@@ -0,0 +1,115 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import cfg
+import replication
+import tower as twr
+
+
+def short_scenario(seconds=600, engine="vector"):
+    config = cfg.read_json("test_files/golden_config.json")
+    sim_opts = cfg.SimOptions(config)
+    sim_opts.iterations = seconds
+    args = argparse.Namespace(silent=True, supersilent=True, engine=engine)
+    return replication.Scenario(cfg.TowerOptions(config, twr.BASE_STATION),
+                                cfg.TowerOptions(config, twr.SMALL_CELL),
+                                cfg.UserOptions(config), sim_opts,
+                                cfg.Geometry(config), args)
+
+
+class TestReplication(unittest.TestCase):
+
+    def test_run_replications(self):
+        scenario = short_scenario()
+        seen = []
+        results = replication.run_replications(scenario, 4, workers=2, seed=3,
+                                               on_result=lambda s: seen.append(s["replication"]))
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sorted(seen), [0, 1, 2, 3])
+
+        # replications must use independent streams
+        attempts = [r["total_call_attempts"] for r in results]
+        self.assertGreater(len(set(attempts)), 1)
+
+    def test_same_seed_same_results(self):
+        scenario = short_scenario()
+        a = sorted(replication.run_replications(scenario, 2, workers=2, seed=5),
+                   key=lambda s: s["replication"])
+        b = sorted(replication.run_replications(scenario, 2, workers=1, seed=5),
+                   key=lambda s: s["replication"])
+        for x, y in zip(a, b):
+            self.assertEqual(x["total_call_attempts"], y["total_call_attempts"])
+            self.assertEqual(x["total_dropped"], y["total_dropped"])
+
+    def test_run_sequential(self):
+        # any interval is good enough, stop as soon as min_replications are done
+        scenario = short_scenario()
+        stats, estimator = replication.run_sequential(scenario, 1e9, 50, workers=2, seed=1,
+                                                      min_replications=4)
+        self.assertLess(len(stats), 50)
+        self.assertGreaterEqual(len(stats), 4)
+        self.assertEqual(estimator.runs(), len(stats))
+
+    def test_result_arrays(self):
+        # telemetry and handover histograms come back through shared arrays
+        scenario = short_scenario()
+        scenario.cli_args.plot = True
+        with tempfile.TemporaryDirectory() as directory:
+            scenario.telemetry_path = os.path.join(directory, "telemetry")
+            arrays = replication.result_arrays(scenario, 3)
+            scenario.arrays = arrays
+            try:
+                stats = replication.run_replications(scenario, 3, workers=2, seed=2)
+                self.assertEqual(arrays.rows().tolist(), [0, 1, 2])
+                for s in stats:
+                    self.assertNotIn("handovers", s)
+                    channels = arrays.array("channels")[s["replication"], :, 0]
+                    self.assertAlmostEqual(s["avg_calls_base"], channels.sum() / 599.0)
+
+                success = arrays.sum("handover_success_coarse").sum()
+                self.assertGreater(success, 0)
+                self.assertLessEqual(success, sum(s["total_handover_success"] for s in stats))
+            finally:
+                arrays.close()
+            self.assertFalse(os.path.exists(arrays.directory))
+
+    def test_supersilent(self):
+        # workers of sweeps must not print the summaries
+        for engine in ["step", "vector", "event", "corridor"]:
+            printed = io.StringIO()
+            with contextlib.redirect_stdout(printed):
+                replication.run_replication(short_scenario(seconds=60, engine=engine), 1, 0)
+            self.assertNotIn("Summary", printed.getvalue(), engine)
+
+    def test_cache_hit(self):
+        # a cached replication restores stdout and returns its histograms
+        scenario = short_scenario(seconds=300)
+        scenario.config = cfg.read_json("test_files/golden_config.json")
+        scenario.cli_args.plot = True
+        with tempfile.TemporaryDirectory() as directory:
+            scenario.cache_dir = os.path.join(directory, "cache")
+            name = os.path.join(directory, "out_1.txt")
+            stdout = sys.stdout
+            runs = [replication.run_replication(scenario, 4, 1, name) for _ in range(2)]
+            self.assertIs(sys.stdout, stdout)
+            self.assertEqual(runs[0]["runtime"], runs[1]["runtime"])
+
+            arrays = replication.result_arrays(scenario, 2)
+            scenario.arrays = arrays
+            try:
+                replication.run_replication(scenario, 4, 1, name)
+                self.assertEqual(arrays.rows().tolist(), [1])
+                self.assertEqual(arrays.sum("handover_success_coarse").sum(),
+                                 runs[0]["handovers"][0].coarse.total())
+            finally:
+                arrays.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
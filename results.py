@@ -0,0 +1,123 @@
+import csv
+import fcntl
+import numpy as np
+
+
+def flatten(d, prefix=""):
+    """Flatten nested dictionaries into one dictionary with dotted keys,
+    e.g. {"towers": {"small_cell": {"dropped": 1}}} -> {"towers.small_cell.dropped": 1}.
+    Lists of dictionaries are flattened by index, the same as overrides,
+    e.g. {"towers": [{"EIRP_dBm": 50}]} -> {"towers.0.EIRP_dBm": 50}."""
+    flat = {}
+    for key, value in d.items():
+        name = prefix + str(key)
+        if isinstance(value, list) and any(isinstance(v, dict) for v in value):
+            value = {str(i): v for i, v in enumerate(value)}
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def make_row(stats, config=None, overrides=None, seed=None):
+    """One row of results: the stats dictionary of a run (including the
+    per-tower counters) and the config, overrides and seed it was run with.
+    Single runs and replications have the same columns, so they can be
+    written to the same file."""
+    row = {"scenario": None, "replication": None, "seed": seed}
+    row.update(flatten(stats))
+    if config is not None:
+        row.update(flatten(config, "config."))
+    if overrides is not None:
+        row.update(flatten(overrides, "overrides."))
+    return row
+
+
+def _cell(value):
+    """Format a value for the csv file. Lists of values are joined by spaces
+    into one cell."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return " ".join(str(_cell(v)) for v in value)
+    if value is None:
+        return ""
+    return value
+
+
+class ResultsWriter:
+    """Appends rows of results to a csv file, one column per key. Rows with
+    keys that are not columns yet add them: the file is rewritten with the
+    new columns after the existing ones, empty in the rows already written.
+    Rows without some columns leave them empty. Writes are done under an
+    exclusive file lock, so any number of processes can write to the same
+    file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, row):
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        if len(rows) == 0:
+            return
+
+        with open(self.path, "a+", newline="") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                header = f.readline().rstrip("\r\n")
+                columns = next(csv.reader([header])) if header != "" else []
+
+                new = []
+                for row in rows:
+                    new.extend(k for k in row if k not in columns and k not in new)
+
+                writer = csv.writer(f)
+                if header != "" and new:
+                    # append mode writes at the end, which truncate moves to 0
+                    written = list(csv.reader(f))
+                    f.truncate(0)
+                    columns += new
+                    writer.writerow(columns)
+                    writer.writerows(r + [""] * (len(columns) - len(r)) for r in written)
+                elif header == "":
+                    columns = new
+                    writer.writerow(columns)
+                for row in rows:
+                    writer.writerow([_cell(row.get(c)) for c in columns])
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _column(values):
+    """Numpy array of the cells of a column: booleans, integers, floats
+    (empty cells are nan) or strings, the first type all cells fit."""
+    if values and all(v in ("True", "False") for v in values):
+        return np.array([v == "True" for v in values])
+    try:
+        return np.array([int(v) for v in values], dtype=np.int64)
+    except ValueError:
+        pass
+    try:
+        return np.array([float(v) if v != "" else np.nan for v in values])
+    except ValueError:
+        return np.array(values, dtype=str)
+
+
+def load_results(path):
+    """Load all rows of a results file into a numpy structured array with
+    one field per column, e.g. load_results(path)["total_dropped"]."""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        rows = list(reader)
+
+    arrays = [_column([row[c] for row in rows]) for c in range(len(columns))]
+    data = np.empty(len(rows), dtype=[(name, a.dtype) for name, a in zip(columns, arrays)])
+    for name, a in zip(columns, arrays):
+        data[name] = a
+    return data
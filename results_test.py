@@ -0,0 +1,104 @@
+import argparse
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+import cfg
+import replication
+import results
+from replication_test import short_scenario
+
+
+class TestResults(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "results.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_flatten(self):
+        flat = results.flatten({"a": 1, "towers": {"small_cell": {"dropped": 2}}})
+        self.assertEqual(flat, {"a": 1, "towers.small_cell.dropped": 2})
+
+    def test_write_load(self):
+        writer = results.ResultsWriter(self.path)
+        config = {"path_loss": {"propagation": "okamura-hata"}}
+        writer.write(results.make_row({"total_dropped": 3, "runtime": 1.5}, config, seed=1))
+        writer.write_rows([results.make_row({"total_dropped": 4, "runtime": 2.5}, config, seed=2),
+                           results.make_row({"total_dropped": 5}, config, seed=3)])
+
+        data = results.load_results(self.path)
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data["seed"].tolist(), [1, 2, 3])
+        self.assertEqual(data["total_dropped"].tolist(), [3, 4, 5])
+        self.assertEqual(data["config.path_loss.propagation"][0], "okamura-hata")
+
+    def test_new_columns(self):
+        # rows of engines with other towers share the file, missing cells are empty
+        writer = results.ResultsWriter(self.path)
+        writer.write(results.make_row({"towers": {"base_station": {"dropped": 1}}}, seed=1))
+        writer.write(results.make_row({"towers": {"tower_0": {"dropped": 2}}}, seed=2))
+        writer.write(results.make_row({"towers": {"base_station": {"dropped": 3}}}, seed=3))
+
+        data = results.load_results(self.path)
+        self.assertEqual(data["seed"].tolist(), [1, 2, 3])
+        self.assertEqual(data.dtype.names[-1], "towers.tower_0.dropped")
+        self.assertEqual(np.isnan(data["towers.tower_0.dropped"]).tolist(), [True, False, True])
+        self.assertEqual(data["towers.base_station.dropped"][[0, 2]].tolist(), [1, 3])
+
+    def test_replications(self):
+        # all workers append to the same file
+        scenario = short_scenario(seconds=300)
+        scenario.config = cfg.read_json("test_files/golden_config.json")
+        scenario.results_path = self.path
+        replication.run_replications(scenario, 4, workers=2, seed=3)
+
+        data = results.load_results(self.path)
+        self.assertEqual(sorted(data["replication"].tolist()), [0, 1, 2, 3])
+        self.assertEqual(data["towers.base_station.connections_attempts"].tolist(),
+                         (data["total_call_attempts"] - data["towers.small_cell.connections_attempts"]).tolist())
+
+        # the seed and spawn key reproduce every replication
+        self.assertEqual(data["seed"].tolist(), [3] * 4)
+        self.assertEqual(sorted(data["spawn_key"].tolist()), [0, 1, 2, 3])
+        row = data[data["replication"] == 2][0]
+        scenario.results_path = None
+        again = replication.run_replication(
+            scenario, np.random.SeedSequence(int(row["seed"]), spawn_key=(int(row["spawn_key"]),)), 2)
+        self.assertEqual(again["total_call_attempts"], row["total_call_attempts"])
+
+    def test_corridor(self):
+        # the towers list of the config is flattened by index, the cells of
+        # its lists are quoted and must still load
+        config = cfg.read_json("corridor_config.json")
+        args = argparse.Namespace(silent=True, supersilent=True, engine="corridor")
+        scenario = replication.scenario_from_config(config, args)
+        scenario.sim_opts.iterations = 300
+        scenario.results_path = self.path
+        for task in replication.replication_tasks(scenario, 2, 1):
+            replication.run_replication(*task)
+
+        data = results.load_results(self.path)
+        self.assertEqual(data["replication"].tolist(), [0, 1])
+        self.assertEqual(data["config.towers.1.EIRP_dBm"].tolist(),
+                         [config["towers"][1]["EIRP_dBm"]] * 2)
+
+    def test_antithetic(self):
+        # the mirrored replication writes the same columns as the first one
+        scenario = short_scenario(seconds=300)
+        scenario.config = cfg.read_json("test_files/golden_config.json")
+        scenario.results_path = self.path
+        for task in replication.replication_tasks(scenario, 2, 1, antithetic=True):
+            replication.run_replication(*task)
+
+        data = results.load_results(self.path)
+        self.assertEqual(data["replication"].tolist(), [0, 1])
+        self.assertEqual(data["antithetic"].tolist(), [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
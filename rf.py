@@ -1,5 +1,7 @@
 import numpy as np
+from functools import lru_cache
 from math import log10
+from types import SimpleNamespace
 
 import tower as Tower
 import errors as err
@@ -13,15 +15,27 @@ def init_shadowing(sim_opts, geometry):
     and base station. No shadowing inside the mall."""
 
     global _shadows
+    _shadows = make_shadowing(sim_opts, geometry, np.random)
+
+
+def make_shadowing(sim_opts, geometry, rng):
+    """Return shadowing values for all postitions between small cell and
+    base station drawn from rng. No shadowing inside the mall."""
     unique_samples = int((geometry.road_end - geometry.mall_end) // sim_opts.shadow_segment_length)
 
-    samples = np.random.normal(
+    samples = rng.normal(
         sim_opts.shadow_mean, sim_opts.shadow_sigma, unique_samples)
 
     # upscale samples to 1m resolution and append with zero values for inside mall
     road = np.repeat(samples, sim_opts.shadow_segment_length)
     mall = np.zeros((1, int(geometry.mall_end)))
-    _shadows = np.append(mall, road)
+    return np.append(mall, road)
+
+
+def make_shadow_raster(sim_opts, shape, rng):
+    """Return shadowing values drawn from rng for a raster of square cells
+    of the shadowing segment length, see cfg.PlaneGeometry."""
+    return rng.normal(sim_opts.shadow_mean, sim_opts.shadow_sigma, shape)
 
 
 def get_shadowing(pos):
@@ -125,6 +139,48 @@ def get_fading():
     return mag2dB(second_smallest)
 
 
+class FadingPool:
+    """Hands out fading values, computed like get_fading, from a buffer that
+    is refilled a whole block at a time. A block is one (N,10) Rayleigh draw
+    partitioned along the rows and converted to dB in a single pass, so the
+    NumPy call overhead is paid once per block instead of once per value.
+    """
+
+    def __init__(self, block_size=65536, rng=None):
+        self.block_size = block_size
+        self.rng = rng  # None for the numpy global rng
+        self._buffer = np.empty(0)
+        self._idx = 0
+
+    def _refill(self, size):
+        rng = np.random if self.rng is None else self.rng
+        samples = rng.rayleigh(1, (size, 10))
+
+        # extract second smallest element of every row
+        second_smallest = np.partition(samples, 1, axis=1)[:, 1]
+        self._buffer = 10 * np.log10(second_smallest)
+        self._idx = 0
+
+    def next(self):
+        """Return one fading value."""
+        if self._idx >= len(self._buffer):
+            self._refill(self.block_size)
+        val = self._buffer[self._idx]
+        self._idx += 1
+        return val
+
+    def take(self, n):
+        """Return an array of n fading values."""
+        if self._idx + n > len(self._buffer):
+            # keep what is left of the buffer and append a fresh block
+            rest = self._buffer[self._idx:]
+            self._refill(max(self.block_size, n - len(rest)))
+            self._buffer = np.concatenate((rest, self._buffer))
+        vals = self._buffer[self._idx:self._idx + n]
+        self._idx += n
+        return vals
+
+
 def get_kth_smallest(array, k):
     """Return the k-th smallest element in array.
     e.g: get 2nd smallest: get_kth_smalles(array, 2).
@@ -182,19 +238,21 @@ def get_penetration(geometry, bstn, user):
             return _interpolate(pos, 0, geometry.wall_loss, hall_length)
 
 
-def RSL(geometry, user, tower):
-    """Return received signal level from tower experienced by the user."""
-    dist_to_tower = abs(user.pos - tower.pos)
-    propagation = okamura_hata(dist_to_tower, tower.freq, tower.height, user.height)
-
-    # only compute shadowing if user is connected to the base station
-    # if connected to base station and inside mall get_shadowing will
-    # return 0.
-    shadow = get_shadowing(user.pos) if tower.tower_type == Tower.BASE_STATION else 0.0
-    fading = get_fading()
-    wall = get_penetration(geometry, tower, user)
+def RSL(geometry, user, tower, streams=None):
+    """Return received signal level from tower experienced by the user.
+    Shadowing and fading come from streams, or the module tables and the
+    numpy global rng if None."""
+    if streams is None:
+        budget = get_link_budget(geometry, tower, user.height)
+        fading = get_fading()
+    else:
+        budget = get_link_budget(geometry, tower, user.height, streams.shadows)
+        fading = streams.fading()
 
-    return tower.EIRP - propagation - shadow + fading - wall
+    try:
+        return budget[int(user.pos)] + fading
+    except IndexError:
+        raise err.InitializationError
 
 
 def okamura_hata(d_m, f_MHz, h_bstn_m, h_handset_m):
@@ -206,3 +264,103 @@ def okamura_hata(d_m, f_MHz, h_bstn_m, h_handset_m):
 
     return 69.55 + 26.16 * log10(f_MHz) - 13.82 * log10(h_bstn_m) + \
         (44.9 - 6.55 * log10(h_bstn_m)) * log10(d_km) - a(h_handset_m)
+
+
+# vectorized versions, operating on arrays of user positions
+
+def okamura_hata_array(d_m, f_MHz, h_bstn_m, h_handset_m):
+    """Okamura-Hata for an array of distances. Everything but the distance
+    term is constant, so it is computed once through okamura_hata at 1 km."""
+    slope = 44.9 - 6.55 * log10(h_bstn_m)
+    return okamura_hata(1000.0, f_MHz, h_bstn_m, h_handset_m) + slope * np.log10(d_m / 1000.0)
+
+
+def get_penetration_array(geometry, bstn, pos):
+    """Wall loss for an array of positions, same rules as get_penetration."""
+    hall_length = geometry.mall_end - geometry.hall_start
+
+    # fraction of the wall loss experienced from the small cell side
+    weight = np.clip((pos - geometry.hall_start) / hall_length, 0.0, 1.0)
+    weight[pos <= geometry.hall_start] = 0.0
+    weight[pos >= geometry.mall_end] = 1.0
+
+    if bstn.tower_type == Tower.SMALL_CELL:
+        return geometry.wall_loss * weight
+    return geometry.wall_loss * (1.0 - weight)
+
+
+def RSL_array(geometry, pos, height, tower, streams=None, fading=None):
+    """Return received signal level from tower for an array of user positions,
+    with the fading values given or drawn from streams."""
+    if streams is None:
+        budget = get_link_budget(geometry, tower, height)
+        if fading is None:
+            fading = FadingPool(len(pos)).take(len(pos))
+    else:
+        budget = get_link_budget(geometry, tower, height, streams.shadows)
+        if fading is None:
+            fading = streams.fading_array(len(pos))
+
+    try:
+        return budget[pos.astype(int)] + fading
+    except IndexError:
+        raise err.InitializationError
+
+
+# static link budget
+
+@lru_cache(maxsize=64)
+def _static_budget(geometry_key, length, tower_key, user_height):
+    """EIRP - propagation - wall loss for the positions of a link budget map.
+    These only depend on the parameters, not on any random values, so they
+    are cached and shared by every simulation run in the same process."""
+    mall_end, hall_start, parking_start, parking_end, road_end, wall_loss = geometry_key
+    tower_pos, freq, height, EIRP, tower_type = tower_key
+
+    geometry = SimpleNamespace(mall_end=mall_end, hall_start=hall_start, wall_loss=wall_loss)
+    tower = SimpleNamespace(tower_type=tower_type)
+    pos = np.arange(length) + 0.5
+
+    dist_to_tower = np.abs(pos - tower_pos)
+    propagation = okamura_hata_array(dist_to_tower, freq, height, user_height)
+    wall = get_penetration_array(geometry, tower, pos)
+
+    budget = EIRP - propagation - wall
+    budget.setflags(write=False)
+    return budget
+
+
+def init_link_budget(geometry, tower, user_height, shadows=None):
+    """Precompute the part of the RSL that only depends on position,
+    EIRP - propagation - shadowing - wall loss, at 1m resolution along the
+    road. Element i holds the value in the middle of the meter [i, i+1).
+    The map is stored on the tower together with what it was built from.
+    """
+    if shadows is None:
+        shadows = _shadows
+
+    length = int(max(geometry.road_end, tower.pos)) + 2
+    tower_key = (tower.pos, tower.freq, tower.height, tower.EIRP, tower.tower_type)
+    budget = _static_budget(geometry.key(), length, tower_key, user_height)
+
+    # only the base station is affected by shadowing, outside the
+    # precomputed shadows there is no shadowing
+    if tower.tower_type == Tower.BASE_STATION:
+        n = min(length, len(shadows))
+        budget = budget.copy()
+        budget[:n] -= shadows[:n]
+
+    tower._link_budget = budget
+    tower._link_budget_key = (geometry, shadows, user_height)
+
+
+def get_link_budget(geometry, tower, user_height, shadows=None):
+    """Return the static link budget map of the tower. It is rebuilt if the
+    geometry, shadowing or user height differ from what it was built from."""
+    if shadows is None:
+        shadows = _shadows
+
+    key = tower._link_budget_key
+    if key is None or key[0] is not geometry or key[1] is not shadows or key[2] != user_height:
+        init_link_budget(geometry, tower, user_height, shadows)
+    return tower._link_budget
@@ -88,6 +88,52 @@ class TestRF(unittest.TestCase):
         self.assertEqual(rf.get_penetration(
             geometry, bstn, usr_in_entry), 21 / 2)
 
+    @unittest.skipIf('-plot' in sys.argv, "plot")
+    def test_penetration_array(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        geometry = cfg.Geometry(config)
+        user_cfg = cfg.UserOptions(config)
+
+        for twr_type in [twr.SMALL_CELL, twr.BASE_STATION]:
+            tower = twr.Tower(cfg.TowerOptions(config, twr_type))
+            positions = np.array([0.0, 150.0, 189.0, 190.0, 195.0, 199.5, 200.0, 201.0, 2500.0])
+            got = rf.get_penetration_array(geometry, tower, positions)
+            for pos, val in zip(positions, got):
+                want = rf.get_penetration(geometry, tower, usr.User(0, user_cfg, pos=pos))
+                self.assertAlmostEqual(val, want)
+
+    @unittest.skipIf('-plot' in sys.argv, "plot")
+    def test_okamura_hata_array(self):
+        distances = np.array([1.0, 10.0, 250.0, 2999.0])
+        got = rf.okamura_hata_array(distances, 1000.0, 50.0, 1.7)
+        for d, val in zip(distances, got):
+            self.assertAlmostEqual(val, rf.okamura_hata(d, 1000.0, 50.0, 1.7))
+
+    @unittest.skipIf('-plot' in sys.argv, "plot")
+    def test_link_budget(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        geometry = cfg.Geometry(config)
+        opts = cfg.SimOptions(config)
+        user_cfg = cfg.UserOptions(config)
+        rf.init_shadowing(opts, geometry)
+
+        for twr_type in [twr.SMALL_CELL, twr.BASE_STATION]:
+            tower = twr.Tower(cfg.TowerOptions(config, twr_type))
+            budget = rf.get_link_budget(geometry, tower, user_cfg.height)
+            for i in [0, 100, 189, 192, 199, 200, 250, 1234, 2998]:
+                user = usr.User(0, user_cfg, pos=i + 0.5)
+                shadow = rf.get_shadowing(user.pos) if twr_type == twr.BASE_STATION else 0
+                want = tower.EIRP - shadow - rf.get_penetration(geometry, tower, user) - \
+                    rf.okamura_hata(abs(user.pos - tower.pos), tower.freq, tower.height, user.height)
+                self.assertAlmostEqual(budget[i], want)
+
+            # new shadowing must trigger a rebuild
+            rf.init_shadowing(opts, geometry)
+            rebuilt = rf.get_link_budget(geometry, tower, user_cfg.height)
+            self.assertIs(tower._link_budget_key[1], rf._shadows)
+            if twr_type == twr.BASE_STATION:
+                self.assertNotAlmostEqual(rebuilt[1000], budget[1000])
+
     @unittest.skipIf('-plot' in sys.argv, "plot")
     def test_interpolation(self):
         val = rf._interpolate(5, 100, 200, 10)
@@ -143,6 +189,19 @@ class TestRF(unittest.TestCase):
                              "get_kth_smallest({}, {}) = {}, expected {}"
                              .format(t[0], t[1], got, t[2]))
 
+    @unittest.skipIf('-plot' in sys.argv, "plot")
+    def test_fading_pool(self):
+        n = 20000
+        direct = np.array([rf.get_fading() for i in range(n)])
+
+        pool = rf.FadingPool(block_size=4096)
+        pooled = np.array([pool.next() for i in range(n // 2)])
+        pooled = np.append(pooled, pool.take(n // 2))
+
+        self.assertEqual(len(pooled), n)
+        self.assertLess(abs(pooled.mean() - direct.mean()), 0.2)
+        self.assertLess(abs(pooled.std() - direct.std()), 0.2)
+
     @unittest.skipIf('-plot' in sys.argv, "plot")
     def test_call_probabilites(self):
         size = 100000
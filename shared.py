@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# memory mapped files in here live in RAM, the same as shared memory blocks
+SHM_DIR = "/dev/shm"
+
+
+def _directory(prefix, directory):
+    if directory is None and os.path.isdir(SHM_DIR):
+        directory = SHM_DIR
+    return tempfile.mkdtemp(prefix=prefix, dir=directory)
+
+
+class StaticTables:
+    """Read-only tables, e.g. plane.link_tables, computed once by the parent
+    process and saved as .npy files that every worker maps read-only. The
+    pages are shared by all processes, pickling only carries the file names.
+    """
+
+    def __init__(self, tables, directory=None):
+        self.directory = _directory("sim_tables_", directory)
+        self.names = list(tables)
+        for name, table in tables.items():
+            np.save(os.path.join(self.directory, name + ".npy"), table)
+        self._tables = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tables"] = None
+        return state
+
+    def tables(self):
+        """Dictionary of name -> read-only memory mapped table."""
+        if self._tables is None:
+            self._tables = {name: np.load(os.path.join(self.directory, name + ".npy"), mmap_mode="r")
+                            for name in self.names}
+        return self._tables
+
+    def close(self):
+        """Unmap and delete the files, only to be called by the parent."""
+        self._tables = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ResultArrays:
+    """Large per-replication results, one row per replication in memory
+    mapped .npy files allocated by the parent process.
+
+    Workers get this object pickled with the scenario, which only carries
+    the file names, write their row in place and mark it done. The parent
+    reads the rows from the same mapping, nothing but the small stats
+    dictionary is sent back through the pool. The files are created in
+    /dev/shm if it exists, so they never touch the disk.
+    """
+
+    def __init__(self, replications, fields, directory=None):
+        # fields maps names to (shape of one row, dtype)
+        self.directory = _directory("sim_arrays_", directory)
+        self.replications = replications
+        self.fields = dict(fields, done=((), np.uint8))
+        self._arrays = {}
+        for name, (shape, dtype) in self.fields.items():
+            self._arrays[name] = np.lib.format.open_memmap(
+                self._path(name), mode="w+", dtype=dtype, shape=(replications,) + tuple(shape))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_arrays"] = {}
+        return state
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + ".npy")
+
+    def has(self, name):
+        return name in self.fields
+
+    def array(self, name):
+        """All rows of name, mapped on first use."""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self._path(name), mmap_mode="r+")
+        return self._arrays[name]
+
+    def row(self, name, index):
+        """Row index of name, a view to write into."""
+        return self.array(name)[index]
+
+    def write(self, index, values):
+        """Write a dictionary of name -> row values to row index."""
+        for name, value in values.items():
+            self.array(name)[index] = value
+
+    def mark_done(self, index):
+        """Flush row index of all arrays, and mark it as complete."""
+        for name in self.fields:
+            if name != "done":
+                self.array(name).flush()
+        self.array("done")[index] = 1
+        self.array("done").flush()
+
+    def rows(self):
+        """Indices of the complete rows."""
+        return np.flatnonzero(self.array("done"))
+
+    def sum(self, name):
+        """Sum of the complete rows of name, one row at a time so no copy of
+        the whole array is made."""
+        shape, dtype = self.fields[name]
+        total = np.zeros(shape, dtype=np.result_type(dtype, np.int64))
+        for r in self.rows():
+            total += self.array(name)[r]
+        return total
+
+    def close(self):
+        """Unmap and delete the files, only to be called by the parent."""
+        self._arrays = {}
+        shutil.rmtree(self.directory, ignore_errors=True)
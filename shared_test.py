@@ -0,0 +1,56 @@
+import pickle
+import unittest
+import numpy as np
+
+import shared
+
+
+class TestResultArrays(unittest.TestCase):
+
+    def setUp(self):
+        self.arrays = shared.ResultArrays(3, {"series": ((4, 2), np.int32),
+                                              "counts": ((5,), np.int64)})
+
+    def tearDown(self):
+        self.arrays.close()
+
+    def test_shapes(self):
+        self.assertEqual(self.arrays.array("series").shape, (3, 4, 2))
+        self.assertEqual(self.arrays.array("counts").dtype, np.int64)
+        self.assertEqual(self.arrays.rows().tolist(), [])
+
+    def test_write_through_copy(self):
+        # a worker gets a pickled copy, which maps the same files
+        worker = pickle.loads(pickle.dumps(self.arrays))
+        worker.row("series", 1)[:] = 7
+        worker.write(1, {"counts": np.arange(5)})
+        worker.mark_done(1)
+        worker.write(2, {"counts": np.ones(5)})
+
+        self.assertEqual(self.arrays.rows().tolist(), [1])
+        self.assertEqual(self.arrays.array("series")[1].sum(), 7 * 8)
+        # only complete rows are summed
+        self.assertEqual(self.arrays.sum("counts").tolist(), [0, 1, 2, 3, 4])
+
+    def test_pickle_is_small(self):
+        self.arrays.row("series", 0)[:] = 1
+        self.assertLess(len(pickle.dumps(self.arrays)), 1000)
+
+
+class TestStaticTables(unittest.TestCase):
+
+    def test_read_only_copy(self):
+        tables = shared.StaticTables({"budget": np.arange(12.0).reshape(6, 2)})
+        try:
+            worker = pickle.loads(pickle.dumps(tables))
+            budget = worker.tables()["budget"]
+            self.assertIsInstance(budget, np.memmap)
+            self.assertEqual(budget[5].tolist(), [10.0, 11.0])
+            with self.assertRaises(ValueError):
+                budget[0] = 1.0
+        finally:
+            tables.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,48 +1,174 @@
-import multiprocessing as multiproc
-import os
-import sys
 import time
-import numpy as np
 
+import checkpoint as ckpt
+import corridor
+import events
 import output
-import rf
-import tower as twr
 import user as usr
+import vectorized
+
+
+def run(base_station, small_cell, geometry, sim_opts, user_opts, cli_args, streams,
+        telemetry=None, checkpoint=None, progress=None):
+    """Run one simulation with the engine selected by cli_args.engine, see
+    corridor.simulate for configs with any number of towers. If
+    telemetry (a telemetry.Telemetry) is given it is filled while simulating.
+    If checkpoint is given the state is saved to that file every simulated
+    hour, only supported by the step engine. If progress (a
+    progress.Progress) is given an event is emitted every simulated hour."""
+    if checkpoint is not None and cli_args.engine != "step":
+        raise ValueError("checkpoints are only supported by the step engine")
+
+    if cli_args.engine == "corridor":
+        return corridor.simulate([base_station, small_cell], geometry, sim_opts, user_opts,
+                                 cli_args, streams, telemetry, progress)
+    if cli_args.engine == "vector":
+        return vectorized.simulate(base_station, small_cell, geometry, sim_opts,
+                                   user_opts, cli_args, streams, telemetry, progress)
 
+    users = usr.init_users(sim_opts.num_users, user_opts)
+    if cli_args.engine == "event":
+        return events.simulate(base_station, small_cell, users, geometry, sim_opts,
+                               cli_args, streams, telemetry, progress)
+    return simulate(base_station, small_cell, users, geometry, sim_opts, cli_args, streams,
+                    telemetry, checkpoint, progress)
+
+
+def simulate(base_station, small_cell, users, geometry, sim_opts, cli_args, streams,
+             telemetry=None, checkpoint=None, progress=None):
+    # only connected users are visited every timestep, the number of idle
+    # users starting a call is drawn in one go
+    state = {
+        "i": 0,
+        "runtime": 0.0,
+        "base_station": base_station,
+        "small_cell": small_cell,
+        "users": users,
+        "active": [u for u in users if u.connected_to is not None],
+        "idle": [u for u in users if u.connected_to is None],
+        "tot_bstn": 0,
+        "tot_cell": 0,
+        "geometry": geometry,
+        "sim_opts": sim_opts,
+        "streams": streams,
+        "telemetry": telemetry,
+    }
+    return resume(state, cli_args, checkpoint, progress)
 
-def simulate(base_station, small_cell, users, geometry, sim_opts, cli_args):
+
+def resume(state, cli_args, checkpoint=None, progress=None):
+    """Run the step engine from state, as created by simulate or loaded with
+    checkpoint.load. If checkpoint is given the state is saved to that file
+    at the start of every simulated hour. progress is not part of the state,
+    as it writes to a file from a thread."""
     start_time = time.time()
+    # runtime of the run up to the state
+    base_runtime = state["runtime"]
+
+    base_station, small_cell = state["base_station"], state["small_cell"]
+    active, idle = state["active"], state["idle"]
+    tot_bstn, tot_cell = state["tot_bstn"], state["tot_cell"]
+    geometry, sim_opts = state["geometry"], state["sim_opts"]
+    streams, telemetry = state["streams"], state["telemetry"]
 
     # run simulation
-    tot_bstn, tot_cell = 0, 0
-    for i in range(sim_opts.iterations):
+    first = state["i"]
+    for i in range(first, sim_opts.iterations):
 
-        # print status updates
-        status_update = (not cli_args.silent and (i % 3600 == 0 and i != 0))
-        if status_update and not cli_args.supersilent:
-            base_description = "Base Station: t = {} hrs".format(i // 3600)
-            small_description = "Small Cell:  t = {} hrs".format(i // 3600)
+        if checkpoint is not None and i % 3600 == 0 and i != first:
+            state.update(i=i, active=active, idle=idle, tot_bstn=tot_bstn, tot_cell=tot_cell,
+                         runtime=base_runtime + time.time() - start_time)
+            ckpt.save(checkpoint, state)
 
-            output.print_tower_status(base_station, description=base_description)
-            output.print_tower_status(small_cell, description=small_description)
+        # print status updates
+        status_update(i, base_station, small_cell, cli_args, telemetry, progress)
 
         tot_bstn += base_station._channels_in_use
         tot_cell += small_cell._channels_in_use
-        # simulate timestep
-        for u in users:
-            u.on_timestep(geometry, base_station, small_cell)
+        if telemetry is not None:
+            telemetry.advance(i + 1)
+
+        # simulate timestep for connected users
+        for u in active:
+            u.update_call(geometry, base_station, small_cell, streams)
+        finished = [u for u in active if u.connected_to is None]
+        active = [u for u in active if u.connected_to is not None]
+
+        # new callers
+        callers = _draw_callers(idle, streams)
+        for u in callers:
+            u.wants_to_call = True
+            u.start_call(geometry, base_station, small_cell, streams)
+            if u.connected_to is None:
+                idle.append(u)
+            else:
+                active.append(u)
+
+        # users that hung up this timestep can call again from the next one
+        idle.extend(finished)
+
+    if telemetry is not None:
+        telemetry.finish()
 
     end_time = time.time()
-    runtime = end_time - start_time
+    runtime = base_runtime + end_time - start_time
 
-    output.print_sim_summary(geometry, sim_opts, runtime)
-    output.print_tower_summary(base_station, "Summary Base Station")
-    output.print_tower_summary(small_cell, "Summary Small Cell")
+    if not cli_args.supersilent:
+        output.print_sim_summary(geometry, sim_opts, runtime)
+        output.print_tower_summary(base_station, "Summary Base Station")
+        output.print_tower_summary(small_cell, "Summary Small Cell")
 
     avg_calls_base = float(tot_bstn) / float(i)
     avg_calls_cell = float(tot_cell) / float(i)
 
-    # summarize simulation
+    return summarize(base_station, small_cell, runtime, avg_calls_base, avg_calls_cell)
+
+
+def _draw_callers(idle, streams):
+    """Draw the number of idle users that want to call this timestep, and
+    remove that many randomly chosen users from the idle pool."""
+    num_calls = streams.num_callers(len(idle))
+
+    callers = []
+    for n in range(num_calls):
+        # swap a random user to the end of the pool and take it out
+        j = streams.pick(len(idle))
+        idle[j], idle[-1] = idle[-1], idle[j]
+        callers.append(idle.pop())
+    return callers
+
+
+def status_update(i, base_station, small_cell, cli_args, telemetry=None, progress=None):
+    """hourly_update of the base station and small cell."""
+    hourly_update(i, [base_station, small_cell], ["Base Station:", "Small Cell: "], cli_args,
+                  telemetry, progress)
+
+
+def hourly_update(i, towers, labels, cli_args, telemetry=None, progress=None):
+    """Print the status of the towers, each headed by its label, at every
+    whole simulated hour, end the hour of the telemetry and emit a progress
+    event if given. Every engine calls this at every time step."""
+    if i % 3600 != 0 or i == 0:
+        return
+    if telemetry is not None:
+        telemetry.end_hour()
+    if progress is not None:
+        progress.hour(i)
+
+    if not cli_args.silent and not cli_args.supersilent:
+        for tower, label in zip(towers, labels):
+            output.print_tower_status(tower, description="{} t = {} hrs".format(label, i // 3600))
+
+
+def summarize(base_station, small_cell, runtime, avg_calls_base, avg_calls_cell):
+    """Collect the statistics of a finished simulation from the tower counters."""
+    return summarize_towers([base_station, small_cell], ["base_station", "small_cell"],
+                            runtime, avg_calls_base, avg_calls_cell)
+
+
+def summarize_towers(towers, names, runtime, avg_calls_base, avg_calls_cell):
+    """Collect the statistics of a finished simulation from the counters of
+    any number of towers, the counters of each are stored under its name."""
     total_call_attempts = 0
     total_call_failures = 0
     total_fail_no_signal = 0
@@ -53,7 +179,7 @@ def simulate(base_station, small_cell, users, geometry, sim_opts, cli_args):
     total_dropped = 0
     total_failed_to_connect = 0
     total_saved_by_secondary = 0
-    for n in [base_station, small_cell]:
+    for n in towers:
         # don't count ongoing calls as these might go both ways
         total_call_attempts += n._connections_attempts
         total_call_failures += n._blocked_no_sig + n._blocked_no_chan
@@ -80,66 +206,21 @@ def simulate(base_station, small_cell, users, geometry, sim_opts, cli_args):
         "total_saved_by_secondary": total_saved_by_secondary,
         "avg_calls_base": avg_calls_base,
         "avg_calls_cell": avg_calls_cell,
-
+        "towers": {name: tower.counters() for name, tower in zip(names, towers)},
     }
     return stats
 
 
-def concurrent_sim(base_opts, small_opts, user_opts, sim_opts, geometry,
-                   cli_args, queue, seed, name=""):
-    """Run one concurrent instance of a simulation. All printing is done to a
-    named file instead of stdout to avoid nonsensical cluttering by multiple
-    threads."""
-    # redirect stdout
-    filename = name if name != "" else "pid_{}.txt".format(os.getpid())
-    sys.stdout = open(filename, mode="w")
-
-    # precompute random values (for performance)
-    # must be done for each process
-    np.random.seed(seed)
-    rf.init_shadowing(sim_opts, geometry)
-    max_possible_dails = sim_opts.num_users * sim_opts.iterations
-    rf.init_call_probabilities(max_possible_dails, sim_opts.call_rate)
-
-    # set up simulation
-    base_station = twr.Tower(base_opts)
-    small_cell = twr.Tower(small_opts)
-    users = usr.init_users(sim_opts.num_users, user_opts)
-
-    # simulate normally
-    stats = simulate(base_station, small_cell, users, geometry, sim_opts, cli_args)
-    # save statistics
-    queue.put(stats)
-
+def kpis(stats):
+    """Key performance indicators of one simulation, as fractions of all
+    call attempts. GOS is computed the same way output.print_aggregate_stats does."""
+    attempts = float(stats["total_call_attempts"])
+    if attempts == 0:
+        return {"gos": 0.0, "drop_rate": 0.0, "block_capacity": 0.0, "block_signal": 0.0}
 
-def multi_sim(base_opts, small_opts, user_opts, sim_opts, geometry, cli_args, times=5):
-    """Spawn multiple processes running the simulation concurrently."""
-    Q = multiproc.Queue()
-    start_time = time.time()
-
-    # spawn simulation threads
-    processes = []
-    for i in range(times):
-        name = cli_args.output + "_" + str(i) + ".txt"
-        seed = sim_opts.seed + i
-        sim_opts.seed = seed
-        proc = multiproc.Process(target=concurrent_sim,
-                                 args=(base_opts, small_opts, user_opts,
-                                       sim_opts, geometry, cli_args, Q, seed, name))
-        processes.append(proc)
-        proc.start()
-
-    # wait for simulations to complete
-    for proc in processes:
-        proc.join()
-
-    end_time = time.time()
-    runtime = end_time - start_time
-    print("all %d simulations done in %d seconds" % (times, runtime))
-
-    # get results from queue
-    stats = []
-    for i in range(times):
-        stats.append(Q.get())
-
-    output.print_aggregate_stats(stats)
+    return {
+        "gos": (stats["total_failed_to_connect"] - stats["total_saved_by_secondary"]) / attempts,
+        "drop_rate": stats["total_dropped"] / attempts,
+        "block_capacity": stats["total_fail_no_channel"] / attempts,
+        "block_signal": stats["total_fail_no_signal"] / attempts,
+    }
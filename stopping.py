@@ -0,0 +1,83 @@
+from math import inf, sqrt
+from statistics import NormalDist
+
+
+class Welford:
+    """Running mean and variance, updated one value at a time."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+
+    def variance(self):
+        """Sample variance, inf with less than two values."""
+        if self.n < 2:
+            return inf
+        return self._m2 / (self.n - 1)
+
+
+def t_quantile(p, df):
+    """Quantile of the Student t distribution, by expansion around the normal
+    quantile. Within 0.01 of the exact value for df >= 3."""
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+class SequentialEstimator:
+    """Confidence intervals of the means of a set of named values (e.g. the
+    KPIs of every replication), updated as values arrive. Converged once the
+    relative half-width of every interval is at most tolerance."""
+
+    def __init__(self, names, tolerance, confidence=0.95, min_runs=5):
+        self.names = names
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.min_runs = max(min_runs, 4)
+        self.estimators = {name: Welford() for name in names}
+
+    def add(self, values):
+        for name in self.names:
+            self.estimators[name].add(values[name])
+
+    def runs(self):
+        return self.estimators[self.names[0]].n
+
+    def mean(self, name):
+        return self.estimators[name].mean
+
+    def half_width(self, name):
+        est = self.estimators[name]
+        if est.n < 2:
+            return inf
+        t = t_quantile(0.5 + self.confidence / 2, est.n - 1)
+        return t * sqrt(est.variance() / est.n)
+
+    def relative_half_width(self, name):
+        half, mean = self.half_width(name), abs(self.mean(name))
+        if half == 0.0:
+            # every run gave the same value, e.g. no drops at all
+            return 0.0
+        if mean == 0.0:
+            return inf
+        return half / mean
+
+    def converged(self):
+        if self.runs() < self.min_runs:
+            return False
+        return all(self.relative_half_width(name) <= self.tolerance for name in self.names)
+
+    def rows(self):
+        """One row per value with its mean and confidence interval, see output.print_table."""
+        return [{"kpi": name, "mean": self.mean(name), "half_width": self.half_width(name),
+                 "relative": self.relative_half_width(name)} for name in self.names]
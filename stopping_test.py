@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+
+import stopping
+
+
+class TestStopping(unittest.TestCase):
+
+    def test_welford(self):
+        xs = np.random.default_rng(1).normal(3.0, 2.0, 1000)
+        est = stopping.Welford()
+        for x in xs:
+            est.add(x)
+        self.assertAlmostEqual(est.mean, xs.mean())
+        self.assertAlmostEqual(est.variance(), xs.var(ddof=1))
+
+    def test_t_quantile(self):
+        # exact values from tables
+        for df, expected in [(3, 3.182), (4, 2.776), (9, 2.262), (29, 2.045)]:
+            self.assertAlmostEqual(stopping.t_quantile(0.975, df), expected, delta=0.01)
+
+    def test_converged(self):
+        est = stopping.SequentialEstimator(["a", "zero"], tolerance=0.05, min_runs=5)
+        for x in [1.0, 1.01, 0.99, 1.0]:
+            est.add({"a": x, "zero": 0.0})
+        self.assertFalse(est.converged(), "not before min_runs")
+
+        est.add({"a": 1.0, "zero": 0.0})
+        self.assertTrue(est.converged())
+        self.assertEqual(est.relative_half_width("zero"), 0.0)
+
+        est.add({"a": 3.0, "zero": 0.0})
+        self.assertFalse(est.converged())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,288 @@
+import numpy as np
+from math import ceil, log
+
+import rf
+
+# time_to_call when users never call
+NEVER = 2 ** 62
+
+
+class _Chunked:
+    """Buffer of random values refilled a fixed size chunk at a time, so the
+    memory used is bounded no matter how long the simulation runs."""
+
+    def __init__(self, draw, chunk_size):
+        self._draw = draw
+        self.chunk_size = chunk_size
+        self._buffer = np.empty(0)
+        self._idx = 0
+
+    def next(self):
+        """Return one value."""
+        if self._idx >= len(self._buffer):
+            self._buffer = self._draw(self.chunk_size)
+            self._idx = 0
+        val = self._buffer[self._idx]
+        self._idx += 1
+        return val
+
+    def take(self, n):
+        """Return an array of n values."""
+        if self._idx + n > len(self._buffer):
+            rest = self._buffer[self._idx:]
+            fresh = self._draw(max(self.chunk_size, n - len(rest)))
+            self._buffer = np.concatenate((rest, fresh))
+            self._idx = 0
+        vals = self._buffer[self._idx:self._idx + n]
+        self._idx += n
+        return vals
+
+
+class _Mirrored:
+    """The antithetic counterpart of a numpy.random.Generator: every value x
+    it would draw from a continuous distribution F is returned as
+    F^-1(1 - F(x)), so a run with mirrored generators uses the same draws
+    as the original run, at the other end of the distribution. Binomial
+    draws are discrete and passed through unchanged."""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def random(self, size=None):
+        return np.minimum(1.0 - self.rng.random(size), np.nextafter(1.0, 0.0))
+
+    def standard_exponential(self, size=None):
+        x = np.maximum(self.rng.standard_exponential(size), _TINY)
+        return -np.log(-np.expm1(-x))
+
+    def rayleigh(self, scale=1.0, size=None):
+        x = np.maximum(self.rng.rayleigh(scale, size), _TINY) / scale
+        return scale * np.sqrt(-2.0 * np.log(-np.expm1(-x * x / 2.0)))
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        return 2.0 * loc - self.rng.normal(loc, scale, size)
+
+    def binomial(self, n, p, size=None):
+        return self.rng.binomial(n, p, size)
+
+
+_TINY = 1e-150
+
+# size of the table of fading values the keyed draws index into
+KEYED_FADING = 2 ** 18
+
+_FADING_SHIFT = 64 - (KEYED_FADING.bit_length() - 1)
+
+_MASK = 2 ** 64 - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MULTIPLIER = 0xD6E8FEB86659FD93
+
+
+def _mix(x):
+    """splitmix64 finalizer, a bijective hash of uint64 arrays."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _mix_int(x):
+    """_mix of one Python int, faster than a numpy array of one."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def _mirrored_rng(seed):
+    return _Mirrored(np.random.default_rng(seed))
+
+
+class RandomStreams:
+    """All random values used by one simulation. Every kind of value has
+    its own numpy.random.Generator spawned from one seed, and is handed out
+    from fixed size chunks refilled on demand. Instances are independent of
+    each other and of the numpy global rng, so they can be passed to
+    separate processes or simulations safely.
+
+    Simulations given the same seed use the same values for the same
+    purpose, common random numbers for comparing scenarios. With antithetic
+    every value is mirrored (see _Mirrored), so runs with the same seed with
+    and without antithetic are negatively correlated.
+
+    The values of a purpose are drawn in an order that depends on the state
+    of the simulation, so two scenarios soon use them for different users.
+    With keyed, the draws of the array engines (the *_of methods) are
+    instead a hash of the purpose, the time set by set_time and the user,
+    so a user gets the same value at the same time in every scenario,
+    however many other users draw. Without keyed the *_of methods draw in
+    order like the other methods, which is faster.
+    """
+
+    def __init__(self, seed=None, call_rate=1.0, chunk_size=65536, antithetic=False,
+                 keyed=False):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+
+        self.antithetic = antithetic
+        self.keyed = keyed
+        generator = _mirrored_rng if antithetic else np.random.default_rng
+        arrivals, durations, spawn, fading, shadowing, keys = self.seed_sequence.spawn(6)
+        self.arrivals = generator(arrivals)
+        self.durations = generator(durations)
+        self.spawn = generator(spawn)
+        self.fading_rng = generator(fading)
+        self.shadowing_rng = generator(shadowing)
+
+        self.call_prob = min(float(call_rate) / 3600.0, 1.0)
+        self._log_no_call = log(1.0 - self.call_prob) if self.call_prob < 1.0 else None
+
+        self._arrival_uniforms = _Chunked(self.arrivals.random, chunk_size)
+        self._call_times = _Chunked(self.durations.standard_exponential, chunk_size)
+        self._spawn_uniforms = _Chunked(self.spawn.random, chunk_size)
+        self.fading_pool = rf.FadingPool(chunk_size, rng=self.fading_rng)
+
+        # shadowing values along the road, see init_shadowing
+        self.shadows = np.zeros(0)
+
+        # keys of the arrivals, durations, spawn and fading keyed draws
+        self._keys = [int(k) for k in keys.generate_state(4, np.uint64)]
+        self._time_keys = [np.uint64(k) for k in self._keys]
+        self._index_table = np.zeros(0, dtype=np.uint64)
+        self._fading_table = None
+        # want_calls_of compares the hashes to call_prob scaled to 2^64
+        self._call_threshold = np.uint64(min(int(self.call_prob * 2.0 ** 64), _MASK))
+        self._call_threshold_mirrored = np.uint64(_MASK - int(self._call_threshold) + 1)
+
+    # call arrivals
+
+    def want_call(self):
+        """Return true with the per second call probability."""
+        return self._arrival_uniforms.next() < self.call_prob
+
+    def want_calls(self, n):
+        """Return boolean array, true with the per second call probability."""
+        return self._arrival_uniforms.take(n) < self.call_prob
+
+    def time_to_call(self):
+        """Number of seconds until want_call would return true, geometrically
+        distributed with the per second call probability."""
+        u = self._arrival_uniforms.next()
+        if self._log_no_call is None:
+            return 1
+        if self._log_no_call == 0.0:
+            return NEVER
+        return max(1, int(ceil(log(1.0 - u) / self._log_no_call)))
+
+    def num_callers(self, num_idle):
+        """Number of idle users that start a call this second."""
+        return int(self.arrivals.binomial(num_idle, self.call_prob))
+
+    def pick(self, n):
+        """Random index in range(n)."""
+        return min(int(self._arrival_uniforms.next() * n), n - 1)
+
+    # call durations
+
+    def call_time(self, mean):
+        """Return an exponentially distributed call duration, like rf.call_time."""
+        return int(mean * self._call_times.next())
+
+    def call_times(self, mean, n):
+        """Return array of n exponentially distributed call durations."""
+        return (mean * self._call_times.take(n)).astype(np.int64)
+
+    # spawn positions
+
+    def random(self):
+        """Uniform value in [0, 1) used for spawn positions."""
+        return self._spawn_uniforms.next()
+
+    def random_array(self, n):
+        """Array of n uniform values in [0, 1) used for spawn positions."""
+        return self._spawn_uniforms.take(n)
+
+    # radio
+
+    def fading(self):
+        """Return one fading value, like rf.get_fading."""
+        return self.fading_pool.next()
+
+    def fading_array(self, n):
+        """Return array of n fading values."""
+        return self.fading_pool.take(n)
+
+    # draws of users, keyed by user and time with keyed
+
+    def set_time(self, t):
+        """Set the simulated time of the keyed draws."""
+        if self.keyed:
+            self._time_keys = [np.uint64(_mix_int((k + t * _GOLDEN) & _MASK)) for k in self._keys]
+
+    def _index_hashes(self, indices):
+        """uint64 hashes of an array of indices, from a table grown on demand."""
+        try:
+            return self._index_table[indices]
+        except IndexError:
+            n = max(2 * len(self._index_table), int(np.max(indices)) + 1)
+            self._index_table = _mix(np.arange(1, n + 1, dtype=np.uint64) * np.uint64(_GOLDEN))
+            return self._index_table[indices]
+
+    def _hashes(self, purpose, users):
+        """uint64 hashes of the users (array of indices) at the time set,
+        one multiply-xorshift round over the hashes of the users."""
+        x = (self._index_hashes(users) ^ self._time_keys[purpose]) * np.uint64(_MULTIPLIER)
+        return x ^ (x >> np.uint64(32))
+
+    def _uniforms(self, purpose, users):
+        """Uniform values in (0, 1] of the users, mirrored with antithetic."""
+        u = ((self._hashes(purpose, users) >> np.uint64(11)) + np.uint64(1)) * 2.0 ** -53
+        return 1.0 - u + 2.0 ** -53 if self.antithetic else u
+
+    def want_calls_of(self, users):
+        """Boolean array, true for the users (array of indices) that start a
+        call, see want_calls."""
+        if not self.keyed:
+            return self.want_calls(len(users))
+        if self.antithetic:
+            return self._hashes(0, users) >= self._call_threshold_mirrored
+        return self._hashes(0, users) < self._call_threshold
+
+    def call_times_of(self, users, mean):
+        """Call durations of the users, see call_times."""
+        if not self.keyed:
+            return self.call_times(mean, len(users))
+        return (-mean * np.log(self._uniforms(1, users))).astype(np.int64)
+
+    def random_of(self, users, k):
+        """Array of k uniform values for each of the users, one row per
+        user, see random_array."""
+        if not self.keyed:
+            return self.random_array(k * len(users)).reshape(len(users), k)
+        users = np.asarray(users)
+        return self._uniforms(2, k * users[:, np.newaxis] + np.arange(k))
+
+    def fading_of(self, users, towers):
+        """Fading values of the links between users and towers (arrays of
+        indices broadcast against each other), see fading_array. Keyed
+        values are picked from a table of KEYED_FADING values drawn at first
+        use."""
+        if not self.keyed:
+            shape = np.broadcast(users, towers).shape
+            return self.fading_array(int(np.prod(shape))).reshape(shape)
+        if self._fading_table is None:
+            self._fading_table = rf.FadingPool(KEYED_FADING, rng=self.fading_rng).take(KEYED_FADING)
+        towers = np.atleast_1d(towers)
+        x = self._hashes(3, users) ^ (self._index_hashes(towers) * np.uint64(_MULTIPLIER))
+        return self._fading_table[(x >> np.uint64(_FADING_SHIFT)).astype(np.intp)]
+
+    def init_shadowing(self, sim_opts, geometry):
+        """Draw the shadowing values of this simulation, see rf.make_shadowing."""
+        self.shadows = rf.make_shadowing(sim_opts, geometry, self.shadowing_rng)
+        return self.shadows
+
+    def init_shadow_raster(self, sim_opts, geometry):
+        """Draw the shadowing values of a 2D deployment, one per raster cell
+        of the cfg.PlaneGeometry, see rf.make_shadow_raster."""
+        self.shadows = rf.make_shadow_raster(sim_opts, geometry.raster_shape(), self.shadowing_rng)
+        return self.shadows
@@ -0,0 +1,92 @@
+import argparse
+import unittest
+import numpy as np
+
+import streams as rnd
+
+
+class _Raster:
+    def raster_shape(self):
+        return (20, 30)
+
+
+class TestRandomStreams(unittest.TestCase):
+
+    def test_reproducible(self):
+        a = rnd.RandomStreams(42, call_rate=60)
+        b = rnd.RandomStreams(42, call_rate=60)
+        for i in range(1000):
+            self.assertEqual(a.want_call(), b.want_call())
+            self.assertEqual(a.call_time(180), b.call_time(180))
+            self.assertEqual(a.fading(), b.fading())
+
+    def test_antithetic(self):
+        a = rnd.RandomStreams(5, call_rate=60)
+        b = rnd.RandomStreams(5, call_rate=60, antithetic=True)
+        np.testing.assert_allclose(a.random_array(1000) + b.random_array(1000), 1.0)
+
+        # mirrored through the distribution, the same marginals
+        x, y = a.call_times(180, 50000), b.call_times(180, 50000)
+        self.assertLess(np.corrcoef(x, y)[0, 1], -0.5)
+        self.assertLess(abs(y.mean() - 179.5), 3)
+
+        sim_opts = argparse.Namespace(shadow_mean=1.0, shadow_sigma=2.0)
+        shadows = a.init_shadow_raster(sim_opts, _Raster()), b.init_shadow_raster(sim_opts, _Raster())
+        np.testing.assert_allclose(shadows[0] + shadows[1], 2.0)
+
+    def test_keyed(self):
+        a = rnd.RandomStreams(9, call_rate=360, keyed=True)
+        b = rnd.RandomStreams(9, call_rate=360, keyed=True)
+        mirrored = rnd.RandomStreams(9, call_rate=360, keyed=True, antithetic=True)
+        users = np.arange(0, 20000, 2)
+
+        # the same user at the same time draws the same values, however
+        # many other users draw
+        for s in [a, b, mirrored]:
+            s.set_time(17)
+        np.testing.assert_array_equal(a.want_calls_of(users)[::10], b.want_calls_of(users[::10]))
+        np.testing.assert_array_equal(a.random_of(users, 2)[5:], b.random_of(users[5:], 2))
+        np.testing.assert_array_equal(a.fading_of(users[:, np.newaxis], [0, 1])[:, 1],
+                                      b.fading_of(users, 1))
+        np.testing.assert_allclose(a.random_of(users, 3) + mirrored.random_of(users, 3), 1.0)
+
+        # but different values at other times, at the usual rates
+        calls = a.want_calls_of(users)
+        self.assertLess(abs(calls.mean() - 0.1), 0.01)
+        # mirrored users call at the other end of the distribution
+        self.assertFalse((calls & mirrored.want_calls_of(users)).any())
+        b.set_time(18)
+        self.assertLess(abs(np.count_nonzero(calls & b.want_calls_of(users)) - 100), 30)
+        self.assertLess(abs(a.call_times_of(users, 180).mean() - 179.5), 6)
+        fading, ordered = a.fading_of(users, 0), a.fading_array(20000)
+        self.assertLess(abs(fading.mean() - ordered.mean()), 0.2)
+        self.assertLess(abs(fading.std() - ordered.std()), 0.2)
+
+    def test_bounded_memory(self):
+        s = rnd.RandomStreams(1, chunk_size=1000)
+        for i in range(5500):
+            s.want_call()
+            s.random()
+        self.assertLessEqual(len(s._arrival_uniforms._buffer), 1000)
+        self.assertLessEqual(len(s._spawn_uniforms._buffer), 1000)
+
+        # take more than a chunk at once, then continue normally
+        self.assertEqual(len(s.random_array(2500)), 2500)
+        self.assertEqual(len(s.random_array(10)), 10)
+
+    def test_call_statistics(self):
+        s = rnd.RandomStreams(7, call_rate=36, chunk_size=4096)
+        n = 100000
+        calls = sum(s.want_call() for i in range(n))
+        self.assertLess(abs(calls - n / 100), 100)
+
+        waits = np.array([s.time_to_call() for i in range(20000)])
+        self.assertLess(abs(waits.mean() - 100), 3)
+        self.assertGreaterEqual(waits.min(), 1)
+
+        durations = s.call_times(180, n)
+        self.assertLess(abs(durations.mean() - 179.5), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
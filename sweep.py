@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+import argparse
+import itertools
+import json
+import os
+import time
+import numpy as np
+
+import cfg
+import output
+import replication
+import simulation as sim
+import stopping
+
+# statistics averaged over the replications of every scenario
+STATS_COLUMNS = ["total_call_attempts", "total_dropped", "total_fail_no_channel",
+                 "total_fail_no_signal", "total_handover_failures",
+                 "avg_calls_base", "avg_calls_cell"]
+KPI_COLUMNS = replication.KPIS
+
+
+def expand_grid(grid):
+    """Expand {path: [values]} into the list of all combinations of overrides."""
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[grid[k] for k in keys])]
+
+
+def build_scenarios(config, overrides_list, cli_args, cache_dir=None, results_path=None,
+                    progress_path=None):
+    """One scenario for every set of overrides, labeled by its index."""
+    scenarios = []
+    for n, overrides in enumerate(overrides_list):
+        scenario = replication.scenario_from_config(cfg.apply_overrides(config, overrides), cli_args, n)
+        scenario.cache_dir = cache_dir
+        scenario.results_path = results_path
+        scenario.progress_path = progress_path
+        scenarios.append(scenario)
+    return scenarios
+
+
+def results_table(overrides_list, results):
+    """Average the statistics of all replications of each scenario into one
+    row per scenario."""
+    rows = []
+    for n, overrides in enumerate(overrides_list):
+        runs = [r for r in results if r["scenario"] == n]
+        row = dict(overrides)
+        row["replications"] = len(runs)
+        for col in STATS_COLUMNS:
+            row[col] = float(np.mean([r[col] for r in runs])) if runs else 0.0
+
+        kpis = [sim.kpis(r) for r in runs]
+        for col in KPI_COLUMNS:
+            row[col] = float(np.mean([k[col] for k in kpis])) if runs else 0.0
+        rows.append(row)
+    return rows
+
+
+def sweep(config, overrides_list, *args, **kwargs):
+    """Run replications of every scenario and return the results table, see
+    run_scenarios for the arguments."""
+    return results_table(overrides_list, run_scenarios(config, overrides_list, *args, **kwargs))
+
+
+def run_scenarios(config, overrides_list, cli_args, replications, workers=None, seed=0,
+                  on_result=None, cache_dir=None, results_path=None, tolerance=None,
+                  progress_path=None, common=False, antithetic=False):
+    """Run replications of every scenario, all scheduled on the same process
+    pool, and return the stats of all of them. Each scenario gets independent
+    random streams spawned from seed. With common, replication i of every
+    scenario uses the same streams instead (common random numbers), and with
+    antithetic replications are run as mirrored pairs, see
+    replication.replication_tasks. Both draw keyed random values, see
+    streams.RandomStreams. Results are looked up in and stored to
+    the result cache in cache_dir, if given. Every replication is appended
+    to the csv file results_path, if given, and the progress events of every
+    replication to progress_path, if given.
+
+    If tolerance is given, replications of a scenario stop being scheduled
+    once the relative half-width of the confidence interval of every KPI is
+    at most tolerance, with replications as the maximum per scenario. The
+    estimator assumes independent replications, so tolerance can not be
+    combined with antithetic.
+    """
+    if tolerance is not None and antithetic:
+        raise ValueError("tolerance needs independent replications, not antithetic pairs")
+    scenarios = build_scenarios(config, overrides_list, cli_args, cache_dir, results_path,
+                                progress_path)
+    tables = replication.publish_tables(scenarios)
+    try:
+        return _run(scenarios, replications, workers, seed, on_result, tolerance, common,
+                    antithetic)
+    finally:
+        for t in tables:
+            t.close()
+
+
+def _run(scenarios, replications, workers, seed, on_result, tolerance, common, antithetic):
+    # paired runs only reduce variance while they use the same random
+    # values for the same users
+    for scenario in scenarios:
+        scenario.keyed = common or antithetic
+    if common:
+        # separate but equal sequences, spawning changes a SeedSequence
+        seeds = [np.random.SeedSequence(seed) for _ in scenarios]
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(len(scenarios))
+    per_scenario = []
+    for scenario, seed_seq in zip(scenarios, seeds):
+        per_scenario.append(replication.replication_tasks(scenario, replications, seed_seq,
+                                                          antithetic=antithetic))
+
+    if tolerance is None:
+        tasks = [task for scenario_tasks in per_scenario for task in scenario_tasks]
+        return replication.run_tasks(tasks, workers, on_result)
+
+    # interleave the scenarios, so all of them make progress at the same time
+    tasks = [task for round in zip(*per_scenario) for task in round]
+    estimators = [stopping.SequentialEstimator(KPI_COLUMNS, tolerance) for _ in scenarios]
+
+    def add(stats):
+        estimators[stats["scenario"]].add(sim.kpis(stats))
+        if on_result is not None:
+            on_result(stats)
+
+    def converged(task):
+        return estimators[task[0].label].converged()
+
+    return replication.run_tasks(tasks, workers, add, skip=converged)
+
+
+def _load_json_arg(arg):
+    """Command line JSON given inline or as a path to a file."""
+    if os.path.isfile(arg):
+        return cfg.read_json(arg)
+    return json.loads(arg)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GSM Simulation parameter sweep.')
+    parser.add_argument("-c", "--config", type=str, default="config.json",
+                        help="base config, overrides are applied to this")
+    parser.add_argument("-g", "--grid", type=str, default=None,
+                        help="JSON object (or file) mapping config paths to lists of values, "
+                             "e.g. '{\"base_station.traffic_channels\": [30, 40]}'")
+    parser.add_argument("-l", "--list", type=str, default=None,
+                        help="JSON list (or file) of override objects, one per scenario")
+    parser.add_argument("-n", "--replications", type=int, default=5,
+                        help="replications of every scenario (maximum with --tolerance)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("-t", "--sim_time", type=int, default=None,
+                        help="simulation time in hours for all scenarios")
+    parser.add_argument("-e", "--engine", type=str, default="vector",
+                        choices=["step", "vector", "event", "corridor"], help="simulation engine")
+    parser.add_argument("--seed", type=int, default=None, help="seed rng")
+    parser.add_argument("--cache", type=str, default=None, metavar="DIR",
+                        help="look up and store results in a result cache in DIR")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="run replications of a scenario until the 95%% confidence interval "
+                             "of every KPI is within this fraction of its mean")
+    parser.add_argument("--results", type=str, default=None, metavar="CSV",
+                        help="append config, seed and statistics of every replication to CSV")
+    parser.add_argument("--crn", action='store_true',
+                        help="common random numbers: replication i of every scenario uses the "
+                             "same random streams")
+    parser.add_argument("--antithetic", action='store_true',
+                        help="run replications as antithetic pairs")
+    parser.add_argument("--progress", type=str, default=None, metavar="FILE",
+                        help="append the progress of every replication to FILE as json lines, "
+                             "follow it with progress.py FILE")
+    args = parser.parse_args()
+    if args.tolerance is not None and args.antithetic:
+        parser.error("--tolerance needs independent replications, not --antithetic pairs")
+
+    config = cfg.read_json(args.config)
+    if cfg.has_plane(config):
+        args.engine = "plane"
+    elif cfg.has_tower_list(config):
+        args.engine = "corridor"
+    if args.sim_time is not None:
+        config = cfg.apply_overrides(config, {"simulation.duration_hour": args.sim_time})
+
+    overrides_list = []
+    if args.grid is not None:
+        overrides_list += expand_grid(_load_json_arg(args.grid))
+    if args.list is not None:
+        overrides_list += _load_json_arg(args.list)
+    if len(overrides_list) == 0:
+        overrides_list = [{}]
+
+    # workers never print status or summaries
+    worker_args = argparse.Namespace(silent=True, supersilent=True, engine=args.engine)
+    seed = int(time.time()) if args.seed is None else args.seed
+
+    start_time = time.time()
+    total = len(overrides_list) * args.replications
+
+    def progress(stats):
+        progress.done += 1
+        print("%d/%d done (scenario %d, replication %d)"
+              % (progress.done, total, stats["scenario"], stats["replication"]))
+    progress.done = 0
+
+    rows = sweep(config, overrides_list, worker_args, args.replications,
+                 args.workers, seed, on_result=progress, cache_dir=args.cache,
+                 results_path=args.results, tolerance=args.tolerance,
+                 progress_path=args.progress, common=args.crn, antithetic=args.antithetic)
+    print("sweep of %d scenarios done in %d seconds, seed %d"
+          % (len(overrides_list), time.time() - start_time, seed))
+
+    columns = []
+    for overrides in overrides_list:
+        columns += [k for k in overrides if k not in columns]
+    columns += ["replications"] + KPI_COLUMNS + STATS_COLUMNS
+    output.print_table(rows, columns, "Sweep results")
@@ -0,0 +1,37 @@
+import unittest
+
+import sweep
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_expand_grid(self):
+        got = sweep.expand_grid({"a.b": [1, 2], "c": ["x", "y", "z"]})
+        self.assertEqual(len(got), 6)
+        self.assertIn({"a.b": 2, "c": "y"}, got)
+
+    def test_tolerance_antithetic(self):
+        # the sequential estimator needs independent replications
+        with self.assertRaises(ValueError):
+            sweep.run_scenarios({}, [{}], None, 4, tolerance=0.1, antithetic=True)
+
+    def test_results_table(self):
+        def stats(scenario, attempts, failed):
+            s = {col: 0 for col in sweep.STATS_COLUMNS}
+            s.update({"scenario": scenario, "total_call_attempts": attempts,
+                      "total_failed_to_connect": failed, "total_saved_by_secondary": 0,
+                      "total_dropped": 0, "total_fail_no_channel": 0, "total_fail_no_signal": 0})
+            return s
+
+        results = [stats(0, 100, 10), stats(1, 50, 0), stats(0, 300, 0)]
+        rows = sweep.results_table([{"x": 1}, {"x": 2}], results)
+
+        self.assertEqual(rows[0]["x"], 1)
+        self.assertEqual(rows[0]["replications"], 2)
+        self.assertEqual(rows[0]["total_call_attempts"], 200)
+        self.assertAlmostEqual(rows[0]["gos"], 0.05)
+        self.assertEqual(rows[1]["replications"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import numpy as np
+
+# cumulative tower counters recorded every hour, see Tower.counters
+COUNTERS = ["connections_attempts", "conns_established", "successful_conns", "user_hung_up",
+            "handover_attempt", "handover_success", "handover_failure", "dropped",
+            "blocked_no_chan", "blocked_no_sig", "failed_to_connect", "saved_by_secondary"]
+
+
+def series_shape(num_towers, iterations, every=1):
+    """Shape of the channel time series of a Telemetry."""
+    return (-(-iterations // every), num_towers)
+
+
+class Telemetry:
+    """Records channels in use of every tower each second, and the change of
+    every tower counter each simulated hour.
+
+    The channel time series is preallocated for the whole simulation. With
+    every > 1 only every n'th second is stored, point samples keep the
+    distribution of the occupancy intact. If path is given the time series is
+    a memory mapped .npy file, so long simulations don't need to fit in memory.
+    If channels is given it is used as the time series, e.g. a row of a
+    shared.ResultArrays, and must have the shape given by series_shape.
+    """
+
+    def __init__(self, towers, iterations, every=1, path=None, channels=None):
+        self.towers = towers
+        self.every = every
+
+        shape = series_shape(len(towers), iterations, every)
+        if channels is not None:
+            if channels.shape != shape:
+                raise ValueError("channels must have shape %s" % (shape,))
+            self.channels = channels
+        elif path is None:
+            self.channels = np.zeros(shape, dtype=np.int32)
+        else:
+            self.channels = np.lib.format.open_memmap(path, mode="w+", dtype=np.int32, shape=shape)
+
+        # hourly[h, t, c] is the increase of counter COUNTERS[c] of tower t in
+        # hour h, preallocated for every hour of the simulation
+        self._hourly = np.zeros((iterations // 3600 + 1, len(towers), len(COUNTERS)),
+                                dtype=np.int64)
+        self._hours = 0
+        self._last_counters = self._counters()
+        self._last_t = 0
+
+    def _counters(self):
+        return np.array([[tower.counters()[c] for c in COUNTERS] for tower in self.towers],
+                        dtype=np.int64)
+
+    def advance(self, t):
+        """Record the current channels in use for all seconds from the last
+        call up to, but not including, t."""
+        if t <= self._last_t:
+            return
+        start = -(-self._last_t // self.every)
+        stop = min(-(-t // self.every), len(self.channels))
+        if start < stop:
+            self.channels[start:stop] = [tower._channels_in_use for tower in self.towers]
+        self._last_t = t
+
+    @property
+    def hourly(self):
+        """Counter changes of the hours stored so far, see end_hour."""
+        return self._hourly[:self._hours]
+
+    def end_hour(self):
+        """Store the counter changes since the last call."""
+        counters = self._counters()
+        self._hourly[self._hours] = counters - self._last_counters
+        self._hours += 1
+        self._last_counters = counters
+
+    def finish(self):
+        """Store the changes of the last (possibly partial) hour."""
+        if self._last_t > len(self.hourly) * 3600:
+            self.end_hour()
+        if isinstance(self.channels, np.memmap):
+            self.channels.flush()
+
+    def seconds(self):
+        """Simulation time of every sample of the channel time series."""
+        return np.arange(len(self.channels)) * self.every
+
+    def hour(self, h):
+        """Channel samples of hour h, one column per tower."""
+        per_hour = -(-3600 // self.every)
+        return self.channels[h * per_hour:(h + 1) * per_hour]
+
+    def busy_hour(self, tower):
+        """Hour with the highest average number of channels in use on tower."""
+        hours = -(-len(self.channels) * self.every // 3600)
+        return int(np.argmax([self.hour(h)[:, tower].mean() for h in range(hours)]))
+
+    def occupancy_histogram(self, tower, hour=None):
+        """Fraction of time n channels are in use on tower, for n = 0, 1, ...
+        Over the whole simulation, or only hour if given."""
+        samples = self.channels if hour is None else self.hour(hour)
+        counts = np.bincount(samples[:, tower], minlength=int(self.towers[tower].channels) + 1)
+        return counts / float(max(len(samples), 1))
+
+    def save(self, filename):
+        """Save time series and hourly counters to a npz file."""
+        np.savez(filename, channels=np.asarray(self.channels), every=self.every,
+                 hourly=self.hourly, counters=np.array(COUNTERS))
@@ -0,0 +1,83 @@
+import argparse
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import cfg
+import simulation as sim
+import streams as rnd
+import telemetry
+import tower as twr
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def simulate(self, engine, seconds, every=1):
+        config = cfg.read_json("test_files/golden_config.json")
+        sim_opts = cfg.SimOptions(config)
+        sim_opts.iterations = seconds
+        geometry = cfg.Geometry(config)
+        base_station = twr.Tower(cfg.TowerOptions(config, twr.BASE_STATION))
+        small_cell = twr.Tower(cfg.TowerOptions(config, twr.SMALL_CELL))
+
+        streams = rnd.RandomStreams(4, sim_opts.call_rate)
+        streams.init_shadowing(sim_opts, geometry)
+        recorder = telemetry.Telemetry([base_station, small_cell], seconds, every)
+        args = argparse.Namespace(silent=True, supersilent=True, engine=engine)
+        stats = sim.run(base_station, small_cell, geometry, sim_opts,
+                        cfg.UserOptions(config), args, streams, recorder)
+        return stats, recorder
+
+    def test_advance(self):
+        t = twr.Tower(cfg.TowerOptions(cfg.read_json("test_files/golden_config.json"),
+                                       twr.BASE_STATION))
+        recorder = telemetry.Telemetry([t], 10, every=3)
+        t._channels_in_use = 2
+        recorder.advance(4)
+        t._channels_in_use = 5
+        recorder.advance(10)
+        self.assertEqual(recorder.seconds().tolist(), [0, 3, 6, 9])
+        self.assertEqual(recorder.channels[:, 0].tolist(), [2, 2, 5, 5])
+
+    def test_engines(self):
+        for engine in ["step", "vector", "event"]:
+            stats, recorder = self.simulate(engine, 2 * 3600 + 600)
+
+            # the time series sums to the same total as the averages
+            self.assertEqual(len(recorder.channels), 2 * 3600 + 600)
+            total = recorder.channels[:, 0].sum()
+            self.assertAlmostEqual(stats["avg_calls_base"], total / (2 * 3600 + 599.0),
+                                   msg=engine)
+
+            # two full hours and a partial one, adding up to the totals
+            self.assertEqual(recorder.hourly.shape, (3, 2, len(telemetry.COUNTERS)))
+            dropped = recorder.hourly[:, :, telemetry.COUNTERS.index("dropped")]
+            self.assertEqual(dropped.sum(), stats["total_dropped"], engine)
+
+            hist = recorder.occupancy_histogram(1, hour=recorder.busy_hour(1))
+            self.assertAlmostEqual(hist.sum(), 1.0)
+
+    def test_memory_mapped(self):
+        t = twr.Tower(cfg.TowerOptions(cfg.read_json("test_files/golden_config.json"),
+                                       twr.BASE_STATION))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "channels.npy")
+            recorder = telemetry.Telemetry([t], 2 * 3600, path=path)
+            t._channels_in_use = 3
+            recorder.advance(3600)
+            recorder.end_hour()
+            recorder.advance(2 * 3600)
+            recorder.finish()
+            self.assertEqual(np.load(path)[:, 0].sum(), 3 * 2 * 3600)
+            self.assertEqual(len(recorder.hourly), 2)
+            del recorder
+
+    def test_downsampled(self):
+        stats, recorder = self.simulate("step", 3600, every=10)
+        self.assertEqual(len(recorder.channels), 360)
+        self.assertTrue(np.all(recorder.channels <= 30))
+
+
+if __name__ == '__main__':
+    unittest.main()
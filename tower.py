@@ -1,9 +1,15 @@
+import numpy as np
+
 import errors as err
+import histogram
 
 # constants used for tower_type
 BASE_STATION = 1
 SMALL_CELL = 2
 
+# user id of a free channel in the channel table
+FREE = -1
+
 
 class Tower:
 
@@ -12,8 +18,8 @@ class Tower:
         self.EIRP = 30.0
         self.channels = 30
         self.freq = 1000
-        self.users = {}
         self.pos = 0
+        self.xy = (0.0, 0.0)
         self.tower_type = SMALL_CELL
 
     def __init__(self, options=None, debug=False):
@@ -25,23 +31,35 @@ class Tower:
             self.channels = options.channels
             self.freq = options.freq
             self.pos = options.pos
+            self.xy = options.xy
             self.tower_type = options.twr_type
 
         self._debug = debug
 
+        # static link budget along the road, built by rf.init_link_budget
+        self._link_budget = None
+        self._link_budget_key = None
+
         # statistics data
         self.reset_counters()
 
     def reset_counters(self):
-        self.users = {}
+        # channel table: id of the user on every channel, a stack of free
+        # channels and the channel of every active user, all bounded by the
+        # number of channels
+        channels = int(self.channels)
+        self._channel_users = np.full(channels, FREE, dtype=np.int64)
+        self._free_channels = list(range(channels - 1, -1, -1))
+        self._channel_of = {}
+
         self._dropped = 0
         self._blocked_no_sig = 0
         self._blocked_no_chan = 0
         self._channels_in_use = 0
         self._handover_success = 0
         self._handover_failure = 0
-        self._handover_failure_locations = []
-        self._handover_success_locations = []
+        self._handover_failure_locations = histogram.LocationHistogram()
+        self._handover_success_locations = histogram.LocationHistogram()
         self._handover_attempt = 0
         self._successful_conns = 0
         self._conns_established = 0
@@ -50,11 +68,30 @@ class Tower:
         self._user_hung_up = 0
         self._saved_by_secondary = 0
 
-    def connect(self, user, rsl, primary=True):
+    def counters(self):
+        """Return dictionary with the current value of all counters."""
+        return {
+            "channels_in_use": self._channels_in_use,
+            "connections_attempts": self._connections_attempts,
+            "conns_established": self._conns_established,
+            "successful_conns": self._successful_conns,
+            "user_hung_up": self._user_hung_up,
+            "handover_attempt": self._handover_attempt,
+            "handover_success": self._handover_success,
+            "handover_failure": self._handover_failure,
+            "dropped": self._dropped,
+            "blocked_no_chan": self._blocked_no_chan,
+            "blocked_no_sig": self._blocked_no_sig,
+            "failed_to_connect": self._failed_to_connect,
+            "saved_by_secondary": self._saved_by_secondary,
+        }
+
+    def try_connect(self, user, rsl, primary=True):
         """Associates the user to the tower if available capacity, and acceptable rsl.
         If the connection is made with primary=False (aka. the user is trying to
         connect to this tower only because it failed to connect to its primary
         tower), the only statistics logging will be made if the connection is successful.
+        Returns errors.OK, or the reason the connection failed.
         """
         # don' count attempt yet if secondary.
         # If we fail we want to disregard this attempt altogether
@@ -65,12 +102,12 @@ class Tower:
         if signal_too_weak:
             if primary:
                 self._blocked_no_sig += 1
-            raise err.ConnectionError(err.LOW_SIGNAL)
+            return err.LOW_SIGNAL
 
         if self._channels_in_use >= self.channels:
             if primary:
                 self._blocked_no_chan += 1
-            raise err.ConnectionError(err.NO_FREE_CHANNELS)
+            return err.NO_FREE_CHANNELS
 
         # now that we know the connection succeeded we must register the attempt if were a secondary
         if not primary:
@@ -78,21 +115,97 @@ class Tower:
 
         self._add(user)
         self._conns_established += 1
+        return err.OK
+
+    def connect(self, user, rsl, primary=True):
+        """Same as try_connect, but raises errors.ConnectionError if the
+        connection failed."""
+        status = self.try_connect(user, rsl, primary)
+        if status != err.OK:
+            raise err.ConnectionError(status)
+
+    def admit(self, uids, rsl, threshold, primary=True):
+        """Batch version of try_connect for arrays of user ids and their RSL.
+        Users are admitted in arrival order until the tower runs out of free
+        channels, and get a channel each. Returns array of status codes,
+        errors.OK or the reason the connection failed.
+        """
+        strong = rsl >= threshold
+        free = max(int(self.channels - self._channels_in_use), 0)
+        admitted = strong & (np.cumsum(strong) <= free)
+
+        num_strong = int(np.count_nonzero(strong))
+        num_admitted = int(np.count_nonzero(admitted))
+        if primary:
+            self._connections_attempts += len(rsl)
+            self._blocked_no_sig += len(rsl) - num_strong
+            self._blocked_no_chan += num_strong - num_admitted
+        else:
+            # secondary attempts only count if they succeed
+            self._connections_attempts += num_admitted
+
+        self.allocate_many(uids[admitted])
+        self._conns_established += num_admitted
+
+        status = np.full(len(rsl), err.LOW_SIGNAL, dtype=np.int8)
+        status[strong] = err.NO_FREE_CHANNELS
+        status[admitted] = err.OK
+        return status
+
+    def allocate(self, uid):
+        """Put user id uid on a free channel and return the channel. Assumes
+        there is one."""
+        channel = self._free_channels.pop()
+        self._channel_users[channel] = uid
+        self._channel_of[uid] = channel
+        self._channels_in_use += 1
+        return channel
+
+    def release(self, uid):
+        """Free the channel of user id uid."""
+        channel = self._channel_of.pop(uid)
+        self._channel_users[channel] = FREE
+        self._free_channels.append(channel)
+        self._channels_in_use -= 1
+
+    def allocate_many(self, uids):
+        """Batch version of allocate for an array of user ids. Returns the
+        array of channels."""
+        n = len(uids)
+        if n > len(self._free_channels):
+            raise ValueError("cannot allocate %d channels, %d free" % (n, len(self._free_channels)))
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+
+        channels = np.array(self._free_channels[-n:][::-1], dtype=np.int64)
+        del self._free_channels[-n:]
+        self._channel_users[channels] = uids
+        self._channel_of.update(zip(np.asarray(uids).tolist(), channels.tolist()))
+        self._channels_in_use += n
+        return channels
+
+    def release_many(self, uids):
+        """Batch version of release for an array of user ids."""
+        if len(uids) == 0:
+            return
+        channels = [self._channel_of.pop(uid) for uid in np.asarray(uids).tolist()]
+        self._channel_users[channels] = FREE
+        self._free_channels.extend(channels)
+        self._channels_in_use -= len(channels)
 
     def _add(self, user):
         """Adds user to the tower. Assuming it can."""
-        self._channels_in_use += 1
+        self.allocate(user.id)
         if self._debug:
             print("user #%d added. channels available: %d/%d" %
                   (user.id, self._channels_in_use, self.channels))
 
     def _remove(self, user):
         """Removes user from the tower. Assuming it can."""
-        if self._channels_in_use <= 0 and not self._debug:
-            raise ValueError("cannot have negative channels in use")
+        if user.id not in self._channel_of:
+            raise ValueError("user #%d is not connected" % user.id)
 
-        self.users[user.id] = False
-        self._channels_in_use -= 1
+        self.release(user.id)
 
         if self._debug:
             print("user #%d removed. channels available: %d/%d" %
@@ -109,24 +222,25 @@ class Tower:
         self._remove(user)
         self._dropped += 1
 
-    def failed_to_connect(self):
+    def failed_to_connect(self, count=1):
         """Dropped call. User were never able to connect"""
-        self._failed_to_connect += 1
+        self._failed_to_connect += count
 
     def hand_over(self, user):
         self._remove(user)
         self._handover_success += 1
-        self._handover_success_locations.append(user.pos)
+        self._handover_success_locations.add(user.pos)
 
     def handover_failure(self, user):
         self._handover_failure += 1
-        self._handover_failure_locations.append(user.pos)
+        self._handover_failure_locations.add(user.pos)
 
     def handover_attempt(self):
         self._handover_attempt += 1
 
-    def saved_by_secondary(self):
-        self._saved_by_secondary += 1
+    def saved_by_secondary(self, count=1):
+        self._saved_by_secondary += count
 
     def dump_handoff_data(self):
+        """Return histograms of the positions of successful and failed handovers."""
         return (self._handover_success_locations, self._handover_failure_locations)
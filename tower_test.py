@@ -1,5 +1,8 @@
 import unittest
-from tower import Tower
+import numpy as np
+
+import cfg
+from tower import FREE, Tower
 import user as usr
 
 
@@ -14,3 +17,30 @@ class TestTower(unittest.TestCase):
         self.assertEqual(tower.num_users(), 1)
         print(tower.users)
         self.assertTrue(tower.users[id])
+
+    def test_channel_table(self):
+        tower = Tower()
+        self.assertEqual(tower.allocate(7), 0)
+        self.assertEqual(tower.allocate_many(np.array([3, 4])).tolist(), [1, 2])
+        self.assertEqual(tower._channel_users[:4].tolist(), [7, 3, 4, FREE])
+
+        # released channels are reused first
+        tower.release(3)
+        tower.release_many(np.array([7]))
+        self.assertEqual(tower._channels_in_use, 1)
+        self.assertEqual(tower.allocate(9), 0)
+        self.assertEqual(tower._channel_users[:3].tolist(), [9, FREE, 4])
+
+        self.assertRaises(ValueError, tower.allocate_many, np.arange(100, 100 + tower.channels))
+        self.assertRaises(KeyError, tower.release, 3)
+
+    def test_connect_uses_channel_table(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        tower = Tower()
+        users = [usr.User(i, cfg.UserOptions(config)) for i in range(3)]
+        for u in users:
+            tower.connect(u, -50.0)
+        tower.disconnect(users[1], call_done=True)
+
+        self.assertEqual(sorted(tower._channel_of), [0, 2])
+        self.assertRaises(ValueError, tower.disconnect, users[1])
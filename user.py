@@ -19,6 +19,33 @@ def init_users(n, user_cfg):
     return users
 
 
+def random_positions(geometry, n, streams=None, users=None):
+    """Vectorized User.random_pos: return arrays of n spawn positions and
+    directions of travel, of the users (indices) if given, see
+    RandomStreams.random_of."""
+    if streams is None:
+        sector, uniform = np.random.random_sample(n), np.random.random_sample(n)
+    elif users is None:
+        sector, uniform = streams.random_array(n), streams.random_array(n)
+    else:
+        sector, uniform = streams.random_of(users, 2).T
+
+    # compute intervals
+    road_length = geometry.road_end - geometry.road_start
+    parking_length = geometry.road_start - geometry.parking_start
+    mall_length = geometry.mall_end
+
+    on_road = (0.0 < sector) & (sector < 0.2)
+    in_parking = (0.2 <= sector) & (sector < 0.5)
+
+    pos = mall_length * uniform
+    pos[on_road] = geometry.road_start + road_length * uniform[on_road]
+    pos[in_parking] = geometry.parking_start + parking_length * uniform[in_parking]
+
+    direction = np.where(on_road | in_parking, -1, 1)
+    return pos, direction
+
+
 class User:
     def __init__(self, id, user_cfg, pos=-1):
         self.id = id
@@ -56,44 +83,39 @@ class User:
 
         self.pos += speed * self.direction
 
-    def attempt_call(self, geometry, primary, secondary):
+    def attempt_call(self, geometry, primary, secondary, streams=None):
         """Attempt to establish connection to towers."""
 
-        rsl = rf.RSL(geometry, self, primary)
-
-        try:
-            # attempt primary
-            try:
-                # connect may throw connection error
-                primary.connect(self, rsl)
-
-                # connected successfully, save tower type for finishing up
-                tower_type = primary.tower_type
+        rsl = rf.RSL(geometry, self, primary, streams)
 
-            except err.ConnectionError as e:
-                # try secondary, similar logic as primary
+        # attempt primary, save tower type for finishing up
+        tower_type = primary.tower_type
+        if primary.try_connect(self, rsl) != err.OK:
+            # try secondary, similar logic as primary
 
-                # check signal to secondary
-                rsl = rf.RSL(geometry, self, secondary)
+            # check signal to secondary
+            rsl = rf.RSL(geometry, self, secondary, streams)
 
-                secondary.connect(self, rsl, primary=False)
-                tower_type = secondary.tower_type
-
-                primary.saved_by_secondary()
+            if secondary.try_connect(self, rsl, primary=False) != err.OK:
+                # failed to connect to any. this will impact the GOS
+                primary.failed_to_connect()
+                return
 
-        except err.ConnectionError as e:
-            # failed to connect to any. this will impact the GOS
-            primary.failed_to_connect()
-            return
+            tower_type = secondary.tower_type
+            primary.saved_by_secondary()
 
         # succeeded in connection to a tower
-        self.time_remaining = rf.call_time(self.avg_call_duration)
+        if streams is None:
+            self.time_remaining = rf.call_time(self.avg_call_duration)
+        else:
+            self.time_remaining = streams.call_time(self.avg_call_duration)
         self.connected_to = tower_type
 
-    def random_pos(self, geometry):
+    def random_pos(self, geometry, streams=None):
         """Return a random position in the workspace, and the direction
         of travel based on where the position is."""
-        sector = np.random.random_sample()
+        random_sample = np.random.random_sample if streams is None else streams.random
+        sector = random_sample()
 
         # compute intervals
         road_length = geometry.road_end - geometry.road_start
@@ -105,14 +127,14 @@ class User:
 
         if on_road:
             dir = -1
-            pos = geometry.road_start + road_length * np.random.random_sample()
+            pos = geometry.road_start + road_length * random_sample()
         elif in_parking:
             dir = -1
-            pos = geometry.parking_start + parking_length * np.random.random_sample()
+            pos = geometry.parking_start + parking_length * random_sample()
         else:
             # mall
             dir = 1
-            pos = mall_length * np.random.random_sample()
+            pos = mall_length * random_sample()
 
         return pos, dir
 
@@ -135,73 +157,80 @@ class User:
         """
         self.disconnect()
 
-    def on_timestep(self, geometry, base_station, small_cell):
+    def towers(self, base_station, small_cell):
+        """Return the tower the user is connected to and the other tower."""
+        if self.connected_to == Tower.BASE_STATION:
+            return base_station, small_cell
+        return small_cell, base_station
+
+    def on_timestep(self, geometry, base_station, small_cell, streams=None):
         if self.connected_to is None:
             # user doesn't have a connection
 
             # check if the user want's to call
-            self.wants_to_call = rf.want_call()
+            self.wants_to_call = rf.want_call() if streams is None else streams.want_call()
             if self.wants_to_call:
-                # spawn user at som position
-                self.pos, self.direction = self.random_pos(geometry)
-
-                # try to connect to the correct tower
-                if self.is_outside(geometry):
-                    self.attempt_call(geometry, base_station, small_cell)
-                else:
-                    self.attempt_call(geometry, small_cell, base_station)
+                self.start_call(geometry, base_station, small_cell, streams)
         else:
-            # user already have a connection
-            self.update_pos(geometry)
+            self.update_call(geometry, base_station, small_cell, streams)
 
-            # determine what station the user are connected to
-            if self.connected_to == Tower.BASE_STATION:
-                primary = base_station
-                secondary = small_cell
-            else:
-                primary = small_cell
-                secondary = base_station
-
-            done = self.update_calltime()
-            if done:
-                # close connection gracefully
-                primary.disconnect(self, call_done=True)
-                self.disconnect()
-                return
+    def start_call(self, geometry, base_station, small_cell, streams=None):
+        """Spawn the user at some position and try to connect to the correct tower."""
+        self.pos, self.direction = self.random_pos(geometry, streams)
 
-            # check if user is leaving the area on either side
-            end = base_station.pos if self.direction == 1 else small_cell.pos
-            if rf.near(1, self.pos, end):
-                # count as successful handover
-                primary.handover_attempt()
-                primary.hand_over(self)
-                self.disconnect()
-                return
+        if self.is_outside(geometry):
+            self.attempt_call(geometry, base_station, small_cell, streams)
+        else:
+            self.attempt_call(geometry, small_cell, base_station, streams)
 
-            # check if user will drop the call due to poor RSL
-            rsl_pri = rf.RSL(geometry, self, primary)
-            if rsl_pri < self.rsl_threshold:
-                # print("lost signal at pos=%.1f --> rsl = %.2f" % (self.pos, rsl_pri))
-                # print("lost sig at pos=%.1f, connected to = %s" %(self.pos, "base station" if
-                # primary.tower_type == Tower.BASE_STATION else "small cell"))
-                primary.drop(self)
-                self.drop()
-                return
+    def update_call(self, geometry, base_station, small_cell, streams=None):
+        """Advance a user that already have a connection one timestep."""
+        self.update_pos(geometry)
+
+        # determine what station the user are connected to
+        primary, secondary = self.towers(base_station, small_cell)
+
+        done = self.update_calltime()
+        if done:
+            # close connection gracefully
+            primary.disconnect(self, call_done=True)
+            self.disconnect()
+            return
 
-            # check if user can/should hand over to other tower
-            rsl_alt = rf.RSL(geometry, self, secondary)
-            potential_handoff = rsl_alt > rsl_pri
-            if potential_handoff:
-                # record attempted handoff
-                primary.handover_attempt()
+        # check if user is leaving the area on either side
+        end = base_station.pos if self.direction == 1 else small_cell.pos
+        if rf.near(1, self.pos, end):
+            # count as successful handover
+            primary.handover_attempt()
+            primary.hand_over(self)
+            self.disconnect()
+            return
+
+        self.check_signal(geometry, primary, secondary, streams)
+
+    def check_signal(self, geometry, primary, secondary, streams=None):
+        """Drop the call if the signal from the primary tower is too weak,
+        otherwise hand over to the secondary tower if its signal is stronger."""
+        # check if user will drop the call due to poor RSL
+        rsl_pri = rf.RSL(geometry, self, primary, streams)
+        if rsl_pri < self.rsl_threshold:
+            primary.drop(self)
+            self.drop()
+            return
 
-                try:
-                    secondary.connect(self, rsl_alt)  # can raise ConnectionError
-                    self.connected_to = secondary.tower_type
-                    primary.hand_over(self)
+        # check if user can/should hand over to other tower
+        rsl_alt = rf.RSL(geometry, self, secondary, streams)
+        potential_handoff = rsl_alt > rsl_pri
+        if potential_handoff:
+            # record attempted handoff
+            primary.handover_attempt()
 
-                except err.ConnectionError as e:
-                    # no free channels on secondary
+            if secondary.try_connect(self, rsl_alt) == err.OK:
+                self.connected_to = secondary.tower_type
+                primary.hand_over(self)
+
+            else:
+                # no free channels on secondary
 
-                    # register handover failure on primary
-                    primary.handover_failure(self)
+                # register handover failure on primary
+                primary.handover_failure(self)
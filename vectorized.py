@@ -0,0 +1,212 @@
+import time
+import numpy as np
+
+import errors as err
+import output
+import rf
+import simulation as sim
+import user as usr
+
+# values of the tower column, index into the list of towers
+NOT_CONNECTED = -1
+BASE = 0
+SMALL = 1
+
+
+class Population:
+    """Struct-of-arrays representation of all users in a simulation.
+    Holds the same per-user state as user.User, one array per attribute.
+    """
+
+    def __init__(self, n, user_cfg, num_towers=2):
+        # config independent
+        self.pos = np.full(n, -1.0)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.tower = np.full(n, NOT_CONNECTED, dtype=np.int8 if num_towers < 128 else np.int32)
+        self.time_remaining = np.zeros(n, dtype=np.int64)
+
+        # config dependent, identical for all users
+        self.height = user_cfg.height
+        self.rsl_threshold = user_cfg.rsl_threshold
+        self.avg_call_duration = user_cfg.avg_call_duration * 60  # convert from min to sec
+        self.mall_speed = user_cfg.mall_speed
+        self.road_speed = user_cfg.road_speed
+
+    def disconnect(self, idx):
+        """Reset users to a non-connected state."""
+        self.pos[idx] = -1.0
+        self.tower[idx] = NOT_CONNECTED
+        self.time_remaining[idx] = 0
+
+
+def _per_tower(tower_column, mask, num_towers=2):
+    """Count the masked users connected to each tower."""
+    return np.bincount(tower_column[mask], minlength=num_towers)
+
+
+def _rsl(geometry, users, idx, pos, tower_idx, towers, streams):
+    """RSL for users idx at each position towards the tower given by tower_idx."""
+    rsl = np.empty(len(pos))
+    fading = streams.fading_of(idx, tower_idx)
+    for t, tower in enumerate(towers):
+        sel = tower_idx == t
+        if sel.any():
+            rsl[sel] = rf.RSL_array(geometry, pos[sel], users.height, tower, streams, fading[sel])
+    return rsl
+
+
+def _update_calls(users, idx, geometry, towers, streams):
+    """Advance all connected users one timestep, same logic as the
+    connected branch of User.on_timestep."""
+    base_station, small_cell = towers[BASE], towers[SMALL]
+
+    # move users
+    pos = users.pos[idx]
+    speed = np.where(pos > geometry.parking_end, users.road_speed, users.mall_speed)
+    pos += speed * users.direction[idx]
+    users.pos[idx] = pos
+
+    # close calls that are done gracefully
+    users.time_remaining[idx] -= 1
+    done = users.time_remaining[idx] < 0
+    for t, count in enumerate(_per_tower(users.tower[idx], done)):
+        towers[t].release_many(idx[done & (users.tower[idx] == t)])
+        towers[t]._successful_conns += count
+        towers[t]._user_hung_up += count
+    users.disconnect(idx[done])
+    idx, pos = idx[~done], pos[~done]
+
+    # users leaving the area on either side count as successful handovers
+    end = np.where(users.direction[idx] == 1, base_station.pos, small_cell.pos)
+    leaving = np.abs(pos - end) <= 1.0
+    primary = users.tower[idx]
+    for t, tower in enumerate(towers):
+        sel = leaving & (primary == t)
+        count = int(np.count_nonzero(sel))
+        tower._handover_attempt += count
+        tower._handover_success += count
+        tower.release_many(idx[sel])
+        tower._handover_success_locations.add_array(pos[sel])
+    users.disconnect(idx[leaving])
+    idx, pos, primary = idx[~leaving], pos[~leaving], primary[~leaving]
+
+    # drop calls due to poor RSL
+    rsl_pri = _rsl(geometry, users, idx, pos, primary, towers, streams)
+    lost = rsl_pri < users.rsl_threshold
+    for t, count in enumerate(_per_tower(primary, lost)):
+        towers[t].release_many(idx[lost & (primary == t)])
+        towers[t]._dropped += count
+    users.disconnect(idx[lost])
+    keep = ~lost
+    idx, pos, primary, rsl_pri = idx[keep], pos[keep], primary[keep], rsl_pri[keep]
+
+    # hand over to the other tower if it is stronger
+    secondary = 1 - primary
+    rsl_alt = _rsl(geometry, users, idx, pos, secondary, towers, streams)
+    potential_handoff = rsl_alt > rsl_pri
+    for t, tower in enumerate(towers):
+        sel = np.flatnonzero(potential_handoff & (primary == t))
+        if len(sel) == 0:
+            continue
+        other = towers[1 - t]
+        tower._handover_attempt += len(sel)
+
+        admitted = other.admit(idx[sel], rsl_alt[sel], users.rsl_threshold) == err.OK
+        failed = sel[~admitted]
+        tower._handover_failure += len(failed)
+        tower._handover_failure_locations.add_array(pos[failed])
+
+        moved = sel[admitted]
+        tower.release_many(idx[moved])
+        tower._handover_success += len(moved)
+        tower._handover_success_locations.add_array(pos[moved])
+        users.tower[idx[moved]] = 1 - t
+
+
+def _new_calls(users, idle, geometry, towers, streams):
+    """Let idle users decide whether to call, and try to connect the ones
+    that do, same logic as User.attempt_call."""
+    callers = idle[streams.want_calls_of(idle)]
+    if len(callers) == 0:
+        return
+
+    # spawn callers at some position
+    pos, direction = usr.random_positions(geometry, len(callers), streams, callers)
+    users.pos[callers] = pos
+    users.direction[callers] = direction
+
+    # try to connect to the correct tower, fall back on the other one
+    primary = np.where(pos > geometry.parking_start, BASE, SMALL)
+    connected_to = np.full(len(callers), NOT_CONNECTED, dtype=np.int8)
+    rsl = _rsl(geometry, users, callers, pos, primary, towers, streams)
+    for t, tower in enumerate(towers):
+        sel = np.flatnonzero(primary == t)
+        if len(sel) == 0:
+            continue
+        admitted = tower.admit(callers[sel], rsl[sel], users.rsl_threshold) == err.OK
+        connected_to[sel[admitted]] = t
+
+        retry = sel[~admitted]
+        if len(retry) == 0:
+            continue
+        other = towers[1 - t]
+        rsl_alt = rf.RSL_array(geometry, pos[retry], users.height, other, streams,
+                               streams.fading_of(callers[retry], 1 - t))
+        saved = other.admit(callers[retry], rsl_alt, users.rsl_threshold, primary=False) == err.OK
+        connected_to[retry[saved]] = 1 - t
+
+        num_saved = int(np.count_nonzero(saved))
+        tower.saved_by_secondary(num_saved)
+        tower.failed_to_connect(len(retry) - num_saved)
+
+    connected = callers[connected_to != NOT_CONNECTED]
+    users.tower[connected] = connected_to[connected_to != NOT_CONNECTED]
+    users.time_remaining[connected] = streams.call_times_of(connected, users.avg_call_duration)
+
+
+def simulate(base_station, small_cell, geometry, sim_opts, user_opts, cli_args, streams,
+             telemetry=None, progress=None):
+    """Run the simulation with the whole user population advanced one timestep
+    at a time using array operations. Produces the same statistics as
+    simulation.simulate.
+    """
+    start_time = time.time()
+
+    towers = [base_station, small_cell]
+    users = Population(sim_opts.num_users, user_opts)
+
+    # run simulation
+    tot_bstn, tot_cell = 0, 0
+    for i in range(sim_opts.iterations):
+
+        # print status updates
+        sim.status_update(i, base_station, small_cell, cli_args, telemetry, progress)
+        streams.set_time(i)
+
+        tot_bstn += base_station._channels_in_use
+        tot_cell += small_cell._channels_in_use
+        if telemetry is not None:
+            telemetry.advance(i + 1)
+
+        # simulate timestep, idle users are determined before anyone moves
+        connected = np.flatnonzero(users.tower != NOT_CONNECTED)
+        idle = np.flatnonzero(users.tower == NOT_CONNECTED)
+        if len(connected) > 0:
+            _update_calls(users, connected, geometry, towers, streams)
+        _new_calls(users, idle, geometry, towers, streams)
+
+    if telemetry is not None:
+        telemetry.finish()
+
+    end_time = time.time()
+    runtime = end_time - start_time
+
+    if not cli_args.supersilent:
+        output.print_sim_summary(geometry, sim_opts, runtime)
+        output.print_tower_summary(base_station, "Summary Base Station")
+        output.print_tower_summary(small_cell, "Summary Small Cell")
+
+    avg_calls_base = float(tot_bstn) / float(i)
+    avg_calls_cell = float(tot_cell) / float(i)
+
+    return sim.summarize(base_station, small_cell, runtime, avg_calls_base, avg_calls_cell)
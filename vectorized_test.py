@@ -0,0 +1,57 @@
+import argparse
+import unittest
+import numpy as np
+
+import cfg
+import errors as err
+import streams as rnd
+import tower as twr
+import vectorized
+
+
+class TestVectorized(unittest.TestCase):
+
+    def setUp(self):
+        config = cfg.read_json("test_files/golden_config.json")
+        self.geometry = cfg.Geometry(config)
+        self.sim_opts = cfg.SimOptions(config)
+        self.user_opts = cfg.UserOptions(config)
+        self.base = twr.Tower(cfg.TowerOptions(config, twr.BASE_STATION))
+        self.small = twr.Tower(cfg.TowerOptions(config, twr.SMALL_CELL))
+        self.args = argparse.Namespace(silent=True, supersilent=True)
+
+        self.streams = rnd.RandomStreams(1, call_rate=10)
+        self.streams.init_shadowing(self.sim_opts, self.geometry)
+
+    def test_channels_match_connected_users(self):
+        users = vectorized.Population(self.sim_opts.num_users, self.user_opts)
+        towers = [self.base, self.small]
+        idle = np.arange(self.sim_opts.num_users)
+        for i in range(600):
+            connected = np.flatnonzero(users.tower != vectorized.NOT_CONNECTED)
+            idle = np.flatnonzero(users.tower == vectorized.NOT_CONNECTED)
+            if len(connected) > 0:
+                vectorized._update_calls(users, connected, self.geometry, towers, self.streams)
+            vectorized._new_calls(users, idle, self.geometry, towers, self.streams)
+
+            for t, tower in enumerate(towers):
+                self.assertEqual(tower._channels_in_use, np.count_nonzero(users.tower == t))
+                self.assertLessEqual(tower._channels_in_use, tower.channels)
+
+    def test_admit_in_arrival_order(self):
+        # all but two channels taken
+        for uid in range(100, 100 + int(self.base.channels) - 2):
+            self.base.allocate(uid)
+        rsl = np.array([-110.0, -90.0, -80.0, -70.0])
+        status = self.base.admit(np.arange(4), rsl, -102)
+
+        self.assertEqual(status.tolist(), [err.LOW_SIGNAL, err.OK, err.OK, err.NO_FREE_CHANNELS])
+        self.assertEqual(sorted(self.base._channel_of)[:3], [1, 2, 100])
+        self.assertEqual(self.base._connections_attempts, 4)
+        self.assertEqual(self.base._blocked_no_sig, 1)
+        self.assertEqual(self.base._blocked_no_chan, 1)
+        self.assertEqual(self.base._channels_in_use, self.base.channels)
+
+
+if __name__ == '__main__':
+    unittest.main()